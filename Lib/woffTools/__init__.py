@@ -10,20 +10,39 @@ Those objects are much faster than WOFFFont, but they require much
 more care.
 """
 
-import zlib
+import os
+import sys
+import mmap
+import time
+import heapq
+import threading
 import struct
+import hashlib
+import tempfile
+from array import array
 from fontTools.misc import sstruct
 from xml.etree import ElementTree
 from fontTools.ttLib import TTFont, debugmsg, sortedTagList
 from fontTools.ttLib import getSearchRange
-from fontTools.ttLib.sfnt import calcChecksum, SFNTDirectoryEntry, \
+from fontTools.ttLib.sfnt import SFNTDirectoryEntry, \
     sfntDirectoryFormat, sfntDirectorySize, sfntDirectoryEntryFormat, sfntDirectoryEntrySize
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 # -----------
 # Main Object
 # -----------
 
+# Tables that browsers ignore.
+webIgnoredTables = ("DSIG", "hdmx", "VDMX", "LTSH", "PCLT")
+# TrueType hinting tables.
+webHintingTables = ("cvt ", "fpgm", "prep", "cvar")
+# Tables other than fvar that may reference name IDs 256 and above.
+webNameReferencingTables = ("STAT", "GSUB", "GPOS", "CPAL", "feat", "morx")
+
 class WOFFFont(TTFont):
 
     """
@@ -131,7 +150,8 @@ class WOFFFont(TTFont):
         """
         self._tableOrder = order
 
-    def save(self, file, compressionLevel=9, recompressTables=False, reorderTables=True, recalculateHeadChecksum=True):
+    def save(self, file, compressionLevel=9, recompressTables=False, reorderTables=True, recalculateHeadChecksum=True, streaming=False,
+            spillThreshold=None, passThrough=False, compressionCache=None, webOptimize=None):
         """
         Save a WOFF into file a file object specifified by the
         file argument.. Optionally, file can be a path and a
@@ -156,36 +176,54 @@ class WOFFFont(TTFont):
         If you are not changing any of the SFNT data, you can set
         recalculateHeadChecksum to False to prevent the recalculation.
         This must be set to False if the font contains a DSIG table.
+
+        Set streaming to True if file does not support seeking,
+        for example a pipe, a socket or an HTTP response stream.
+        The header and directory will be calculated before anything
+        is written and all data will be written strictly in order.
+
+        If file is None, nothing will be written and the complete
+        WOFF data will be returned as a bytearray. toBytes is a
+        shortcut for this.
+
+        spillThreshold limits the memory used while saving very
+        large fonts. If it is an int, compressed tables longer than
+        this number of bytes will be kept in a temporary file
+        instead of in memory until they are written.
+
+        Set passThrough to True to copy tables that have not been
+        loaded, and the private data, from the source file in
+        chunks instead of reading them into memory. The directory
+        entries of these tables are not verified, so open the font
+        with checkChecksums if that is needed.
+
+        compressionCache may be a CompressionCache. If it is given,
+        previously compressed data for identical tables will be
+        reused instead of compressing the tables again.
+
+        webOptimize applies the optimizeForWeb profile to the font
+        before it is saved. It may be True for the default profile
+        or a dict of keyword arguments for optimizeForWeb. The font
+        is changed in place and the bytes saved by each action are
+        stored in the webOptimizeReport attribute.
         """
-        # if DSIG is to be written, the table order
-        # must be completely specified. otherwise the
-        # DSIG may not be valid after decoding the WOFF.
-        tags = self.keys()
-        if "GlyphOrder" in tags:
-            tags.remove("GlyphOrder")
-        if "DSIG" in tags:
-            if self._tableOrder is None or (set(self._tableOrder) != set(tags)):
-                raise WOFFLibError("A complete table order must be supplied when saving a font with a 'DSIG' table.")
-            elif reorderTables:
-                raise WOFFLibError("Tables can not be reordered when a 'DSIG' table is in the font. Set reorderTables to False.")
-            elif recalculateHeadChecksum:
-                raise WOFFLibError("The 'head' table checkSumAdjustment can not be recalculated when a 'DSIG' table is in the font.")
-        # sort the tags if necessary
-        if reorderTables:
-            tags = sortedTagList(tags)
+        if webOptimize:
+            if webOptimize is True:
+                webOptimize = {}
+            self.webOptimizeReport = self.optimizeForWeb(compressionLevel=compressionLevel, **webOptimize)
+        tags = self._getSaveOrder(reorderTables, recalculateHeadChecksum)
         # open a file if necessary
         closeStream = False
-        if not hasattr(file, "write"):
+        if file is not None and not hasattr(file, "write"):
             closeStream = True
             file = open(file, "wb")
         # write the table data
-        if "GlyphOrder" in tags:
-            tags.remove("GlyphOrder")
         numTables = len(tags)
         writer = WOFFWriter(file, numTables, flavor=self.flavor,
             majorVersion=self.majorVersion, minorVersion=self.minorVersion,
             compressionLevel=compressionLevel, recalculateHeadChecksum=recalculateHeadChecksum,
-            verbose=self.verbose)
+            streaming=streaming, spillThreshold=spillThreshold,
+            compressionCache=compressionCache, verbose=self.verbose)
         for tag in tags:
             origData = None
             origLength = None
@@ -198,6 +236,8 @@ class WOFFFont(TTFont):
             elif self.reader is not None:
                 if recompressTables:
                     origData = self.getTableData(tag)
+                elif passThrough:
+                    origData, origLength, origChecksum, compLength = self.reader.getCompressedTableSlice(tag)
                 else:
                     if self.verbose:
                         debugmsg("Reading '%s' table from disk" % tag)
@@ -209,15 +249,7 @@ class WOFFFont(TTFont):
         metaOrigLength = None
         metaLength = None
         if hasattr(self, "metadata"):
-            declaration = "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
-            tree = ElementTree.ElementTree(self.metadata)
-            f = StringIO()
-            tree.write(f, encoding="utf-8")
-            metadata = f.getvalue()
-            # make sure the metadata starts with the declaration
-            if not metadata.startswith(declaration):
-                metadata = declaration + metadata
-            del f
+            metadata = self._compileMetadata()
         elif self.reader is not None:
             if recompressTables:
                 metadata = self.reader.metadata
@@ -226,14 +258,312 @@ class WOFFFont(TTFont):
         if metadata:
             writer.setMetadata(metadata, metaOrigLength=metaOrigLength, metaLength=metaLength)
         # write the private data
-        privData = self.privateData
+        if passThrough and self.reader is not None and "privateData" not in self.__dict__:
+            privData = self.reader.getPrivateDataSlice()
+        else:
+            privData = self.privateData
         if privData:
             writer.setPrivateData(privData)
         # close the writer
-        writer.close()
+        data = writer.close()
         # close the file
         if closeStream:
             file.close()
+        return data
+
+    def toBytes(self, **kwargs):
+        """
+        Compile the WOFF and return it as a bytearray. The
+        keyword arguments are the same as those for save.
+        """
+        return self.save(None, **kwargs)
+
+    def saveMany(self, targets, reorderTables=True, recalculateHeadChecksum=True):
+        """
+        Save the font to several files at once. targets is a
+        list of dicts. Each dict must have a "file" key with a
+        path, a file object or None. It may have a "format" key
+        with "woff", the default, or "sfnt" to write a plain sfnt.
+        WOFF targets may have a "compressionLevel" key. The
+        default is 9.
+
+        Each table is compiled and checksummed only once, and the
+        head checkSumAdjustment is calculated only once. The data
+        is then given to every target. The targets are compressed
+        in parallel threads.
+
+        reorderTables and recalculateHeadChecksum apply to all
+        targets and have the same meaning as they do in save.
+
+        This returns a list with one item for each target. For
+        targets with None as the file, the item is the data.
+        """
+        tags = self._getSaveOrder(reorderTables, recalculateHeadChecksum)
+        # compile and checksum each table once
+        tableData = {}
+        checksums = {}
+        tables = {}
+        offset = sfntDirectorySize + (sfntDirectoryEntrySize * len(tags))
+        for tag in tags:
+            data = self.getTableData(tag)
+            tableData[tag] = data
+            checksums[tag] = calcTableChecksum(tag, data)
+            tables[tag] = dict(offset=offset, length=len(data), checkSum=checksums[tag])
+            offset += calc4BytePaddedLength(len(data))
+        # calculate the checkSumAdjustment once. the head
+        # checksum does not include it, so that stays the same.
+        if recalculateHeadChecksum and "head" in tableData:
+            if self.verbose:
+                debugmsg("updating head checkSumAdjustment")
+            checkSumAdjustment = calcHeadCheckSumAdjustment(self.flavor, tables)
+            data = tableData["head"]
+            tableData["head"] = data[:8] + struct.pack(">L", checkSumAdjustment) + data[12:]
+        metadata = self._compileMetadata()
+        privateData = self.privateData
+        # write the targets in parallel
+        results = [None] * len(targets)
+        errors = []
+        def saveTarget(index, target):
+            try:
+                results[index] = self._saveTarget(target, tags, tableData, checksums, tables, metadata, privateData)
+            except Exception:
+                errors.append(sys.exc_info()[1])
+        threads = []
+        for index, target in enumerate(targets):
+            thread = threading.Thread(target=saveTarget, args=(index, target))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def _saveTarget(self, target, tags, tableData, checksums, tables, metadata, privateData):
+        file = target["file"]
+        targetFormat = target.get("format", "woff")
+        if targetFormat not in ("woff", "sfnt"):
+            raise WOFFLibError("Unknown format: %s" % targetFormat)
+        # open a file if necessary
+        closeStream = False
+        if file is not None and not hasattr(file, "write"):
+            closeStream = True
+            file = open(file, "wb")
+        try:
+            if targetFormat == "sfnt":
+                chunks = [packSFNTDirectory(self.flavor, tables)]
+                for tag in tags:
+                    data = tableData[tag]
+                    chunks.append(data)
+                    chunks.append(b"\0" * (calc4BytePaddedLength(len(data)) - len(data)))
+                if file is None:
+                    return b"".join(chunks)
+                for chunk in chunks:
+                    file.write(chunk)
+                return None
+            writer = WOFFWriter(file, len(tags), flavor=self.flavor,
+                majorVersion=self.majorVersion, minorVersion=self.minorVersion,
+                compressionLevel=target.get("compressionLevel", 9),
+                recalculateHeadChecksum=False, verbose=self.verbose)
+            for tag in tags:
+                writer.setTable(tag, tableData[tag], origChecksum=checksums[tag], verified=True)
+            if metadata:
+                writer.setMetadata(metadata)
+            if privateData:
+                writer.setPrivateData(privateData)
+            return writer.close()
+        finally:
+            if closeStream:
+                file.close()
+
+    # ----------------
+    # Web Optimization
+    # ----------------
+
+    def optimizeForWeb(self, dropTables=webIgnoredTables, postFormat3=True, pruneCmap=True,
+            pruneNames=True, stripHinting=False, compressionLevel=9):
+        """
+        Remove data that browsers do not use. The font is changed
+        in place. Each action can be turned off:
+
+        dropTables is a list of tables to remove. The default is
+        the tables that browsers ignore: DSIG, hdmx, VDMX, LTSH
+        and PCLT. Removing the DSIG allows the tables to be
+        reordered and the head checkSumAdjustment to be recalculated.
+
+        If postFormat3 is True, the post table is converted to
+        format 3, which has no glyph names.
+
+        If pruneCmap is True, Unicode platform cmap subtables with
+        mappings that are also in the Windows Unicode subtables
+        are removed, as are Macintosh subtables when there is a
+        Windows Unicode subtable. Windows subtables and format 14
+        subtables are always kept.
+
+        If pruneNames is True, Macintosh name records that have a
+        Windows equivalent are removed. Records with name IDs of
+        256 and above are removed unless they are referenced by
+        the fvar table or the font has another table that can
+        reference them.
+
+        If stripHinting is True, the TrueType instructions and the
+        cvt, fpgm, prep and cvar tables are removed. This has no
+        effect on CFF fonts.
+
+        This returns a dict with the number of bytes saved by each
+        action, measured as compressed with compressionLevel.
+        """
+        report = {}
+        actions = (
+            ("dropTables", dropTables and (lambda compressionLevel: self._webDropTables(dropTables, compressionLevel))),
+            ("postFormat3", postFormat3 and self._webPostFormat3),
+            ("pruneCmap", pruneCmap and self._webPruneCmap),
+            ("pruneNames", pruneNames and self._webPruneNames),
+            ("stripHinting", stripHinting and self._webStripHinting)
+        )
+        for action, function in actions:
+            if not function:
+                continue
+            tags = function(compressionLevel)
+            if not tags:
+                report[action] = 0
+                continue
+            saved = 0
+            for tag, before in tags.items():
+                saved += before
+                if tag in self:
+                    saved -= self._webTableSize(tag, compressionLevel) + woffDirectoryEntrySize
+            report[action] = saved
+        return report
+
+    def _webTableSize(self, tag, compressionLevel):
+        data = self.getTableData(tag)
+        compLength = len(getCompressionBackend().compress(data, compressionLevel))
+        return calc4BytePaddedLength(min(compLength, len(data)))
+
+    def _webSizes(self, tags, compressionLevel):
+        return dict((tag, self._webTableSize(tag, compressionLevel) + woffDirectoryEntrySize) for tag in tags if tag in self)
+
+    # Each of these changes the font and returns a dict with the
+    # sizes, including the directory entry, of the tables it touched.
+
+    def _webDropTables(self, dropTables, compressionLevel):
+        sizes = self._webSizes(dropTables, compressionLevel)
+        for tag in sizes:
+            del self[tag]
+        if self._tableOrder is not None:
+            self._tableOrder = [tag for tag in self._tableOrder if tag not in sizes]
+        return sizes
+
+    def _webPostFormat3(self, compressionLevel):
+        if "post" not in self or self["post"].formatType == 3.0:
+            return None
+        sizes = self._webSizes(["post"], compressionLevel)
+        post = self["post"]
+        post.formatType = 3.0
+        for attr in ("extraNames", "mapping", "glyphOrder", "data"):
+            if hasattr(post, attr):
+                delattr(post, attr)
+        return sizes
+
+    def _webPruneCmap(self, compressionLevel):
+        if "cmap" not in self:
+            return None
+        cmap = self["cmap"]
+        windows = {}
+        hasWindowsUnicode = False
+        for table in cmap.tables:
+            if table.platformID == 3 and table.platEncID in (1, 10):
+                hasWindowsUnicode = True
+                windows.update(table.cmap)
+        if not hasWindowsUnicode:
+            return None
+        keep = []
+        for table in cmap.tables:
+            if table.platformID == 3 or table.format == 14:
+                keep.append(table)
+            elif table.platformID == 0:
+                if any(windows.get(code) != glyphName for code, glyphName in table.cmap.items()):
+                    keep.append(table)
+        if len(keep) == len(cmap.tables):
+            return None
+        sizes = self._webSizes(["cmap"], compressionLevel)
+        cmap.tables = keep
+        return sizes
+
+    def _webPruneNames(self, compressionLevel):
+        if "name" not in self:
+            return None
+        name = self["name"]
+        windowsNameIDs = set([record.nameID for record in name.names if record.platformID == 3])
+        referencedNameIDs = set()
+        keepHighNameIDs = False
+        for tag in webNameReferencingTables:
+            if tag in self:
+                keepHighNameIDs = True
+        if "fvar" in self:
+            fvar = self["fvar"]
+            referencedNameIDs.update([axis.axisNameID for axis in fvar.axes])
+            referencedNameIDs.update([instance.subfamilyNameID for instance in fvar.instances])
+            referencedNameIDs.update([instance.postscriptNameID for instance in fvar.instances])
+        keep = []
+        for record in name.names:
+            if record.platformID == 1 and record.nameID in windowsNameIDs:
+                continue
+            if record.nameID >= 256 and not keepHighNameIDs and record.nameID not in referencedNameIDs:
+                continue
+            keep.append(record)
+        if len(keep) == len(name.names):
+            return None
+        sizes = self._webSizes(["name"], compressionLevel)
+        name.names = keep
+        return sizes
+
+    def _webStripHinting(self, compressionLevel):
+        if "glyf" not in self:
+            return None
+        tags = ["glyf", "maxp"] + [tag for tag in webHintingTables if tag in self]
+        sizes = self._webSizes(tags, compressionLevel)
+        glyf = self["glyf"]
+        for glyphName in glyf.keys():
+            glyf[glyphName].removeHinting()
+        maxp = self["maxp"]
+        if maxp.tableVersion == 0x00010000:
+            maxp.maxZones = 1
+            maxp.maxTwilightPoints = 0
+            maxp.maxStorage = 0
+            maxp.maxFunctionDefs = 0
+            maxp.maxInstructionDefs = 0
+            maxp.maxStackElements = 0
+            maxp.maxSizeOfInstructions = 0
+        for tag in webHintingTables:
+            if tag in self:
+                del self[tag]
+        if self._tableOrder is not None:
+            self._tableOrder = [tag for tag in self._tableOrder if tag not in webHintingTables]
+        return sizes
+
+    def _getSaveOrder(self, reorderTables, recalculateHeadChecksum):
+        # if DSIG is to be written, the table order
+        # must be completely specified. otherwise the
+        # DSIG may not be valid after decoding the WOFF.
+        tags = self.keys()
+        if "GlyphOrder" in tags:
+            tags.remove("GlyphOrder")
+        if "DSIG" in tags:
+            if self._tableOrder is None or (set(self._tableOrder) != set(tags)):
+                raise WOFFLibError("A complete table order must be supplied when saving a font with a 'DSIG' table.")
+            elif reorderTables:
+                raise WOFFLibError("Tables can not be reordered when a 'DSIG' table is in the font. Set reorderTables to False.")
+            elif recalculateHeadChecksum:
+                raise WOFFLibError("The 'head' table checkSumAdjustment can not be recalculated when a 'DSIG' table is in the font.")
+        # sort the tags if necessary
+        if reorderTables:
+            tags = sortedTagList(tags)
+        return tags
+
+    def _compileMetadata(self):
+        return compileMetadata(self.metadata)
 
     def saveXML(self):
         raise NotImplementedError
@@ -310,25 +640,103 @@ class WOFFReader(object):
         data = self.file.read(entry.compLength)
         # decompress if necessary
         if entry.compLength < entry.origLength:
-            data = zlib.decompress(data)
+            data = getCompressionBackend().decompress(data, entry.origLength + 1)
+            if len(data) > entry.origLength:
+                raise WOFFLibError("origLength is not correct in the '%s' table entry." % tag)
         else:
             data = data[:entry.origLength]
         # compare the checksums
         if self.checkChecksums:
-            checksum = calcTableChecksum(tag, data)
-            if self.checkChecksums > 1:
-                assert checksum == entry.origChecksum, "bad checksum for '%s' table" % tag
-            elif checksum != entry.origChecksum:
-                print("bad checksum for '%s' table" % tag)
-            print()
+            self._checkChecksum(tag, calcTableChecksum(tag, data))
         return data
 
+    def _checkChecksum(self, tag, checksum):
+        entry = self.tables[tag]
+        if self.checkChecksums > 1:
+            assert checksum == entry.origChecksum, "bad checksum for '%s' table" % tag
+        elif checksum != entry.origChecksum:
+            print("bad checksum for '%s' table" % tag)
+
+    def iterTableChunks(self, tag):
+        """
+        Iterate over the uncompressed data for the table
+        in chunks, without loading the whole table. The
+        checksum is verified after the last chunk if
+        checkChecksums is set. No chunk is larger than
+        WOFFDataSlice.chunkSize and a WOFFLibError is raised
+        as soon as the data is longer than origLength.
+        """
+        entry = self.tables[tag]
+        accumulator = None
+        if self.checkChecksums:
+            accumulator = ChecksumAccumulator(tag)
+        if entry.compLength < entry.origLength:
+            decompressor = getCompressionBackend().decompressobj()
+            chunks = WOFFDataSlice(self.file, entry.offset, entry.compLength).iterChunks()
+        else:
+            decompressor = None
+            chunks = WOFFDataSlice(self.file, entry.offset, entry.origLength).iterChunks()
+        length = 0
+        for chunk in chunks:
+            while len(chunk):
+                if decompressor is not None:
+                    data = decompressor.decompress(chunk, WOFFDataSlice.chunkSize)
+                    chunk = decompressor.unconsumed_tail
+                else:
+                    data = chunk
+                    chunk = b""
+                length += len(data)
+                if length > entry.origLength:
+                    raise WOFFLibError("origLength is not correct in the '%s' table entry." % tag)
+                if accumulator is not None:
+                    accumulator.update(data)
+                yield data
+        if decompressor is not None:
+            data = decompressor.flush()
+            length += len(data)
+            if length > entry.origLength:
+                raise WOFFLibError("origLength is not correct in the '%s' table entry." % tag)
+            if accumulator is not None:
+                accumulator.update(data)
+            yield data
+        if accumulator is not None:
+            self._checkChecksum(tag, accumulator.getChecksum())
+
+    def calcTableChecksum(self, tag):
+        """
+        Calculate the checksum of the uncompressed data for
+        the table without loading the whole table.
+        """
+        accumulator = ChecksumAccumulator(tag)
+        checkChecksums = self.checkChecksums
+        self.checkChecksums = 0
+        try:
+            for chunk in self.iterTableChunks(tag):
+                accumulator.update(chunk)
+        finally:
+            self.checkChecksums = checkChecksums
+        return accumulator.getChecksum()
+
     def getCompressedTableData(self, tag):
         entry = self.tables[tag]
         self.file.seek(entry.offset)
         data = self.file.read(entry.compLength)
         return data, entry.origLength, entry.origChecksum, entry.compLength
 
+    def getCompressedTableSlice(self, tag):
+        """
+        The same as getCompressedTableData, but the data
+        is returned as a WOFFDataSlice rather than read.
+        """
+        entry = self.tables[tag]
+        data = WOFFDataSlice(self.file, entry.offset, entry.compLength)
+        return data, entry.origLength, entry.origChecksum, entry.compLength
+
+    def getPrivateDataSlice(self):
+        if not self.privLength:
+            return None
+        return WOFFDataSlice(self.file, self.privOffset, self.privLength)
+
     def getCompressedMetadata(self):
         self.file.seek(self.metaOffset)
         data = self.file.read(self.metaLength)
@@ -344,7 +752,7 @@ class WOFFReader(object):
             self.file.seek(self.metaOffset)
             data = self.file.read(self.metaLength)
             if self.metaLength:
-                data = zlib.decompress(data)
+                data = getCompressionBackend().decompress(data, self.metaOrigLength + 1)
                 assert len(data) == self.metaOrigLength
             return data
 
@@ -360,8 +768,8 @@ class WOFFWriter(object):
 
     def __init__(self, file, numTables, flavor="\000\001\000\000",
             majorVersion=0, minorVersion=0, compressionLevel=9,
-            recalculateHeadChecksum=True,
-            verbose=False):
+            recalculateHeadChecksum=True, streaming=False,
+            spillThreshold=None, compressionCache=None, verbose=False):
         self.signature = "wOFF"
         self.flavor = flavor
         self.length = woffHeaderSize + (numTables * woffDirectoryEntrySize)
@@ -379,6 +787,9 @@ class WOFFWriter(object):
         self.file = file
         self.compressionLevel = compressionLevel
         self.recalculateHeadChecksum = recalculateHeadChecksum
+        self.streaming = streaming
+        self.spillThreshold = spillThreshold
+        self.compressionCache = compressionCache
         self.verbose = verbose
 
         # the data is held to facilitate the
@@ -388,24 +799,68 @@ class WOFFWriter(object):
         self.privateData = None
         self.tableDataEnd = 0
         self.metadataEnd = 0
+        self._output = None
+        # large tables are moved to this file when
+        # a spillThreshold is given. tables that have
+        # been spilled are checked for conformance
+        # before they are moved.
+        self._spillFile = None
+        self._checkedTables = set()
 
     def _tableOrder(self):
         return [entry.tag for index, entry, data in sorted(self.tables.values())]
 
-    def setTable(self, tag, data, origLength=None, origChecksum=None, compLength=None):
+    def setTable(self, tag, data, origLength=None, origChecksum=None, compLength=None, verified=False):
+        """
+        Set the data for a table. If compLength is None, data
+        will be compressed. Otherwise, data is assumed to be
+        already compressed and origLength, origChecksum and
+        compLength must all be given. If origChecksum is given
+        for uncompressed data, it will be used instead of being
+        calculated.
+
+        The directory entry values given by the caller are
+        checked when the writer is closed. Set verified to True
+        to skip that because the values are already known to
+        be correct, for example after checkSFNTConformance.
+        """
         # don't compress the head if the checkSumAdjustment needs to be recalculated
         # the compression will be handled later.
         if self.recalculateHeadChecksum and tag == "head":
+            if isinstance(data, WOFFDataSlice):
+                data = data.read()
             # decompress
             if compLength is not None and compLength < origLength:
-                data = zlib.decompress(data)
+                data = getCompressionBackend().decompress(data)
             entry = self._prepTable(tag, data, origLength=len(data), entryOnly=True)
         # compress
         else:
+            # data compressed and checksummed here
+            # conforms by construction.
+            if compLength is None and origChecksum is None:
+                verified = True
             entry, data = self._prepTable(tag, data=data, origLength=origLength, origChecksum=origChecksum, compLength=compLength)
+            if verified:
+                self._checkedTables.add(tag)
+            # move the data to the spill file
+            if self.spillThreshold is not None and len(data) > self.spillThreshold and not isinstance(data, WOFFDataSlice):
+                if tag not in self._checkedTables:
+                    self._checkTableConformance(entry, data)
+                    self._checkedTables.add(tag)
+                data = self._spillData(data)
         # store
         self.tables[tag] = (len(self.tables), entry, data)
 
+    def _spillData(self, data):
+        if self._spillFile is None:
+            self._spillFile = tempfile.TemporaryFile()
+        if self.verbose:
+            debugmsg("moving %d bytes to the spill file" % len(data))
+        self._spillFile.seek(0, 2)
+        offset = self._spillFile.tell()
+        self._spillFile.write(data)
+        return WOFFDataSlice(self._spillFile, offset, len(data))
+
     def setMetadata(self, data, metaOrigLength=None, metaLength=None):
         if not data:
             return
@@ -413,7 +868,7 @@ class WOFFWriter(object):
             if self.verbose:
                 debugmsg("compressing metadata")
             metaOrigLength = len(data)
-            data = zlib.compress(data, self.compressionLevel)
+            data = getCompressionBackend().compress(data, self.compressionLevel)
             metaLength = len(data)
         # set the header values
         self.metaOrigLength = metaOrigLength
@@ -438,18 +893,22 @@ class WOFFWriter(object):
             self._handleHeadChecksum()
         # check the table directory conformance
         for tag, (index, entry, data) in sorted(self.tables.items()):
+            if tag in self._checkedTables:
+                continue
             self._checkTableConformance(entry, data)
+        # calculate all offsets and lengths so that
+        # everything can be written in a single pass.
+        self._calcLayout()
+        # if data has been spilled or is being copied from
+        # another file, write directly to the file so that
+        # the data never has to be in memory.
+        if self.file is not None and self._haveDataSlices():
+            self._writeDirect()
+            return
+        # assemble everything in one preallocated buffer
+        self._output = WOFFOutputBuffer(self.length)
         # write the header
-        header = sstruct.pack(woffHeaderFormat, self)
-        self.file.seek(0)
-        self.file.write(header)
-        # update the directory offsets
-        offset = woffHeaderSize + (woffDirectoryEntrySize * self.numTables)
-        order = self._tableOrder()
-        for tag in order:
-            index, entry, data = self.tables[tag]
-            entry.offset = offset
-            offset += calc4BytePaddedLength(entry.compLength) # ensure byte alignment
+        self._writeHeader()
         # write the directory
         self._writeTableDirectory()
         # write the table data
@@ -458,17 +917,90 @@ class WOFFWriter(object):
         self._writeMetadata()
         # write the private data
         self._writePrivateData()
-        # write the header
+        assert self._output.position == self.length
+        data = self._output.data
+        self._output = None
+        # the spill file is no longer needed
+        if self._spillFile is not None:
+            self._spillFile.close()
+            self._spillFile = None
+        # no file, return the data
+        if self.file is None:
+            return data
+        # go to the beginning of the file
+        if not self.streaming:
+            self.file.seek(0)
+        self.file.write(data)
+        # go to the beginning of the file
+        if not self.streaming:
+            self.file.seek(0)
+
+    def _haveDataSlices(self):
+        if isinstance(self.privateData, WOFFDataSlice):
+            return True
+        for index, entry, data in self.tables.values():
+            if isinstance(data, WOFFDataSlice):
+                return True
+        return False
+
+    def _writeDirect(self):
+        self._output = WOFFOutputStream(self.file)
+        # go to the beginning of the file
+        if not self.streaming:
+            self.file.seek(0)
         self._writeHeader()
+        self._writeTableDirectory()
+        self._writeTableData()
+        self._writeMetadata()
+        self._writePrivateData()
+        self._output = None
+        if self._spillFile is not None:
+            self._spillFile.close()
+            self._spillFile = None
         # go to the beginning of the file
-        self.file.seek(0)
+        if not self.streaming:
+            self.file.seek(0)
+
+    # layout support
+
+    def _calcLayout(self):
+        """
+        Calculate the table offsets, the metadata and private
+        data offsets, the length and the totalSFNTSize. After
+        this has been called, the header, directory, table data,
+        metadata and private data can be written in order
+        without going back to update anything.
+        """
+        offset = woffHeaderSize + (woffDirectoryEntrySize * self.numTables)
+        self.totalSFNTSize = sfntDirectorySize + (sfntDirectoryEntrySize * self.numTables)
+        # update the directory offsets
+        for tag in self._tableOrder():
+            index, entry, data = self.tables[tag]
+            entry.offset = offset
+            offset += calc4BytePaddedLength(entry.compLength) # ensure byte alignment
+            self.totalSFNTSize += calc4BytePaddedLength(entry.origLength) # ensure byte alignment
+        # store the end for use by metadata or private data
+        self.tableDataEnd = offset
+        # metadata
+        if self.metadata is not None:
+            self.metaOffset = offset
+            offset += self.metaLength
+            # if private data exists, pad to a four byte boundary
+            if self.privateData is not None:
+                offset = calc4BytePaddedLength(offset)
+            # store the end for use by private data
+            self.metadataEnd = offset
+        # private data
+        if self.privateData is not None:
+            self.privOffset = offset
+            offset += self.privLength
+        self.length = offset
 
     # header support
 
     def _writeHeader(self):
         header = sstruct.pack(woffHeaderFormat, self)
-        self.file.seek(0)
-        self.file.write(header)
+        self._output.write(header)
 
     # sfnt support
 
@@ -476,7 +1008,7 @@ class WOFFWriter(object):
         # skip data prep
         if entryOnly:
             origLength = origLength
-            origChecksum = calcTableChecksum(tag, data)
+            origChecksum = _calcDataChecksum(tag, data)
             compLength = 0
         # prep the data
         else:
@@ -484,10 +1016,9 @@ class WOFFWriter(object):
             if compLength is None:
                 origData = data
                 origLength = len(origData)
-                origChecksum = calcTableChecksum(tag, data)
-                if self.verbose:
-                    debugmsg("compressing '%s' table" % tag)
-                compData = zlib.compress(origData, self.compressionLevel)
+                if origChecksum is None:
+                    origChecksum = _calcDataChecksum(tag, data)
+                compData = self._compressTable(tag, origData, origChecksum)
                 compLength = len(compData)
                 if origLength <= compLength:
                     data = origData
@@ -506,6 +1037,31 @@ class WOFFWriter(object):
             return entry
         return entry, data
 
+    def _compressTable(self, tag, data, checksum):
+        cache = self.compressionCache
+        if cache is not None:
+            key = cache.makeKey(checksum, data, self._compressionSettings())
+            compData = cache.get(key)
+            if compData is not None:
+                if self.verbose:
+                    debugmsg("using cached compressed '%s' table" % tag)
+                return compData
+        backend = getCompressionBackend()
+        if self.verbose:
+            debugmsg("compressing '%s' table with %s" % (tag, backend.name))
+        compData = backend.compress(data, self.compressionLevel)
+        if cache is not None:
+            cache.set(key, compData)
+        return compData
+
+    def _compressionSettings(self):
+        """
+        A string describing everything that affects the
+        compressed data. This is part of the compression
+        cache key.
+        """
+        return "%s level=%d" % (getCompressionBackend().name, self.compressionLevel)
+
     def _checkTableConformance(self, entry, data):
         """
         Check the conformance of the table directory entries.
@@ -517,9 +1073,15 @@ class WOFFWriter(object):
         # origLength must be less than or equal to compLength
         if entry.origLength < entry.compLength:
             raise WOFFLibError("origLength and compLength are not correct in the '%s' table entry." % entry.tag)
+        # data that is copied directly from another file
+        # is not loaded, so only the lengths can be checked.
+        if isinstance(data, WOFFDataSlice):
+            if entry.compLength != len(data):
+                raise WOFFLibError("compLength is not correct in the '%s' table entry." % entry.tag)
+            return
         # unpack the data as needed
         if entry.origLength > entry.compLength:
-            origData = zlib.decompress(data)
+            origData = getCompressionBackend().decompress(data, entry.origLength + 1)
             compData = data
         else:
             origData = data
@@ -559,25 +1121,20 @@ class WOFFWriter(object):
     def _writeTableDirectory(self):
         if self.verbose:
             debugmsg("writing table directory")
-        self.file.seek(woffHeaderSize)
         for tag, (index, entry, data) in sorted(self.tables.items()):
             entry = sstruct.pack(woffDirectoryEntryFormat, entry)
-            self.file.write(entry)
+            self._output.write(entry)
 
     def _writeTableData(self):
-        d = woffHeaderSize + (woffDirectoryEntrySize * self.numTables)
-        offset = woffHeaderSize + (woffDirectoryEntrySize * self.numTables)
-        self.file.seek(offset)
         for tag in self._tableOrder():
             if self.verbose:
                 debugmsg("writing '%s' table" % tag)
             index, entry, data = self.tables[tag]
-            data += "\0" * (calc4BytePaddedLength(entry.compLength) - entry.compLength ) # ensure byte alignment
-            self.file.write(data)
-            self.length += calc4BytePaddedLength(entry.compLength) # ensure byte alignment
-            self.totalSFNTSize += calc4BytePaddedLength(entry.origLength) # ensure byte alignment
-        # store the end for use by metadata or private data
-        self.tableDataEnd = self.length
+            if isinstance(data, WOFFDataSlice):
+                self._output.writeSlice(data)
+            else:
+                self._output.write(data)
+            self._output.writePadding(calc4BytePaddedLength(entry.compLength) - entry.compLength) # ensure byte alignment
 
     # metadata support
 
@@ -586,20 +1143,9 @@ class WOFFWriter(object):
             return
         if self.verbose:
             debugmsg("writing metadata")
-        self.length += self.metaLength
-        self.metaOffset = self.tableDataEnd
-        self.file.seek(self.metaOffset)
-        self.file.write(self.metadata)
-        # store the end for use by private data
-        self.metadataEnd = self.metaOffset + self.metaLength
+        self._output.write(self.metadata)
         # if private data exists, pad to a four byte boundary
-        if self.privateData is not None:
-            padding = calc4BytePaddedLength(self.metaLength) - self.metaLength
-            self.metadataEnd += padding
-            self.length += padding
-            padding = "\0" * padding
-            if padding:
-                self.file.write(padding)
+        self._output.writePadding(self.metadataEnd - (self.metaOffset + self.metaLength))
 
     # private data support
 
@@ -608,13 +1154,457 @@ class WOFFWriter(object):
             return
         if self.verbose:
             debugmsg("writing private data")
-        if self.metadata is not None:
-            self.privOffset = self.metadataEnd
+        if isinstance(self.privateData, WOFFDataSlice):
+            self._output.writeSlice(self.privateData)
+        else:
+            self._output.write(self.privateData)
+
+
+class WOFFOutputBuffer(object):
+
+    """
+    A preallocated buffer that the WOFFWriter assembles
+    the complete WOFF into. Data is copied into place
+    exactly once. The buffer is created with null bytes,
+    so padding only needs to advance the position.
+    """
+
+    def __init__(self, length):
+        self.data = bytearray(length)
+        self.position = 0
+
+    def write(self, data):
+        end = self.position + len(data)
+        self.data[self.position:end] = data
+        self.position = end
+
+    def writePadding(self, length):
+        self.position += length
+
+    def writeSlice(self, dataSlice):
+        for chunk in dataSlice.iterChunks():
+            self.write(chunk)
+
+
+class WOFFOutputStream(object):
+
+    """
+    The file equivalent of WOFFOutputBuffer. This is
+    used when the output should not be assembled
+    in memory.
+    """
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, data):
+        self.file.write(data)
+
+    def writePadding(self, length):
+        if length:
+            self.file.write("\0" * length)
+
+    def writeSlice(self, dataSlice):
+        for chunk in dataSlice.iterChunks():
+            self.file.write(chunk)
+
+
+class WOFFDataSlice(object):
+
+    """
+    A reference to a block of data in a file. This
+    allows the WOFFWriter to write data without
+    holding all of it in memory at once.
+    """
+
+    chunkSize = 1 << 16
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.offset = offset
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def read(self):
+        self.file.seek(self.offset)
+        return self.file.read(self.length)
+
+    def iterChunks(self, start=0):
+        position = self.offset + start
+        end = self.offset + self.length
+        while position < end:
+            self.file.seek(position)
+            chunk = self.file.read(min(self.chunkSize, end - position))
+            if not chunk:
+                raise WOFFLibError("Unexpected end of data at %d." % position)
+            position += len(chunk)
+            yield chunk
+
+    def writeTo(self, output):
+        for chunk in self.iterChunks():
+            output.write(chunk)
+
+
+def _calcDataChecksum(tag, data):
+    """
+    Calculate the checksum for table data. Data
+    in a WOFFDataSlice is read in chunks.
+    """
+    if isinstance(data, WOFFDataSlice):
+        accumulator = ChecksumAccumulator(tag)
+        for chunk in data.iterChunks():
+            accumulator.update(chunk)
+        return accumulator.getChecksum()
+    return calcTableChecksum(tag, data)
+
+# --------------------
+# Compression Backends
+# --------------------
+
+class CompressionBackend(object):
+
+    """
+    A zlib compatible compression implementation. All
+    backends produce and read standard zlib streams, so
+    the choice of backend changes the speed and the exact
+    compressed bytes but never the validity of a file.
+
+    maxLevel is the highest compression level the module
+    supports. The zlib levels 1 to 9 are scaled to fit.
+    """
+
+    # the size of the chunks that are decompressed
+    # and discarded after maxLength has been reached
+    drainChunkSize = 1 << 16
+
+    def __init__(self, name, module, maxLevel=9):
+        self.name = name
+        self.module = module
+        self.maxLevel = maxLevel
+        self.error = module.error
+
+    def __repr__(self):
+        return "<CompressionBackend %s>" % self.name
+
+    def _level(self, level):
+        if self.maxLevel == 9:
+            return level
+        return min(self.maxLevel, (level * self.maxLevel + 8) // 9)
+
+    def compress(self, data, level=9):
+        return self.module.compress(bytes(data), self._level(level))
+
+    def decompress(self, data, maxLength=None, sink=None):
+        """
+        Decompress data. If maxLength is given, no more than
+        maxLength bytes are returned, so data that claims to
+        be small can not inflate to a much larger size. The
+        rest of the stream is still decompressed, in chunks
+        of no more than drainChunkSize bytes that are
+        discarded, so a corrupt or truncated stream raises
+        an error.
+
+        If sink is given, it is called with each chunk of
+        the decompressed data, including the returned data.
+        This can be used to find the length or the checksum
+        of the complete data.
+        """
+        data = bytes(data)
+        if not maxLength:
+            result = self.module.decompress(data)
+            if sink is not None:
+                sink(result)
+            return result
+        decompressor = self.module.decompressobj()
+        result = decompressor.decompress(data, maxLength)
+        if sink is not None:
+            sink(result)
+        chunk = result
+        while chunk or decompressor.unconsumed_tail:
+            chunk = decompressor.decompress(decompressor.unconsumed_tail, self.drainChunkSize)
+            if sink is not None:
+                sink(chunk)
+        if not self._isComplete(decompressor):
+            raise self.error("Error -5 while decompressing data: incomplete or truncated stream")
+        return result
+
+    def _isComplete(self, decompressor):
+        """
+        Tell if the decompressor has reached the end of the
+        stream. Python 2 decompressors have no eof attribute
+        and their flush does not fail on a truncated stream.
+        Once the stream has ended, any further input is put
+        in unused_data, so a single byte is fed to find out.
+        """
+        eof = getattr(decompressor, "eof", None)
+        if eof is not None:
+            return eof
+        if decompressor.unused_data:
+            return True
+        try:
+            decompressor.decompress(b"\0")
+        except self.error:
+            return False
+        return bool(decompressor.unused_data)
+
+    def decompressobj(self):
+        return self.module.decompressobj()
+
+# The known backends in order of preference.
+# Each is (name, module name, maximum level).
+# isal is the fastest, but it only has levels 1 to 3,
+# so it comes after zlib and is only used when it is
+# asked for. Otherwise level 9 would quietly give
+# larger files whenever isal is installed.
+
+compressionBackendModules = [
+    ("zlib-ng", "zlib_ng.zlib_ng", 9),
+    ("zlib", "zlib", 9),
+    ("isal", "isal.isal_zlib", 3),
+]
+
+_compressionBackends = {}
+_compressionBackend = None
+
+def _loadCompressionBackend(name):
+    if name not in _compressionBackends:
+        for backendName, moduleName, maxLevel in compressionBackendModules:
+            if backendName == name:
+                break
+        else:
+            raise WOFFLibError("Unknown compression backend: %s" % name)
+        try:
+            module = __import__(moduleName, fromlist=["compress"])
+        except ImportError:
+            module = None
+        if module is None:
+            _compressionBackends[name] = None
+        else:
+            _compressionBackends[name] = CompressionBackend(name, module, maxLevel)
+    return _compressionBackends[name]
+
+def getAvailableCompressionBackends():
+    """
+    The names of the compression backends that
+    can be imported, in order of preference.
+    """
+    return [name for name, moduleName, maxLevel in compressionBackendModules if _loadCompressionBackend(name) is not None]
+
+def setCompressionBackend(name=None):
+    """
+    Set the compression backend used for all compression and
+    decompression. If name is None, the first available
+    backend in compressionBackendModules is used. The WOFFTOOLS_COMPRESSION_BACKEND
+    environment variable is used the same way when no
+    backend has been set. This returns the backend.
+    """
+    global _compressionBackend
+    if name is None:
+        backend = _loadCompressionBackend(getAvailableCompressionBackends()[0])
+    else:
+        backend = _loadCompressionBackend(name)
+        if backend is None:
+            raise WOFFLibError("The %s compression backend is not installed." % name)
+    _compressionBackend = backend
+    return backend
+
+def getCompressionBackend():
+    """
+    Get the compression backend. The name attribute
+    tells which implementation is running.
+    """
+    if _compressionBackend is None:
+        return setCompressionBackend(os.environ.get("WOFFTOOLS_COMPRESSION_BACKEND") or None)
+    return _compressionBackend
+
+# -----------------
+# Compression Cache
+# -----------------
+
+class CompressionCache(object):
+
+    """
+    An on-disk cache of compressed table data.
+
+    The cache is content addressed. Entries are keyed by
+    the table checksum, the table length, a SHA-256 hash
+    of the table data and the compression settings, so
+    identical tables in different fonts, or in different
+    builds of the same font, only need to be compressed once.
+
+    directory is the directory that the cache is stored in.
+    It will be created if it does not exist. The cache may
+    be shared by several processes.
+
+    maxSize is the maximum number of bytes that the cache
+    should hold. When it is exceeded, the least recently
+    used entries are removed. maxAge is the maximum number
+    of seconds that an entry will be kept after it was
+    last used. Both are optional.
+
+    The hits, misses, stores and evictions attributes count
+    what happened while this object was in use. getStatistics
+    returns these along with the hit rate.
+    """
+
+    def __init__(self, directory, maxSize=None, maxAge=None):
+        self.directory = directory
+        self.maxSize = maxSize
+        self.maxAge = maxAge
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._size = sum([size for path, size, modified in self._entries()])
+
+    def makeKey(self, checksum, data, settings):
+        contentHash = hashlib.sha256(data).hexdigest()
+        key = "%08x %d %s %s" % (checksum, len(data), contentHash, settings)
+        return hashlib.sha256(tobytes(key)).hexdigest()
+
+    _tempSuffix = ".tmp"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """
+        Get the compressed data stored for key. If nothing
+        is stored, or the entry is too old, this returns None.
+        """
+        path = self._path(key)
+        try:
+            if self.maxAge is not None and time.time() - os.path.getmtime(path) > self.maxAge:
+                self._size -= self._remove(path) or 0
+                data = None
+            else:
+                f = open(path, "rb")
+                data = f.read()
+                f.close()
+                # mark the entry as recently used
+                os.utime(path, None)
+        except (IOError, OSError):
+            data = None
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def set(self, key, data):
+        """
+        Store compressed data for key.
+        """
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # another process made it
+                pass
+        # write to a temporary file and move it into
+        # place so that readers never see partial data.
+        descriptor, tempPath = tempfile.mkstemp(dir=directory, suffix=self._tempSuffix)
+        f = os.fdopen(descriptor, "wb")
+        f.write(data)
+        f.close()
+        try:
+            oldSize = os.path.getsize(path)
+        except OSError:
+            oldSize = 0
+        try:
+            os.rename(tempPath, path)
+        except OSError:
+            os.remove(tempPath)
+            return
+        self.stores += 1
+        self._size += len(data) - oldSize
+        if self.maxSize is not None and self._size > self.maxSize:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove entries that are older than maxAge and, if the
+        cache is larger than maxSize, remove the least recently
+        used entries until it is below the limit.
+        """
+        now = time.time()
+        entries = []
+        size = 0
+        for path, entrySize, modified in self._entries():
+            if self.maxAge is not None and now - modified > self.maxAge:
+                if self._remove(path) is not None:
+                    self.evictions += 1
+                continue
+            entries.append((modified, path, entrySize))
+            size += entrySize
+        if self.maxSize is not None and size > self.maxSize:
+            # go a little below the limit so that
+            # this doesn't need to happen on every set.
+            target = int(self.maxSize * 0.9)
+            for modified, path, entrySize in sorted(entries):
+                if size <= target:
+                    break
+                if self._remove(path) is not None:
+                    self.evictions += 1
+                size -= entrySize
+        self._size = size
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        for path, size, modified in self._entries():
+            self._remove(path)
+        self._size = 0
+
+    def _entries(self):
+        for subdirectory in os.listdir(self.directory):
+            subdirectory = os.path.join(self.directory, subdirectory)
+            if not os.path.isdir(subdirectory):
+                continue
+            for fileName in os.listdir(subdirectory):
+                # files that are still being written
+                if fileName.endswith(self._tempSuffix):
+                    continue
+                path = os.path.join(subdirectory, fileName)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _remove(self, path):
+        """
+        Remove the entry at path and return its size.
+        If it can not be removed, this returns None.
+        """
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return None
+        return size
+
+    def getStatistics(self):
+        lookups = self.hits + self.misses
+        if lookups:
+            hitRate = self.hits / float(lookups)
         else:
-            self.privOffset = self.tableDataEnd
-        self.length += self.privLength
-        self.file.seek(self.privOffset)
-        self.file.write(self.privateData)
+            hitRate = 0.0
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            hitRate=hitRate,
+            stores=self.stores,
+            evictions=self.evictions,
+            size=self._size
+        )
 
 
 # ---------
@@ -658,16 +1648,183 @@ class WOFFLibError(Exception): pass
 def calc4BytePaddedLength(length):
     return (length + 3) & ~3
 
+def compileMetadata(element):
+    """
+    Compile a metadata ElementTree Element to UTF-8 XML text.
+    """
+    declaration = "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+    tree = ElementTree.ElementTree(element)
+    f = StringIO()
+    tree.write(f, encoding="utf-8")
+    metadata = f.getvalue()
+    # make sure the metadata starts with the declaration
+    if not metadata.startswith(declaration):
+        metadata = declaration + metadata
+    del f
+    return metadata
+
+# ---------
+# Checksums
+# ---------
+
+# an array type code for unsigned 32-bit ints
+if array("I").itemsize == 4:
+    ulongTypeCode = "I"
+else:
+    ulongTypeCode = "L"
+# the number of ulongs summed at once without NumPy
+ulongChunkSize = 65536
+
+def sumULongs(data):
+    """
+    Sum the big-endian ulongs in data. If the length of data is
+    not a multiple of four, it is treated as if it were padded
+    with zeros. The sum is returned modulo 2**32. data may be
+    anything that supports the buffer interface, including a
+    memoryview or a mmap, and it is not copied when NumPy is
+    available. Without NumPy it is converted in chunks with the
+    standard library array module.
+
+    >>> sumULongs(b"\\0\\0\\0\\1\\0\\0\\0\\2")
+    3
+    >>> sumULongs(b"\\0\\0\\0\\1\\1")
+    16777217
+    >>> sumULongs(b"\\xff\\xff\\xff\\xff\\0\\0\\0\\2")
+    1
+    >>> sumULongs(b"")
+    0
+    """
+    length = len(data)
+    count = length // 4
+    value = 0
+    if count:
+        if numpy is not None:
+            # the sum wraps at 2**64, which does not
+            # change the value modulo 2**32.
+            value = int(numpy.frombuffer(data, dtype=">u4", count=count).sum(dtype=numpy.uint64))
+        else:
+            swap = sys.byteorder == "little"
+            for start in range(0, count * 4, ulongChunkSize * 4):
+                end = min(start + (ulongChunkSize * 4), count * 4)
+                ulongs = array(ulongTypeCode, _sliceBytes(data, start, end))
+                if swap:
+                    ulongs.byteswap()
+                value += sum(ulongs)
+    # the final partial ulong
+    if length % 4:
+        tail = _sliceBytes(data, count * 4, length)
+        value += struct.unpack(">L", tail + b"\0" * (4 - len(tail)))[0]
+    return int(value & 0xffffffff)
+
+def _sliceBytes(data, start, end):
+    data = data[start:end]
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    return bytes(data)
+
 def calcTableChecksum(tag, data):
-    if tag == "head":
-        checksum = calcChecksum(data[:8] + '\0\0\0\0' + data[12:])
-    else:
-        checksum = calcChecksum(data)
-    checksum = checksum & 0xffffffff
-    return checksum
+    """
+    Calculate the checksum for the table data. For the head
+    table, the checkSumAdjustment is not included. It is
+    subtracted from the sum rather than zeroed in a copy
+    of the data.
+
+    >>> calcTableChecksum("test", b"\\0\\0\\0\\1\\0\\0\\0\\2\\0\\0\\0\\4")
+    7
+    >>> calcTableChecksum("head", b"\\0\\0\\0\\1\\0\\0\\0\\2\\0\\0\\0\\4")
+    3
+    >>> calcTableChecksum("head", b"\\0\\0\\0\\1\\0\\0\\0\\2\\0\\1")
+    3
+    """
+    checksum = sumULongs(data)
+    if tag == "head" and len(data) > 8:
+        adjustment = _sliceBytes(data, 8, 12)
+        checksum -= struct.unpack(">L", adjustment + b"\0" * (4 - len(adjustment)))[0]
+    return int(checksum & 0xffffffff)
 
-def calcHeadCheckSumAdjustment(flavor, tables):
+class ChecksumAccumulator(object):
+
+    """
+    Calculate a table checksum from data that arrives in chunks
+    of any size. Bytes that do not complete a ulong are carried
+    over to the next chunk. The result is the same as the result
+    of calcTableChecksum for the complete data, including the
+    head checkSumAdjustment exclusion.
+
+    >>> data = b"\\0\\0\\0\\1\\0\\0\\0\\2\\0\\0\\0\\4\\0\\0\\1"
+    >>> accumulator = ChecksumAccumulator("head")
+    >>> for index in range(len(data)):
+    ...     accumulator.update(data[index:index + 1])
+    >>> accumulator.getChecksum() == calcTableChecksum("head", data)
+    True
+    >>> accumulator = ChecksumAccumulator("test")
+    >>> accumulator.update(data[:5])
+    >>> accumulator.update(data[5:])
+    >>> accumulator.getChecksum() == calcTableChecksum("test", data)
+    True
+    >>> accumulator.length
+    15
+    """
+
+    def __init__(self, tag=None):
+        self.tag = tag
+        self._sum = 0
+        self._ulongLength = 0
+        self._partial = b""
+
+    def _get_length(self):
+        return self._ulongLength + len(self._partial)
+
+    length = property(_get_length, doc="The number of bytes added so far.")
+
+    def update(self, data):
+        if not len(data):
+            return
+        if self._partial:
+            needed = 4 - len(self._partial)
+            self._partial += _sliceBytes(data, 0, needed)
+            if len(self._partial) < 4:
+                return
+            partial = self._partial
+            self._partial = b""
+            self._addULongs(partial)
+            data = data[needed:]
+        end = len(data) - (len(data) % 4)
+        if end == len(data):
+            self._addULongs(data)
+        elif end:
+            self._addULongs(data[:end])
+        if end < len(data):
+            self._partial = _sliceBytes(data, end, len(data))
+
+    def _addULongs(self, data):
+        if not len(data):
+            return
+        self._sum += sumULongs(data)
+        if self.tag == "head" and self._ulongLength <= 8 < self._ulongLength + len(data):
+            self._sum -= sumULongs(_sliceBytes(data, 8 - self._ulongLength, 12 - self._ulongLength))
+        self._ulongLength += len(data)
+
+    def getChecksum(self):
+        checksum = self._sum
+        if self._partial:
+            if not (self.tag == "head" and self._ulongLength == 8):
+                checksum += sumULongs(self._partial)
+        return int(checksum & 0xffffffff)
+
+# The searchRange in the sfnt header is a USHORT, so a sfnt
+# table directory can not hold more tables than this.
+maxSFNTTables = 4095
+
+def packSFNTDirectory(flavor, tables):
+    """
+    Pack a sfnt header and table directory. tables must
+    be a dict of tags mapped to dicts with offset, length
+    and checkSum keys.
+    """
     numTables = len(tables)
+    if numTables > maxSFNTTables:
+        raise WOFFLibError("A sfnt can not contain more than %d tables." % maxSFNTTables)
     # build the sfnt header
     searchRange, entrySelector, rangeShift = getSearchRange(numTables)
     sfntDirectoryData = dict(
@@ -678,23 +1835,627 @@ def calcHeadCheckSumAdjustment(flavor, tables):
         rangeShift=rangeShift
     )
     # build the sfnt directory
-    directory = sstruct.pack(sfntDirectoryFormat, sfntDirectoryData)
+    directory = [sstruct.pack(sfntDirectoryFormat, sfntDirectoryData)]
     for tag, entry in sorted(tables.items()):
-        entry = tables[tag]
         sfntEntry = SFNTDirectoryEntry()
         sfntEntry.tag = tag
         sfntEntry.checkSum = entry["checkSum"]
         sfntEntry.offset = entry["offset"]
         sfntEntry.length = entry["length"]
-        directory += sfntEntry.toString()
+        directory.append(sfntEntry.toString())
+    return b"".join(directory)
+
+def calcHeadCheckSumAdjustment(flavor, tables):
+    # build the sfnt directory
+    directory = packSFNTDirectory(flavor, tables)
     # calculate the checkSumAdjustment
     checkSums = [entry["checkSum"] for entry in tables.values()]
-    checkSums.append(calcChecksum(directory))
+    checkSums.append(sumULongs(directory))
     checkSumAdjustment = sum(checkSums)
     checkSumAdjustment = (0xB1B0AFBA - checkSumAdjustment) & 0xffffffff
     # done
     return checkSumAdjustment
 
+# ----------
+# Conversion
+# ----------
+
+def encodeSFNT(src, dst, compressionLevel=9, majorVersion=0, minorVersion=0,
+        metadata=None, privateData=None, checkConformance=True,
+        streaming=False, compressionCache=None, verbose=False):
+    """
+    Convert the sfnt in src to WOFF and write it to dst
+    without decompiling anything with FontTools. src and
+    dst may be paths or file objects. If dst is None, the
+    WOFF data is returned as a bytearray.
+
+    The tables are read one at a time, in the order that
+    they are stored in the sfnt, and given to a WOFFWriter.
+
+    If checkConformance is True, checkSFNTConformance is run
+    first and a WOFFLibError is raised if the sfnt does not
+    conform. In this case the checksums in the sfnt table
+    directory and the head checkSumAdjustment are known to be
+    correct, so they are used as they are. If checkConformance
+    is False, the checksums and the checkSumAdjustment are
+    recalculated.
+
+    metadata, if given, must be the XML metadata text.
+    privateData, if given, must be a string. The other
+    arguments are the same as those for WOFFWriter.
+    """
+    closeSource = closeDestination = False
+    if not hasattr(src, "read"):
+        src = open(src, "rb")
+        closeSource = True
+    if dst is not None and not hasattr(dst, "write"):
+        dst = open(dst, "wb")
+        closeDestination = True
+    try:
+        # unpack the header and directory
+        src.seek(0)
+        header = sstruct.unpack(sfntDirectoryFormat, src.read(sfntDirectorySize))
+        numTables = header["numTables"]
+        tableDirectory = []
+        for index in range(numTables):
+            entry = sstruct.unpack(sfntDirectoryEntryFormat, src.read(sfntDirectoryEntrySize))
+            tableDirectory.append(entry)
+        # check the conformance
+        if checkConformance:
+            src.seek(0)
+            errors = checkSFNTConformance(src)
+            if errors:
+                raise WOFFLibError("The sfnt data does not conform to the WOFF specification: %s" % " ".join(errors))
+        # write the tables
+        writer = WOFFWriter(dst, numTables, flavor=header["sfntVersion"],
+            majorVersion=majorVersion, minorVersion=minorVersion,
+            compressionLevel=compressionLevel, recalculateHeadChecksum=not checkConformance,
+            streaming=streaming, compressionCache=compressionCache, verbose=verbose)
+        for offset, entry in sorted([(entry["offset"], entry) for entry in tableDirectory]):
+            tag = entry["tag"]
+            if verbose:
+                debugmsg("reading '%s' table" % tag)
+            src.seek(offset)
+            data = src.read(entry["length"])
+            if checkConformance:
+                writer.setTable(tag, data, origChecksum=entry["checkSum"], verified=True)
+            else:
+                writer.setTable(tag, data)
+        if metadata:
+            writer.setMetadata(metadata)
+        if privateData:
+            writer.setPrivateData(privateData)
+        return writer.close()
+    finally:
+        if closeSource:
+            src.close()
+        if closeDestination:
+            dst.close()
+
+def decodeToSFNT(src, dst, verbose=False):
+    """
+    Convert the WOFF in src to sfnt and write it to dst
+    without decompiling anything with FontTools. src may be
+    a path, a file object or a WOFFReader. dst may be a path
+    or a file object.
+
+    The sfnt header and table directory are written first.
+    The table offsets are derived from the origLength values
+    with the tables in the order they are stored in the WOFF.
+    After that, each table is decompressed in chunks and
+    written, so no more than a chunk of a table is ever
+    in memory. If src is a WOFFReader with checkChecksums
+    set, the checksums are verified as the chunks are written.
+    """
+    closeSource = closeDestination = False
+    if isinstance(src, WOFFReader):
+        reader = src
+    else:
+        if not hasattr(src, "read"):
+            src = open(src, "rb")
+            closeSource = True
+        reader = WOFFReader(src, checkChecksums=0)
+    if not hasattr(dst, "write"):
+        dst = open(dst, "wb")
+        closeDestination = True
+    try:
+        order = reader.keys()
+        # build the directory
+        tables = {}
+        offset = sfntDirectorySize + (sfntDirectoryEntrySize * len(order))
+        for tag in order:
+            entry = reader.tables[tag]
+            tables[tag] = dict(offset=offset, length=entry.origLength, checkSum=entry.origChecksum)
+            offset += calc4BytePaddedLength(entry.origLength)
+        dst.write(packSFNTDirectory(reader.flavor, tables))
+        # write the tables
+        for tag in order:
+            if verbose:
+                debugmsg("writing '%s' table" % tag)
+            entry = reader.tables[tag]
+            length = 0
+            for chunk in reader.iterTableChunks(tag):
+                dst.write(chunk)
+                length += len(chunk)
+            if length != entry.origLength:
+                raise WOFFLibError("origLength is not correct in the '%s' table entry." % tag)
+            padding = calc4BytePaddedLength(length) - length
+            if padding:
+                dst.write(b"\0" * padding)
+    finally:
+        if closeSource:
+            src.close()
+        if closeDestination:
+            dst.close()
+
+def verifyRoundTrip(src):
+    """
+    Verify that the WOFF in src can be decoded to sfnt and
+    encoded again without any change to the table directory.
+    src may be a path or a file object.
+
+    The sfnt is laid out virtually, the same way that
+    decodeToSFNT lays it out. Each table is decompressed in
+    chunks and only its length and checksum are kept, so
+    neither the sfnt nor a complete table is ever in memory.
+    The lengths and checksums are compared to the origLength
+    and origChecksum values in the directory, and totalSFNTSize
+    and the head checkSumAdjustment are recalculated from the
+    virtual sfnt and compared to the stored values.
+
+    This returns a list of errors. An empty list means that
+    the round trip is exact.
+    """
+    closeSource = False
+    if not hasattr(src, "read"):
+        src = open(src, "rb")
+        closeSource = True
+    try:
+        reader = WOFFReader(src, checkChecksums=0)
+        errors = []
+        if len(reader.tables) != reader.numTables:
+            errors.append("The table directory contains duplicate tags.")
+        src.seek(0, 2)
+        fileLength = src.tell()
+        if reader.length != fileLength:
+            errors.append("The length in the header (%d) does not match the length of the file (%d)." % (reader.length, fileLength))
+        # tables that do not overlap can not contain more
+        # data than the file. if they do, decompressing
+        # them all could take far longer than the file
+        # size suggests, so stop here.
+        if sum([entry.compLength for entry in reader.tables.values()]) > fileLength:
+            errors.append("The tables contain more data than the file.")
+            return errors
+        backend = getCompressionBackend()
+        order = reader.keys()
+        tables = {}
+        headData = b""
+        offset = sfntDirectorySize + (sfntDirectoryEntrySize * len(order))
+        for tag in order:
+            entry = reader.tables[tag]
+            tableOffset = offset
+            offset += calc4BytePaddedLength(entry.origLength)
+            if entry.compLength > entry.origLength:
+                errors.append("The compLength of the %s table is larger than the origLength." % tag)
+            if entry.offset + min(entry.compLength, entry.origLength) > fileLength:
+                errors.append("The %s table data extends past the end of the file." % tag)
+                continue
+            accumulator = ChecksumAccumulator(tag)
+            try:
+                for chunk in reader.iterTableChunks(tag):
+                    accumulator.update(chunk)
+                    if tag == "head" and len(headData) < 12:
+                        headData += _sliceBytes(chunk, 0, 12 - len(headData))
+            except backend.error:
+                errors.append("The %s table can not be decompressed." % tag)
+                continue
+            except WOFFLibError:
+                errors.append("The origLength of the %s table is not correct." % tag)
+                continue
+            if accumulator.length != entry.origLength:
+                # a truncated stream ends early without an
+                # error, so find out if that is the cause.
+                if entry.compLength < entry.origLength:
+                    try:
+                        backend.decompress(reader.getCompressedTableData(tag)[0], entry.origLength + 1)
+                    except backend.error:
+                        errors.append("The %s table can not be decompressed." % tag)
+                        continue
+                errors.append("The origLength of the %s table is not correct." % tag)
+                continue
+            checksum = accumulator.getChecksum()
+            if checksum != entry.origChecksum:
+                errors.append("Invalid checksum for the %s table." % tag)
+            tables[tag] = dict(offset=tableOffset, length=entry.origLength, checkSum=checksum)
+        if offset != reader.totalSFNTSize:
+            errors.append("The totalSFNTSize value is incorrect.")
+        if len(order) > maxSFNTTables:
+            errors.append("A sfnt can not contain more than %d tables." % maxSFNTTables)
+        elif len(tables) == len(order) and "head" in tables:
+            if len(headData) < 12:
+                errors.append("The head table is too short.")
+            else:
+                checkSumAdjustment = struct.unpack(">L", headData[8:12])[0]
+                if checkSumAdjustment != calcHeadCheckSumAdjustment(reader.flavor, tables):
+                    errors.append("The head checkSumAdjustment value is incorrect.")
+        return errors
+    finally:
+        if closeSource:
+            src.close()
+
+# ------------
+# Fingerprints
+# ------------
+
+def fingerprintWOFF(file, includeMetadata=False, includePrivateData=False):
+    """
+    Return a SHA-256 hex digest that identifies the sfnt data
+    in the WOFF in file. file may be a path or a file object.
+
+    Only the header and the table directory are read. The
+    digest covers the flavor, the sorted table tags and the
+    origLength and origChecksum of each table, so it does not
+    change when the tables are compressed differently. If
+    includeMetadata is True, the metaOrigLength is included.
+    If includePrivateData is True, the privLength is included.
+
+    Nothing is decompressed, so this is much faster than
+    hashing the decoded sfnt, but it relies on the table
+    checksums. Two fonts with different data and the same
+    checksums for every table would have the same fingerprint.
+    """
+    closeFile = False
+    if not hasattr(file, "read"):
+        file = open(file, "rb")
+        closeFile = True
+    try:
+        reader = WOFFReader(file, checkChecksums=0)
+        fingerprint = hashlib.sha256()
+        fingerprint.update(tobytes(reader.flavor))
+        for tag, entry in sorted(reader.tables.items()):
+            fingerprint.update(struct.pack(">4sLL", tobytes(tag), entry.origLength, entry.origChecksum))
+        if includeMetadata:
+            fingerprint.update(struct.pack(">4sL", b"meta", reader.metaOrigLength))
+        if includePrivateData:
+            fingerprint.update(struct.pack(">4sL", b"priv", reader.privLength))
+        return fingerprint.hexdigest()
+    finally:
+        if closeFile:
+            file.close()
+
+# ---------------
+# Size Estimation
+# ---------------
+
+def estimateWOFFSize(font, compressionLevel=9, chunkSize=32768, sampleCount=4, metadata=None, privateData=None):
+    """
+    Estimate the size of the WOFF that would be written for font
+    without doing a full compression pass. font may be a TTFont,
+    a WOFFFont or the path to a font file. For a WOFFFont the
+    metadata and private data in the font are included unless
+    metadata or privateData is given.
+
+    Tables that are no longer than chunkSize * sampleCount are
+    compressed completely, so their estimate is exact. For longer
+    tables sampleCount chunks of chunkSize bytes, spread evenly
+    over the table, are compressed separately and the result is
+    extrapolated from the compression ratios. Each chunk is
+    compressed after the 32K of data that precede it, so that
+    it can refer back to that data as it would in the complete
+    table. The low and high bounds cover the best and worst
+    ratios of the samples and three standard errors of the
+    mean ratio, whichever is wider.
+
+    This returns a dict with estimate, low and high values for
+    the whole file and a tables dict with origLength, estimate,
+    low, high and exact values for each table. All values are
+    padded lengths, as they are stored in the file.
+    """
+    closeFont = False
+    if not isinstance(font, TTFont):
+        font = TTFont(font)
+        closeFont = True
+    try:
+        if isinstance(font, WOFFFont):
+            if metadata is None:
+                metadata = font._compileMetadata()
+            if privateData is None:
+                privateData = font.privateData
+        backend = getCompressionBackend()
+        tags = [tag for tag in font.keys() if tag != "GlyphOrder"]
+        tables = {}
+        size = woffHeaderSize + (woffDirectoryEntrySize * len(tags))
+        estimate = low = high = size
+        for tag in tags:
+            data = font.getTableData(tag)
+            result = _estimateTableSize(data, backend, compressionLevel, chunkSize, sampleCount)
+            tables[tag] = result
+            estimate += result["estimate"]
+            low += result["low"]
+            high += result["high"]
+        if metadata:
+            metaLength = calc4BytePaddedLength(len(backend.compress(metadata, compressionLevel)))
+            estimate += metaLength
+            low += metaLength
+            high += metaLength
+        if privateData:
+            # the private data is not padded at the end of the file
+            estimate += len(privateData)
+            low += len(privateData)
+            high += len(privateData)
+        return dict(estimate=estimate, low=low, high=high, tables=tables)
+    finally:
+        if closeFont:
+            font.close()
+
+# the zlib header and the adler-32 checksum
+zlibOverhead = 6
+# the zlib window size
+zlibWindowSize = 32768
+
+def _estimateTableSize(data, backend, compressionLevel, chunkSize, sampleCount):
+    origLength = len(data)
+    paddedOrigLength = calc4BytePaddedLength(origLength)
+    # compress small tables completely
+    if origLength <= chunkSize * sampleCount or sampleCount < 2:
+        compLength = len(backend.compress(data, compressionLevel))
+        # the data is stored uncompressed when that is smaller
+        length = calc4BytePaddedLength(min(compLength, origLength))
+        return dict(origLength=origLength, estimate=length, low=length, high=length, exact=True)
+    # compress evenly spaced samples
+    step = (origLength - chunkSize) / float(sampleCount - 1)
+    ratios = []
+    for index in range(sampleCount):
+        start = int(index * step)
+        chunk = data[start:start + chunkSize]
+        # only count the bytes added by the chunk
+        context = data[max(0, start - zlibWindowSize):start]
+        compLength = len(backend.compress(context + chunk, compressionLevel))
+        if context:
+            compLength -= len(backend.compress(context, compressionLevel))
+        else:
+            compLength -= zlibOverhead
+        ratios.append(compLength / float(len(chunk)))
+    ratio = sum(ratios) / len(ratios)
+    deviation = (sum([(value - ratio) ** 2 for value in ratios]) / (len(ratios) - 1)) ** 0.5
+    margin = 3 * deviation / len(ratios) ** 0.5
+    low = min(min(ratios), ratio - margin)
+    high = max(max(ratios), ratio + margin)
+    result = dict(origLength=origLength, exact=False)
+    for key, value in (("estimate", ratio), ("low", max(0, low)), ("high", high)):
+        length = int(round(origLength * value)) + zlibOverhead
+        result[key] = min(calc4BytePaddedLength(length), paddedOrigLength)
+    return result
+
+# ----------------
+# In-Place Updates
+# ----------------
+
+def updateWOFF(path, metadata=None, privateData=None, majorVersion=None, minorVersion=None, compressionLevel=9):
+    """
+    Change the metadata, the private data and the version
+    fields of the WOFF at path without rewriting the table data.
+
+    metadata may be the XML text or an ElementTree Element.
+    privateData must be a string. If either is None, the
+    existing data is kept. To remove either, use an empty
+    string. majorVersion and minorVersion are only changed
+    if they are not None.
+
+    The metadata and private data follow the table data, so
+    the file is truncated at the end of the existing data that
+    is kept, the new data is appended and the header is updated.
+    Only the header and the data after the table data are
+    touched.
+    """
+    f = open(path, "r+b")
+    try:
+        reader = WOFFReader(f, checkChecksums=0)
+        # find the end of the table data
+        tableDataEnd = woffHeaderSize + (woffDirectoryEntrySize * reader.numTables)
+        for entry in reader.tables.values():
+            tableDataEnd = max(tableDataEnd, entry.offset + calc4BytePaddedLength(entry.compLength))
+        header = dict((key, getattr(reader, key)) for key in ("signature", "flavor", "length",
+            "numTables", "reserved", "totalSFNTSize", "majorVersion", "minorVersion", "metaOffset",
+            "metaLength", "metaOrigLength", "privOffset", "privLength"))
+        if majorVersion is not None:
+            header["majorVersion"] = majorVersion
+        if minorVersion is not None:
+            header["minorVersion"] = minorVersion
+        # compress the metadata
+        if metadata is not None:
+            if ElementTree.iselement(metadata):
+                metadata = compileMetadata(metadata)
+            if metadata:
+                metaOrigLength = len(metadata)
+                metadata = getCompressionBackend().compress(metadata, compressionLevel)
+            else:
+                metaOrigLength = 0
+        # figure out what can stay where it is
+        if metadata is None and privateData is None:
+            # only the header changes
+            end = None
+        elif metadata is None:
+            # the metadata stays, the private data is replaced
+            if reader.metaLength:
+                end = reader.metaOffset + reader.metaLength
+            else:
+                end = tableDataEnd
+        else:
+            # everything after the table data is replaced.
+            # if the private data is kept, it has to move.
+            end = tableDataEnd
+            if privateData is None:
+                privateData = reader.privateData
+        # write the new data
+        if end is not None:
+            offset = end
+            if metadata is not None:
+                header["metaOffset"] = header["metaLength"] = header["metaOrigLength"] = 0
+                f.seek(offset)
+                if metadata:
+                    f.write(metadata)
+                    header["metaOffset"] = offset
+                    header["metaLength"] = len(metadata)
+                    header["metaOrigLength"] = metaOrigLength
+                    offset += len(metadata)
+            header["privOffset"] = header["privLength"] = 0
+            if privateData:
+                # pad the metadata to a four byte boundary
+                if header["metaLength"]:
+                    padding = calc4BytePaddedLength(offset) - offset
+                    f.seek(offset)
+                    f.write(b"\0" * padding)
+                    offset += padding
+                f.seek(offset)
+                f.write(privateData)
+                header["privOffset"] = offset
+                header["privLength"] = len(privateData)
+                offset += len(privateData)
+            f.truncate(offset)
+            header["length"] = offset
+        # update the header
+        f.seek(0)
+        f.write(sstruct.pack(woffHeaderFormat, header))
+    finally:
+        f.close()
+
+def patchWOFFTable(path, tag, data, compressionLevel=9, recalculateHeadChecksum=True):
+    """
+    Replace the data for the table with tag in the WOFF at
+    path. data must be the uncompressed table data.
+
+    If the new compressed data needs the same padded space as
+    the old compressed data, only the table data and its directory
+    entry are overwritten. Anything else would leave a gap or an
+    overlap in the table data, so in that case the whole file is
+    rewritten with a WOFFWriter.
+
+    If recalculateHeadChecksum is True, the head checkSumAdjustment
+    is updated. For an in-place patch this is done incrementally,
+    from the differences in the table checksum, the table length and
+    the offsets of the tables that follow, rather than by rebuilding
+    the sfnt directory. The head table must fit in place as well.
+    This must be False if the font contains a DSIG table.
+
+    This returns True if the file was patched in place and
+    False if it was rewritten.
+    """
+    f = open(path, "r+b")
+    try:
+        reader = WOFFReader(f, checkChecksums=0)
+        if tag not in reader.tables:
+            raise WOFFLibError("The '%s' table is not in the font." % tag)
+        if recalculateHeadChecksum and "DSIG" in reader.tables:
+            raise WOFFLibError("The 'head' table checkSumAdjustment can not be recalculated when a 'DSIG' table is in the font.")
+        entry = reader.tables[tag]
+        origChecksum = calcTableChecksum(tag, data)
+        order = reader.keys()
+        patches = {}
+        # update the checkSumAdjustment
+        if recalculateHeadChecksum and "head" in reader.tables:
+            oldHead = reader["head"]
+            checkSumAdjustment = struct.unpack(">L", oldHead[8:12])[0]
+            # the table checksum is in the table data and in the directory
+            delta = 2 * (origChecksum - entry.origChecksum)
+            # the length is in the directory
+            delta += len(data) - entry.origLength
+            # the offsets of the following tables move
+            paddingDelta = calc4BytePaddedLength(len(data)) - calc4BytePaddedLength(entry.origLength)
+            delta += paddingDelta * (len(order) - order.index(tag) - 1)
+            checkSumAdjustment = (checkSumAdjustment - delta) & 0xffffffff
+            if tag == "head":
+                data = data[:8] + struct.pack(">L", checkSumAdjustment) + data[12:]
+            else:
+                # the head checksum does not include the
+                # checkSumAdjustment, so it stays the same.
+                headEntry = reader.tables["head"]
+                headData = oldHead[:8] + struct.pack(">L", checkSumAdjustment) + oldHead[12:]
+                headCompData = _compressToLength(headData, compressionLevel, headEntry.compLength)
+                if headCompData is None:
+                    return _rewriteWithTable(reader, f, path, tag, data, compressionLevel, recalculateHeadChecksum)
+                patches["head"] = (headEntry, headData, headCompData, headEntry.origChecksum)
+        compData = _compressToLength(data, compressionLevel, entry.compLength)
+        if compData is None:
+            return _rewriteWithTable(reader, f, path, tag, data, compressionLevel, recalculateHeadChecksum)
+        patches[tag] = (entry, data, compData, origChecksum)
+        # patch the tables and the directory
+        totalSFNTSize = reader.totalSFNTSize
+        for patchTag, (patchEntry, origData, compData, checksum) in patches.items():
+            totalSFNTSize += calc4BytePaddedLength(len(origData)) - calc4BytePaddedLength(patchEntry.origLength)
+            f.seek(patchEntry.offset)
+            f.write(compData)
+            f.write(b"\0" * (calc4BytePaddedLength(len(compData)) - len(compData)))
+            patchEntry.compLength = len(compData)
+            patchEntry.origLength = len(origData)
+            patchEntry.origChecksum = checksum
+            index = _findDirectoryIndex(f, reader.numTables, patchTag)
+            f.seek(woffHeaderSize + (woffDirectoryEntrySize * index))
+            f.write(patchEntry.toString())
+        # patch the header
+        if totalSFNTSize != reader.totalSFNTSize:
+            reader.totalSFNTSize = totalSFNTSize
+            f.seek(0)
+            f.write(sstruct.pack(woffHeaderFormat, reader))
+        return True
+    finally:
+        f.close()
+
+def _compressToLength(data, compressionLevel, compLength):
+    """
+    Find compressed (or uncompressed) data for data that
+    takes up the same padded space as compLength. If
+    none can be found, this returns None.
+    """
+    paddedLength = calc4BytePaddedLength(compLength)
+    levels = [compressionLevel] + [level for level in range(9, 0, -1) if level != compressionLevel]
+    for level in levels:
+        compData = getCompressionBackend().compress(data, level)
+        if len(compData) >= len(data):
+            break
+        if calc4BytePaddedLength(len(compData)) == paddedLength:
+            return compData
+    if calc4BytePaddedLength(len(data)) == paddedLength:
+        return data
+    return None
+
+def _findDirectoryIndex(file, numTables, tag):
+    file.seek(woffHeaderSize)
+    for index in range(numTables):
+        entry = WOFFDirectoryEntry()
+        entry.fromFile(file)
+        if entry.tag == tag:
+            return index
+    raise WOFFLibError("The '%s' table is not in the font." % tag)
+
+def _rewriteWithTable(reader, file, path, tag, data, compressionLevel, recalculateHeadChecksum):
+    """
+    Rewrite the whole WOFF with new data for one table.
+    The other tables are copied without recompressing them.
+    """
+    order = reader.keys()
+    output = StringIO()
+    writer = WOFFWriter(output, len(order), flavor=reader.flavor,
+        majorVersion=reader.majorVersion, minorVersion=reader.minorVersion,
+        compressionLevel=compressionLevel, recalculateHeadChecksum=recalculateHeadChecksum)
+    for otherTag in order:
+        if otherTag == tag:
+            writer.setTable(tag, data)
+        else:
+            compData, origLength, origChecksum, compLength = reader.getCompressedTableData(otherTag)
+            writer.setTable(otherTag, compData, origLength=origLength, origChecksum=origChecksum, compLength=compLength)
+    if reader.metaLength:
+        metadata, metaOrigLength, metaLength = reader.getCompressedMetadata()
+        writer.setMetadata(metadata, metaOrigLength=metaOrigLength, metaLength=metaLength)
+    if reader.privLength:
+        writer.setPrivateData(reader.privateData)
+    writer.close()
+    data = output.getvalue()
+    file.seek(0)
+    file.write(data)
+    file.truncate(len(data))
+    return False
+
 # ----------------
 # SFNT Conformance
 # ----------------
@@ -727,28 +2488,79 @@ def checkSFNTConformance(file):
     The returned value of this function will be a list.
     If any errors were found, they will be represented
     as strings in the list.
+
+    When file is a path or a real file positioned at the
+    start, the file is memory mapped instead of read, and
+    the tables are checked in place without being copied.
     """
-    # load the data
     closeFile = False
     if not hasattr(file, "read"):
         file = open(file, "rb")
         closeFile = True
-    data = file.read()
-    if closeFile:
-        file.close()
+    try:
+        data = _mapFile(file)
+        if data is None:
+            data = file.read()
+        try:
+            return checkSFNTDataConformance(data)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+    finally:
+        if closeFile:
+            file.close()
+
+def _mapFile(file):
+    """
+    Memory map file if possible. This returns None for
+    objects that are not real files, empty files and files
+    that are not at the start.
+    """
+    try:
+        if file.tell() != 0:
+            return None
+        fileno = file.fileno()
+    except (AttributeError, IOError, OSError):
+        return None
+    if os.fstat(fileno).st_size == 0:
+        return None
+    try:
+        return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (mmap.error, ValueError, OSError):
+        return None
+
+def _sliceView(data, offset, length):
+    """
+    A slice of data that refers to data instead of copying it.
+    """
+    if isinstance(data, memoryview):
+        return data[offset:offset + length]
+    # a Python 2 mmap does not support memoryview
+    return buffer(data, offset, length)
+
+def checkSFNTDataConformance(data, checkChecksums=True):
+    """
+    Check sfnt data that is already in memory. data may be a
+    string, a bytearray, a memoryview or a mmap. The checks and
+    the returned value are the same as for checkSFNTConformance.
+    If checkChecksums is False, the table checksums and the
+    head checkSumAdjustment are not checked.
+    """
+    try:
+        view = memoryview(data)
+    except TypeError:
+        view = data
     # storage
     errors = []
     # unpack the header
-    headerData = data[:sfntDirectorySize]
-    header = sstruct.unpack(sfntDirectoryFormat, headerData)
+    header = sstruct.unpack(sfntDirectoryFormat, data[:sfntDirectorySize])
     # unpack the table directory
     numTables = header["numTables"]
-    directoryData = data[sfntDirectorySize : sfntDirectorySize + (sfntDirectoryEntrySize * numTables)]
     tableDirectory = []
     for index in range(numTables):
-        entry = sstruct.unpack(sfntDirectoryEntryFormat, directoryData[:sfntDirectoryEntrySize])
+        start = sfntDirectorySize + (sfntDirectoryEntrySize * index)
+        entry = sstruct.unpack(sfntDirectoryEntryFormat, data[start:start + sfntDirectoryEntrySize])
         tableDirectory.append(entry)
-        directoryData = directoryData[sfntDirectoryEntrySize:]
     # sanity testing
     errors += _testOffsetBoundaryValidity(len(data), tableDirectory)
     errors += _testLengthBoundaryValidity(len(data), tableDirectory)
@@ -760,26 +2572,28 @@ def checkSFNTConformance(file):
     errors += _testJunkAtTheBeginningOfTheFile(header)
     # test directory order
     errors += _testDirectoryOrder(tableDirectory)
-    # load the table data
-    for entry in tableDirectory:
-        offset = entry["offset"]
-        length = entry["length"]
-        entry["data"] = data[offset:offset+length]
-    # test for overlaps
-    errors += _testOverlaps(tableDirectory)
+    # test for overlaps, padding, gaps and padding values
+    # in one pass over the tables sorted by offset
+    sweep = _sweepTableDirectory(tableDirectory, data)
+    errors += sweep["overlaps"]
     # test for padding
     errors += _testOffsets(tableDirectory)
     # test the final table padding
     errors += _testFinalTablePadding(len(data), numTables, tableDirectory[-1]["tag"])
-    # test for gaps
-    errors += _testGaps(tableDirectory)
+    errors += sweep["gaps"]
     # test for a gap at the end of the file
     errors += _testGapAfterFinalTable(len(data), tableDirectory)
-    # test padding value
-    errors += _testPaddingValue(tableDirectory, data)
+    errors += sweep["paddingValues"]
+    # tables that do not overlap can not contain more data
+    # than the file. if they do, the checksums would take far
+    # longer than the file size suggests, so stop here.
+    if sum([entry["length"] for entry in tableDirectory]) > len(data):
+        return errors
+    if not checkChecksums:
+        return errors
     # validate checksums
-    errors += _testCheckSums(tableDirectory)
-    errors += _testHeadCheckSum(header, tableDirectory)
+    errors += _testCheckSums(tableDirectory, view)
+    errors += _testHeadCheckSum(header, tableDirectory, data)
     # done.
     return errors
 
@@ -910,32 +2724,7 @@ def _testOverlaps(tableDirectory):
     >>> bool(_testOverlaps(test))
     True
     """
-    # gather the edges
-    edges = {}
-    for entry in tableDirectory:
-        start = entry["offset"]
-        end = start + entry["length"]
-        edges[entry["tag"]] = (start, end)
-    # look for overlaps
-    overlaps = set()
-    for tag, (start, end) in edges.items():
-        for otherTag, (otherStart, otherEnd) in edges.items():
-            tag = tag.strip()
-            otherTag = otherTag.strip()
-            if tag == otherTag:
-                continue
-            if start >= otherStart and start < otherEnd:
-                l = sorted((tag, otherTag))
-                overlaps.add(tuple(l))
-            if end > otherStart and end <= otherEnd:
-                l = sorted((tag, otherTag))
-                overlaps.add(tuple(l))
-    # report
-    errors = []
-    if overlaps:
-        for t1, t2 in sorted(overlaps):
-            errors.append("The tables %s and %s overlap." % (t1, t2))
-    return errors
+    return _sweepTableDirectory(tableDirectory)["overlaps"]
 
 def _testOffsets(tableDirectory):
     """
@@ -1023,25 +2812,7 @@ def _testGaps(tableDirectory):
     >>> bool(_testGaps(test))
     True
     """
-    errors = []
-    sorter = []
-    for entry in tableDirectory:
-        sorter.append((entry["offset"], entry))
-    prevTag = None
-    prevEnd = None
-    for offset, entry in sorted(sorter):
-        length = entry["length"]
-        length = calc4BytePaddedLength(length)
-        tag = entry["tag"]
-        if prevEnd is None:
-            prevEnd = offset + length
-            prevTag = tag
-        else:
-            if offset - prevEnd != 0:
-                errors.append("Improper padding between the %s and %s tables." % (prevTag, tag))
-            prevEnd = offset + length
-            prevTag = tag
-    return errors
+    return _sweepTableDirectory(tableDirectory)["gaps"]
 
 def _testGapAfterFinalTable(dataLength, tableDirectory):
     """
@@ -1075,47 +2846,55 @@ def _testGapAfterFinalTable(dataLength, tableDirectory):
         errors.append("Improper padding at the end of the file.")
     return errors
 
-def _testCheckSums(tableDirectory):
+def _testCheckSums(tableDirectory, data):
     """
     >>> data = "0" * 44
     >>> checkSum = calcTableChecksum("test", data)
     >>> test = [
-    ...     dict(data=data, checkSum=checkSum, tag="test")
+    ...     dict(offset=0, length=44, checkSum=checkSum, tag="test")
     ... ]
-    >>> bool(_testCheckSums(test))
+    >>> bool(_testCheckSums(test, data))
     False
     >>> test = [
-    ...     dict(data=data, checkSum=checkSum+1, tag="test")
+    ...     dict(offset=0, length=44, checkSum=checkSum+1, tag="test")
     ... ]
-    >>> bool(_testCheckSums(test))
+    >>> bool(_testCheckSums(test, data))
     True
     """
     errors = []
+    if not isinstance(data, memoryview):
+        try:
+            data = memoryview(data)
+        except TypeError:
+            pass
     for entry in tableDirectory:
         tag = entry["tag"]
         checkSum = entry["checkSum"]
-        data = entry["data"]
-        shouldBe = calcTableChecksum(tag, data)
+        shouldBe = calcTableChecksum(tag, _sliceView(data, entry["offset"], entry["length"]))
         if checkSum != shouldBe:
             errors.append("Invalid checksum for the %s table." % tag)
     return errors
 
-def _testHeadCheckSum(header, tableDirectory):
+def _testHeadCheckSum(header, tableDirectory, data):
     """
     >>> header = dict(sfntVersion="OTTO")
+    >>> data = "\\0" * 100 + "00000000" + struct.pack(">L", 925903070)
     >>> tableDirectory = [
-    ...     dict(tag="head", offset=100, length=100, checkSum=123, data="00000000"+struct.pack(">L", 925903070)),
+    ...     dict(tag="head", offset=100, length=100, checkSum=123),
     ...     dict(tag="aaab", offset=200, length=100, checkSum=456),
     ...     dict(tag="aaac", offset=300, length=100, checkSum=789),
     ... ]
-    >>> bool(_testHeadCheckSum(header, tableDirectory))
+    >>> bool(_testHeadCheckSum(header, tableDirectory, data))
+    False
     """
     flavor = header["sfntVersion"]
     tables = {}
     for entry in tableDirectory:
         tables[entry["tag"]] = entry
-    data = tables["head"]["data"][8:12]
-    checkSumAdjustment = struct.unpack(">L", data)[0]
+    if "head" not in tables:
+        return []
+    offset = tables["head"]["offset"]
+    checkSumAdjustment = struct.unpack(">L", data[offset + 8:offset + 12])[0]
     shouldBe = calcHeadCheckSumAdjustment(flavor, tables)
     if checkSumAdjustment != shouldBe:
         return ["The head checkSumAdjustment value is incorrect."]
@@ -1147,34 +2926,91 @@ def _testPaddingValue(tableDirectory, data):
     >>> bool(_testPaddingValue(testDirectory, "\x01" * 36))
     True
     """
-    errors = []
-    # check between directory and first table
-    # check between all tables
-    entries = [(entry["offset"], entry) for entry in tableDirectory]
-    prev = "table directory"
+    return _sweepTableDirectory(tableDirectory, data)["paddingValues"]
+
+# Limits for files with a great number of overlapping tables.
+maxOverlapErrors = 100
+maxOverlapChecks = 1000000
+
+def _sweepTableDirectory(tableDirectory, data=None):
+    """
+    Check the table layout in a single pass over the tables
+    sorted by offset. This returns a dict of error lists:
+    overlaps, gaps (space between tables other than padding)
+    and paddingValues (bytes outside of the tables that are
+    not null). The padding values are only checked if data
+    is given.
+
+    Overlaps are found with a heap of the ends of the tables
+    that have started but not ended, so the time grows with
+    the number of tables plus the number of overlaps. No more
+    than maxOverlapErrors overlaps are reported and no more
+    than maxOverlapChecks pairs of tables are compared.
+
+    >>> test = [
+    ...     dict(tag="aaaa", offset=0, length=100),
+    ...     dict(tag="bbbb", offset=40, length=20),
+    ...     dict(tag="cccc", offset=50, length=100),
+    ... ]
+    >>> _sweepTableDirectory(test)["overlaps"]
+    ['The tables aaaa and bbbb overlap.', 'The tables aaaa and cccc overlap.', 'The tables bbbb and cccc overlap.']
+    """
+    overlaps = set()
+    overlapChecks = 0
+    tooManyOverlaps = False
+    gapErrors = []
+    paddingErrors = []
+    active = []
+    activeTags = {}
+    prevTag = "table directory"
     prevEnd = sfntDirectorySize + (sfntDirectoryEntrySize * len(tableDirectory))
-    for o, entry in sorted(entries):
+    prevPaddedEnd = None
+    entries = sorted(tableDirectory, key=lambda entry: (entry["offset"], entry["length"], entry["tag"]))
+    for entry in entries:
         tag = entry["tag"]
         offset = entry["offset"]
         length = entry["length"]
-        # slice the bytes between the previous and the current
-        if offset > prevEnd:
-            bytes = data[prevEnd:offset]
-            # replace \0 with nothing
-            bytes = bytes.replace("\0", "")
-            if bytes:
-                errors.append("Bytes between %s and %s are not null." % (prev, tag))
-        # shift for teh next table
-        prev = tag
-        prevEnd = offset + length
-    # check last table
-    entry = sorted(entries)[-1][1]
-    end = entry["offset"] + entry["length"]
-    bytes = data[end:]
-    bytes = bytes.replace("\0", "")
-    if bytes:
-        errors.append("Bytes after final table (%s) are not null." % entry["tag"])
-    return errors
+        end = offset + length
+        strippedTag = tag.strip()
+        # overlaps: every table that has not ended
+        # before this one starts overlaps it
+        while active and active[0][0] <= offset:
+            otherEnd, otherTag = heapq.heappop(active)
+            activeTags[otherTag] -= 1
+        if len(active) > activeTags.get(strippedTag, 0):
+            if len(overlaps) < maxOverlapErrors and overlapChecks < maxOverlapChecks:
+                overlapChecks += len(active)
+                for otherEnd, otherTag in active:
+                    if otherTag != strippedTag:
+                        overlaps.add(tuple(sorted((strippedTag, otherTag))))
+            else:
+                tooManyOverlaps = True
+        if length:
+            heapq.heappush(active, (end, strippedTag))
+            activeTags[strippedTag] = activeTags.get(strippedTag, 0) + 1
+        # gaps
+        if prevPaddedEnd is not None and offset != prevPaddedEnd:
+            gapErrors.append("Improper padding between the %s and %s tables." % (prevTag, tag))
+        # padding values
+        if data is not None and offset > prevEnd and not _isNull(data, prevEnd, offset):
+            paddingErrors.append("Bytes between %s and %s are not null." % (prevTag, tag))
+        prevTag = tag
+        prevEnd = end
+        prevPaddedEnd = offset + calc4BytePaddedLength(length)
+    # check after the final table
+    if data is not None and entries and not _isNull(data, prevEnd, len(data)):
+        paddingErrors.append("Bytes after final table (%s) are not null." % prevTag)
+    overlapErrors = ["The tables %s and %s overlap." % (t1, t2) for t1, t2 in sorted(overlaps)[:maxOverlapErrors]]
+    if tooManyOverlaps or len(overlaps) > maxOverlapErrors:
+        overlapErrors.append("There are too many overlapping tables to report them all.")
+    return dict(overlaps=overlapErrors, gaps=gapErrors, paddingValues=paddingErrors)
+
+def _isNull(data, start, end, chunkSize=65536):
+    for chunkStart in range(start, end, chunkSize):
+        chunk = data[chunkStart:min(end, chunkStart + chunkSize)]
+        if chunk.count(b"\0") != len(chunk):
+            return False
+    return True
 
 if __name__ == "__main__":
     import doctest
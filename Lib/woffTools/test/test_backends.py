@@ -0,0 +1,110 @@
+import os
+import zlib
+import woffTools
+from woffTools import WOFFLibError, CompressionBackend, setCompressionBackend, getCompressionBackend, \
+    getAvailableCompressionBackends
+from woffTools.test.test_stress import makeTableData
+
+# -------
+# Support
+# -------
+
+def selectBackend(name=None, environment=None):
+    """
+    Select a backend with setCompressionBackend, or with the
+    environment variable if environment is given, and return
+    its name or the error. The previous backend is restored.
+    """
+    previousBackend = woffTools._compressionBackend
+    previousEnvironment = os.environ.get("WOFFTOOLS_COMPRESSION_BACKEND")
+    try:
+        if environment is None:
+            backend = setCompressionBackend(name)
+        else:
+            os.environ["WOFFTOOLS_COMPRESSION_BACKEND"] = environment
+            woffTools._compressionBackend = None
+            backend = getCompressionBackend()
+        return backend.name
+    except WOFFLibError as error:
+        return str(error)
+    finally:
+        woffTools._compressionBackend = previousBackend
+        if previousEnvironment is None:
+            os.environ.pop("WOFFTOOLS_COMPRESSION_BACKEND", None)
+        else:
+            os.environ["WOFFTOOLS_COMPRESSION_BACKEND"] = previousEnvironment
+
+def addMissingBackend():
+    woffTools.compressionBackendModules.append(("missing", "woffToolsMissingModule", 9))
+
+def removeMissingBackend():
+    woffTools.compressionBackendModules.remove(("missing", "woffToolsMissingModule", 9))
+    woffTools._compressionBackends.pop("missing", None)
+
+# -----
+# Tests
+# -----
+
+def backendTest1():
+    """
+    A backend can be forced by name.
+
+    >>> selectBackend("zlib")
+    'zlib'
+    >>> "zlib" in getAvailableCompressionBackends()
+    True
+    >>> selectBackend() == getAvailableCompressionBackends()[0]
+    True
+
+    An unknown or unavailable backend is an error.
+
+    >>> selectBackend("foo")
+    'Unknown compression backend: foo'
+    >>> addMissingBackend()
+    >>> selectBackend("missing")
+    'The missing compression backend is not installed.'
+    >>> "missing" in getAvailableCompressionBackends()
+    False
+    >>> removeMissingBackend()
+    """
+
+def backendTest2():
+    """
+    The environment variable is used when no backend
+    has been set.
+
+    >>> selectBackend(environment="zlib")
+    'zlib'
+    >>> selectBackend(environment="") == getAvailableCompressionBackends()[0]
+    True
+    >>> selectBackend(environment="foo")
+    'Unknown compression backend: foo'
+    """
+
+def backendTest3():
+    """
+    The levels of a backend with fewer levels are scaled to
+    fit and the results are standard zlib streams.
+
+    >>> backend = CompressionBackend("limited", zlib, maxLevel=3)
+    >>> [backend._level(level) for level in range(1, 10)]
+    [1, 1, 1, 2, 2, 2, 3, 3, 3]
+    >>> data = makeTableData(10000)
+    >>> [zlib.decompress(backend.compress(data, level)) == data for level in range(1, 10)]
+    [True, True, True, True, True, True, True, True, True]
+    >>> backend.compress(data, 9) == zlib.compress(data, 3)
+    True
+
+    Every installed backend, isal included, writes streams
+    that zlib can read at every level.
+
+    >>> for name in getAvailableCompressionBackends():
+    ...     backend = woffTools._loadCompressionBackend(name)
+    ...     for level in range(1, 10):
+    ...         if zlib.decompress(backend.compress(data, level)) != data:
+    ...             print("%s %d" % (name, level))
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
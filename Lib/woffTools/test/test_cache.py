@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+from woffTools import CompressionCache
+
+# -------
+# Support
+# -------
+
+def fillCache(maxSize=None):
+    """
+    Store three entries, store the first one again and leave
+    a temporary file behind in the cache directory. This
+    returns the cache statistics before and after clearing
+    the cache and the size counted by a new cache object.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        cache = CompressionCache(directory, maxSize=maxSize)
+        keys = [cache.makeKey(index, b"data %d" % index, "test") for index in range(3)]
+        for key in keys:
+            cache.set(key, b"x" * 100)
+        cache.set(keys[0], b"x" * 50)
+        tempFile = open(os.path.join(directory, keys[0][:2], "partial.tmp"), "wb")
+        tempFile.write(b"x" * 1000)
+        tempFile.close()
+        reopened = CompressionCache(directory).getStatistics()["size"]
+        before = cache.getStatistics()
+        cache.clear()
+        after = cache.getStatistics()
+    finally:
+        shutil.rmtree(directory)
+    return before, after, reopened
+
+# -----
+# Tests
+# -----
+
+def cacheStatisticsTest1():
+    """
+    Overwriting an entry replaces its size, temporary files
+    are not counted and clearing is not an eviction.
+
+    >>> before, after, reopened = fillCache()
+    >>> before["size"], before["stores"], before["evictions"]
+    (250, 4, 0)
+    >>> reopened
+    250
+    >>> after["size"], after["evictions"]
+    (0, 0)
+    """
+
+def cacheStatisticsTest2():
+    """
+    Entries removed to stay below maxSize are evictions.
+    The cache is trimmed to 90% of maxSize, so two of the
+    100 byte entries are removed.
+
+    >>> before, after, reopened = fillCache(maxSize=220)
+    >>> before["size"] <= 220, before["evictions"]
+    (True, 2)
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
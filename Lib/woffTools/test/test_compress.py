@@ -0,0 +1,121 @@
+import os
+import sys
+import shutil
+import tempfile
+from woffTools.tools import compress
+from woffTools.tools.compress import compressDirectory
+from woffTools.test.test_estimate import makeTestFont
+
+# -------
+# Support
+# -------
+
+def makeSourceDirectory():
+    """
+    Make a directory with two fonts, one of them in a
+    subdirectory, and a file that is not a font.
+    """
+    directory = tempfile.mkdtemp()
+    os.mkdir(os.path.join(directory, "sub"))
+    makeTestFont(os.path.join(directory, "a.ttf"), 20, 1)
+    makeTestFont(os.path.join(directory, "sub", "b.ttf"), 20, 2)
+    writeFile(os.path.join(directory, "broken.ttf"), b"not a font")
+    return directory
+
+def writeFile(path, data):
+    f = open(path, "wb")
+    f.write(data)
+    f.close()
+
+def run(sourceDirectory, outputDirectory):
+    """
+    Convert sourceDirectory and return the counts and
+    the sorted report messages.
+    """
+    messages = []
+    summary = compressDirectory(sourceDirectory, outputDirectory, processes=1, report=messages.append)
+    counts = (summary["converted"], summary["skipped"], summary["failed"])
+    return counts, sorted([message.split(" (")[0] for message in messages])
+
+def runMain(*arguments):
+    """
+    Run the command line tool with arguments and
+    catch the exit.
+    """
+    argv = sys.argv
+    sys.argv = ["woff-compress"] + list(arguments)
+    try:
+        compress.main()
+    except SystemExit:
+        pass
+    finally:
+        sys.argv = argv
+
+# -----
+# Tests
+# -----
+
+def compressTest1():
+    """
+    A second run skips the files that are up to date and
+    only tries the file that failed again.
+
+    >>> sourceDirectory = makeSourceDirectory()
+    >>> outputDirectory = tempfile.mkdtemp()
+    >>> run(sourceDirectory, outputDirectory)
+    ((2, 0, 1), ['Converted: a.ttf', 'Converted: sub/b.ttf', 'Failed: broken.ttf'])
+    >>> sorted(os.listdir(outputDirectory))
+    ['.woff-compress-journal', 'a.woff', 'sub']
+    >>> run(sourceDirectory, outputDirectory)
+    ((0, 2, 1), ['Failed: broken.ttf'])
+
+    Once the font is fixed, only that font is converted.
+
+    >>> makeTestFont(os.path.join(sourceDirectory, "broken.ttf"), 20, 3)
+    >>> run(sourceDirectory, outputDirectory)
+    ((1, 2, 0), ['Converted: broken.ttf'])
+    >>> run(sourceDirectory, outputDirectory)
+    ((0, 3, 0), [])
+    >>> shutil.rmtree(sourceDirectory)
+    >>> shutil.rmtree(outputDirectory)
+    """
+
+def compressTest2():
+    """
+    A file that the journal records as done is skipped
+    even if its output is older than the source. A file
+    with a changed source is converted again.
+
+    >>> sourceDirectory = makeSourceDirectory()
+    >>> outputDirectory = tempfile.mkdtemp()
+    >>> counts = run(sourceDirectory, outputDirectory)
+    >>> outputPath = os.path.join(outputDirectory, "a.woff")
+    >>> os.utime(outputPath, (0, 0))
+    >>> run(sourceDirectory, outputDirectory)
+    ((0, 2, 1), ['Failed: broken.ttf'])
+    >>> makeTestFont(os.path.join(sourceDirectory, "a.ttf"), 30, 1)
+    >>> run(sourceDirectory, outputDirectory)
+    ((1, 1, 1), ['Converted: a.ttf', 'Failed: broken.ttf'])
+    >>> shutil.rmtree(sourceDirectory)
+    >>> shutil.rmtree(outputDirectory)
+    """
+
+def commandLineTest1():
+    """
+    A missing output directory is reported without
+    a traceback.
+
+    >>> sourceDirectory = makeSourceDirectory()
+    >>> outputDirectory = os.path.join(sourceDirectory, "missing")
+    >>> runMain("-d", outputDirectory, sourceDirectory) # doctest: +ELLIPSIS
+    Directory does not exist: .../missing
+    >>> runMain(outputDirectory) # doctest: +ELLIPSIS
+    Directory does not exist: .../missing
+    >>> os.path.exists(outputDirectory)
+    False
+    >>> shutil.rmtree(sourceDirectory)
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
@@ -0,0 +1,127 @@
+import os
+import struct
+import shutil
+import tempfile
+from io import BytesIO
+from woffTools import WOFFReader, encodeSFNT, decodeToSFNT, verifyRoundTrip, woffHeaderSize
+from woffTools.test.test_estimate import makeTestFont
+
+# -------
+# Support
+# -------
+
+directoryEntryFormat = ">4sLLLL"
+directoryEntrySize = struct.calcsize(directoryEntryFormat)
+
+def makeTestWOFF():
+    """
+    Return the sfnt data of a small test font
+    and the WOFF data that it encodes to.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        sfntPath = os.path.join(directory, "font.ttf")
+        makeTestFont(sfntPath, 50, 1)
+        f = open(sfntPath, "rb")
+        sfntData = f.read()
+        f.close()
+        woffData = bytes(encodeSFNT(sfntPath, None))
+    finally:
+        shutil.rmtree(directory)
+    return sfntData, woffData
+
+def changeDirectoryEntry(data, tag, **values):
+    """
+    Change the values of the directory entry for tag.
+    """
+    data = bytearray(data)
+    index = sorted(WOFFReader(BytesIO(bytes(data))).tables.keys()).index(tag)
+    position = woffHeaderSize + (directoryEntrySize * index)
+    entry = list(struct.unpack(directoryEntryFormat, bytes(data[position:position + directoryEntrySize])))
+    for name, value in values.items():
+        entry[["tag", "offset", "compLength", "origLength", "origChecksum"].index(name)] = value
+    data[position:position + directoryEntrySize] = struct.pack(directoryEntryFormat, *entry)
+    return bytes(data)
+
+def changeTableByte(data, tag):
+    """
+    Invert a byte in the middle of the stored data for tag.
+    """
+    data = bytearray(data)
+    entry = WOFFReader(BytesIO(bytes(data))).tables[tag]
+    data[entry.offset + (entry.compLength // 2)] ^= 0xff
+    return bytes(data)
+
+def getEntry(data, tag):
+    return WOFFReader(BytesIO(data)).tables[tag]
+
+# -----
+# Tests
+# -----
+
+def roundTripTest1():
+    """
+    The sfnt data survives the conversion to WOFF and back.
+
+    >>> sfntData, woffData = makeTestWOFF()
+    >>> verifyRoundTrip(BytesIO(woffData))
+    []
+    >>> output = BytesIO()
+    >>> decodeToSFNT(BytesIO(woffData), output)
+    >>> output.getvalue() == sfntData
+    True
+    """
+
+def roundTripTest2():
+    """
+    >>> sfntData, woffData = makeTestWOFF()
+    >>> verifyRoundTrip(BytesIO(changeTableByte(woffData, "glyf")))
+    ['The glyf table can not be decompressed.']
+    >>> verifyRoundTrip(BytesIO(changeDirectoryEntry(woffData, "hmtx", origChecksum=0)))
+    ['Invalid checksum for the hmtx table.']
+    """
+
+def roundTripTest3():
+    """
+    The origLength values are checked against the data.
+
+    >>> sfntData, woffData = makeTestWOFF()
+    >>> entry = getEntry(woffData, "glyf")
+    >>> verifyRoundTrip(BytesIO(changeDirectoryEntry(woffData, "glyf", origLength=entry.origLength - 4)))
+    ['The origLength of the glyf table is not correct.', 'The totalSFNTSize value is incorrect.']
+    >>> verifyRoundTrip(BytesIO(changeDirectoryEntry(woffData, "glyf", origLength=entry.origLength + 4)))
+    ['The origLength of the glyf table is not correct.', 'The totalSFNTSize value is incorrect.']
+    """
+
+def roundTripTest4():
+    """
+    Truncated data is not reported as a wrong origLength.
+
+    >>> sfntData, woffData = makeTestWOFF()
+    >>> entry = getEntry(woffData, "glyf")
+    >>> verifyRoundTrip(BytesIO(changeDirectoryEntry(woffData, "glyf", compLength=entry.compLength - 10)))
+    ['The glyf table can not be decompressed.']
+    >>> last = max(WOFFReader(BytesIO(woffData)).tables.values(), key=lambda entry: entry.offset)
+    >>> length = last.offset + 2
+    >>> errors = verifyRoundTrip(BytesIO(woffData[:length]))
+    >>> errors == [
+    ...     "The length in the header (%d) does not match the length of the file (%d)." % (len(woffData), length),
+    ...     "The %s table data extends past the end of the file." % last.tag
+    ... ]
+    True
+
+    The tables are compared to the length of the file,
+    not to the length in the header.
+
+    >>> length = len(woffData) // 2
+    >>> errors = verifyRoundTrip(BytesIO(woffData[:length]))
+    >>> errors == [
+    ...     "The length in the header (%d) does not match the length of the file (%d)." % (len(woffData), length),
+    ...     "The tables contain more data than the file."
+    ... ]
+    True
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
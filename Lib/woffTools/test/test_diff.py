@@ -0,0 +1,135 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+from woffTools import WOFFFont, WOFFReader, encodeSFNT
+from woffTools.tools.diff import diffWOFF
+from woffTools.test.test_estimate import makeTestFont
+
+# -------
+# Support
+# -------
+
+def makeTestFiles(directory):
+    """
+    Write a WOFF made from a small test font and three
+    changed copies of it:
+    - edited.woff has a new family name, no post table and
+      is compressed at level 1.
+    - adjusted.woff only has a different head checkSumAdjustment.
+    - corrupt.woff has one byte of the compressed glyf data changed.
+    """
+    sfntPath = os.path.join(directory, "font.ttf")
+    makeTestFont(sfntPath, 50, 1)
+    paths = {}
+    for name in ("original", "edited", "adjusted", "corrupt"):
+        paths[name] = os.path.join(directory, name + ".woff")
+    encodeSFNT(sfntPath, paths["original"])
+    # edited
+    font = WOFFFont(paths["original"])
+    font.recalcTimestamp = False
+    font["name"].setName(u"Diff Test", 1, 3, 1, 0x409)
+    del font["post"]
+    font.save(paths["edited"], compressionLevel=1, recompressTables=True)
+    font.close()
+    # adjusted
+    font = WOFFFont(paths["original"])
+    font.recalcTimestamp = False
+    font["head"].checkSumAdjustment ^= 1
+    font.save(paths["adjusted"], reorderTables=False, recalculateHeadChecksum=False)
+    font.close()
+    # corrupt
+    f = open(paths["original"], "rb")
+    entry = WOFFReader(f).tables["glyf"]
+    f.seek(0)
+    data = bytearray(f.read())
+    f.close()
+    position = entry.offset + (entry.compLength // 2)
+    data[position] ^= 0xff
+    f = open(paths["corrupt"], "wb")
+    f.write(bytes(data))
+    f.close()
+    return paths
+
+def compareTestFiles(name, diffTables=True):
+    """
+    Compare the original test file with one of the changed
+    copies and return the categories and the diffs.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        paths = makeTestFiles(directory)
+        result = diffWOFF(paths["original"], paths[name], diffTables=diffTables, context=0)
+    finally:
+        shutil.rmtree(directory)
+    return result
+
+def formatCategories(result):
+    return sorted([(tag.strip(), category) for tag, category in result["tables"].items()])
+
+# -----
+# Tests
+# -----
+
+def diffTest1():
+    """
+    >>> result = compareTestFiles("original")
+    >>> set([category for tag, category in formatCategories(result)])
+    set(['identical'])
+    >>> result["differences"]
+    {}
+    """
+
+def diffTest2():
+    """
+    The tables with the same data that are compressed at a
+    different level are recompressed. Small tables that are
+    not compressed at either level stay identical. The head
+    checkSumAdjustment changed with the other tables.
+
+    >>> result = compareTestFiles("edited")
+    >>> formatCategories(result)
+    [('OS/2', 'recompressed'), ('cmap', 'recompressed'), ('glyf', 'recompressed'), ('head', 'changed'), ('hhea', 'recompressed'), ('hmtx', 'recompressed'), ('loca', 'identical'), ('maxp', 'recompressed'), ('name', 'changed'), ('post', 'removed')]
+    >>> sorted(result["differences"].keys())
+    ['head', 'name']
+    >>> for line in result["differences"]["name"]:
+    ...     if "Diff Test" in line or "Estimate Test" in line:
+    ...         print(line)
+    -  Estimate Test 1
+    +  Diff Test
+    >>> for line in result["differences"]["head"][2:]:
+    ...     if line.startswith(("-", "+")):
+    ...         print(line.split("=")[0])
+    -<checkSumAdjustment value
+    +<checkSumAdjustment value
+    """
+
+def diffTest3():
+    """
+    The checksum does not cover the head checkSumAdjustment,
+    but the table is still reported as changed.
+
+    >>> result = compareTestFiles("adjusted", diffTables=False)
+    >>> [(tag, category) for tag, category in formatCategories(result) if category != "identical"]
+    [('head', 'changed')]
+    >>> result["differences"]
+    {}
+    """
+
+def diffTest4():
+    """
+    Compressed data that can not be decompressed is not
+    reported as recompressed.
+
+    >>> result = compareTestFiles("corrupt")
+    >>> [(tag, category) for tag, category in formatCategories(result) if category != "identical"]
+    [('glyf', 'changed')]
+    >>> for line in result["differences"]["glyf"]:
+    ...     if "can not be decompiled" in line:
+    ...         print(line.split(":")[0])
+    +The table can not be decompiled
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
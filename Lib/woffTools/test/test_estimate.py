@@ -0,0 +1,102 @@
+import os
+import random
+import shutil
+import tempfile
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from woffTools import WOFFReader, encodeSFNT, estimateWOFFSize, calc4BytePaddedLength
+
+# ----------------
+# Corpus Support
+# ----------------
+
+def makeTestFont(path, glyphCount, seed):
+    """
+    Write a TrueType font with glyphCount glyphs that
+    have random outlines and advance widths.
+    """
+    randomizer = random.Random(seed)
+    builder = FontBuilder(1000, isTTF=True)
+    glyphOrder = [".notdef"] + ["glyph%d" % i for i in range(glyphCount)]
+    builder.setupGlyphOrder(glyphOrder)
+    builder.setupCharacterMap(dict((0x4E00 + i, "glyph%d" % i) for i in range(glyphCount)))
+    glyphs = {}
+    for glyphName in glyphOrder:
+        pen = TTGlyphPen(None)
+        for contour in range(randomizer.randint(1, 4)):
+            pen.moveTo((randomizer.randint(0, 900), randomizer.randint(0, 900)))
+            for point in range(randomizer.randint(3, 20)):
+                pen.lineTo((randomizer.randint(0, 900), randomizer.randint(-100, 900)))
+            pen.closePath()
+        glyphs[glyphName] = pen.glyph()
+    builder.setupGlyf(glyphs)
+    builder.setupHorizontalMetrics(dict((glyphName, (randomizer.randint(300, 1000), 0)) for glyphName in glyphOrder))
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupNameTable({"familyName": "Estimate Test %d" % seed, "styleName": "Regular"})
+    builder.setupOS2()
+    builder.setupPost()
+    builder.save(path)
+
+testCorpus = [
+    (50, 1),
+    (500, 2),
+    (1500, 3),
+    (3000, 4),
+]
+
+def compareWithActualSize(chunkSize, maximumError):
+    """
+    Build the test corpus, estimate the WOFF size of each font,
+    compress it for real and compare. This returns a list of
+    problems: tables that are outside of their bounds and fonts
+    with a total estimate that is off by more than maximumError.
+    """
+    directory = tempfile.mkdtemp()
+    problems = []
+    try:
+        for glyphCount, seed in testCorpus:
+            sfntPath = os.path.join(directory, "font%d.ttf" % seed)
+            woffPath = os.path.join(directory, "font%d.woff" % seed)
+            makeTestFont(sfntPath, glyphCount, seed)
+            estimate = estimateWOFFSize(sfntPath, chunkSize=chunkSize)
+            encodeSFNT(sfntPath, woffPath)
+            f = open(woffPath, "rb")
+            reader = WOFFReader(f)
+            for tag, result in sorted(estimate["tables"].items()):
+                actual = calc4BytePaddedLength(reader.tables[tag].compLength)
+                if result["exact"] and result["estimate"] != actual:
+                    problems.append("%d glyphs, %s: exact estimate %d, actual %d" % (glyphCount, tag, result["estimate"], actual))
+                if not result["low"] <= actual <= result["high"]:
+                    problems.append("%d glyphs, %s: %d not in %d-%d" % (glyphCount, tag, actual, result["low"], result["high"]))
+            f.close()
+            actual = os.path.getsize(woffPath)
+            if abs(estimate["estimate"] - actual) > actual * maximumError:
+                problems.append("%d glyphs: estimate %d, actual %d" % (glyphCount, estimate["estimate"], actual))
+    finally:
+        shutil.rmtree(directory)
+    return problems
+
+# -----
+# Tests
+# -----
+
+def estimateAccuracyTest1():
+    """
+    With the default chunk size most tables in the corpus
+    are compressed completely and the rest are sampled.
+
+    >>> compareWithActualSize(32768, 0.02)
+    []
+    """
+
+def estimateAccuracyTest2():
+    """
+    Small chunks force sampling of most of the larger tables.
+
+    >>> compareWithActualSize(4096, 0.05)
+    []
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from woffTools import WOFFFont, encodeSFNT, fingerprintWOFF
+from woffTools.test.test_estimate import makeTestFont
+
+# -------
+# Support
+# -------
+
+def makeFingerprints():
+    """
+    Save a small test font at compression levels 9 and 1
+    and with a changed name table. This returns the
+    fingerprint of each, keyed by name.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        sfntPath = os.path.join(directory, "font.ttf")
+        woffPath = os.path.join(directory, "font.woff")
+        makeTestFont(sfntPath, 50, 1)
+        encodeSFNT(sfntPath, woffPath)
+        font = WOFFFont(woffPath)
+        font.recalcTimestamp = False
+        datas = dict(
+            level9=font.save(None, recompressTables=True, reorderTables=False, recalculateHeadChecksum=False),
+            level1=font.save(None, compressionLevel=1, recompressTables=True, reorderTables=False, recalculateHeadChecksum=False)
+        )
+        font.privateData = b"private data"
+        datas["privateData"] = font.save(None, reorderTables=False, recalculateHeadChecksum=False)
+        font.close()
+        font = WOFFFont(woffPath)
+        font.recalcTimestamp = False
+        font["name"].setName(u"Fingerprint Test", 1, 3, 1, 0x409)
+        datas["edited"] = font.save(None, reorderTables=False, recalculateHeadChecksum=False)
+        font.close()
+        fingerprints = dict((name, fingerprintWOFF(BytesIO(bytes(data)))) for name, data in datas.items())
+        fingerprints["file"] = fingerprintWOFF(woffPath)
+        fingerprints["privateDataIncluded"] = fingerprintWOFF(BytesIO(bytes(datas["privateData"])), includePrivateData=True)
+    finally:
+        shutil.rmtree(directory)
+    return fingerprints
+
+# -----
+# Tests
+# -----
+
+def fingerprintTest1():
+    """
+    The fingerprint does not depend on the compression.
+
+    >>> fingerprints = makeFingerprints()
+    >>> len(fingerprints["file"])
+    64
+    >>> fingerprints["level1"] == fingerprints["level9"] == fingerprints["file"]
+    True
+
+    It changes when the data of a table changes, and when
+    the private data changes if that is asked for.
+
+    >>> fingerprints["edited"] == fingerprints["level9"]
+    False
+    >>> fingerprints["privateData"] == fingerprints["level9"]
+    True
+    >>> fingerprints["privateDataIncluded"] == fingerprints["level9"]
+    False
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
@@ -0,0 +1,104 @@
+import os
+import shutil
+import optparse
+import tempfile
+from woffTools import WOFFFont, WOFFReader, encodeSFNT
+from woffTools.tools.validate import validateFont, TableResultCache
+from woffTools.test.test_estimate import makeTestFont
+
+# -------
+# Support
+# -------
+
+def makeTestFiles(directory):
+    """
+    Write a WOFF made from a small test font, a copy with a
+    new family name and a copy with one byte of the compressed
+    glyf data changed.
+    """
+    sfntPath = os.path.join(directory, "font.ttf")
+    makeTestFont(sfntPath, 50, 1)
+    paths = dict((name, os.path.join(directory, name + ".woff")) for name in ("original", "edited", "corrupt"))
+    encodeSFNT(sfntPath, paths["original"])
+    font = WOFFFont(paths["original"])
+    font.recalcTimestamp = False
+    font["name"].setName(u"Incremental Test", 1, 3, 1, 0x409)
+    font.save(paths["edited"], reorderTables=False)
+    font.close()
+    f = open(paths["original"], "rb")
+    entry = WOFFReader(f).tables["glyf"]
+    f.seek(0)
+    data = bytearray(f.read())
+    f.close()
+    data[entry.offset + (entry.compLength // 2)] ^= 0xff
+    f = open(paths["corrupt"], "wb")
+    f.write(bytes(data))
+    f.close()
+    return paths
+
+def validate(path, cachePath=None, outputFormat="text"):
+    options = optparse.Values(dict(outputFormat=outputFormat, testGroups=None, checkSFNT=True))
+    if cachePath is not None:
+        options.tableResultCache = cachePath
+    return validateFont(path, options, writeFile=False)[1]
+
+def compareWithFullRuns(names, outputFormat="text"):
+    """
+    Validate the test files in order with one cache and
+    compare each report with the report of a run without
+    the cache. This returns the names of the files with
+    a different report and the number of cached results.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        paths = makeTestFiles(directory)
+        cachePath = os.path.join(directory, "cache.json")
+        different = []
+        for name in names:
+            full = validate(paths[name], outputFormat=outputFormat)
+            if validate(paths[name], cachePath, outputFormat=outputFormat) != full:
+                different.append(name)
+        cached = len(TableResultCache(cachePath))
+        leftOver = sorted(fileName for fileName in os.listdir(directory) if not fileName.endswith((".ttf", ".woff", ".json")))
+    finally:
+        shutil.rmtree(directory)
+    return different, cached, leftOver
+
+# -----
+# Tests
+# -----
+
+def incrementalTest1():
+    """
+    The report is the same with and without the cache, for the
+    first run and for later runs. The test font has 10 tables.
+    The edited font adds new name and head results and the
+    corrupt font adds a new glyf result.
+
+    >>> compareWithFullRuns(["original", "original"])
+    ([], 10, [])
+    >>> compareWithFullRuns(["original", "edited", "original", "edited"])
+    ([], 12, [])
+    >>> compareWithFullRuns(["original", "corrupt", "edited", "corrupt"])
+    ([], 13, [])
+    >>> compareWithFullRuns(["original", "edited", "corrupt"], outputFormat="html")
+    ([], 13, [])
+    """
+
+def incrementalTest2():
+    """
+    The corrupt table is reported the same way from the cache.
+
+    >>> directory = tempfile.mkdtemp()
+    >>> paths = makeTestFiles(directory)
+    >>> cachePath = os.path.join(directory, "cache.json")
+    >>> report = validate(paths["corrupt"], cachePath)
+    >>> report = validate(paths["corrupt"], cachePath)
+    >>> [line for line in report.splitlines() if line.startswith("ERROR") and "glyf" in line]
+    ['ERROR - Table Data: The "glyf" table data can not be decompressed with zlib.', 'ERROR - SFNT Data: The sfnt data can not be built because the "glyf" table can not be decompressed.']
+    >>> shutil.rmtree(directory)
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
@@ -0,0 +1,121 @@
+import os
+import shutil
+import struct
+import tempfile
+from io import BytesIO
+from woffTools import WOFFFont, WOFFLibError, encodeSFNT, decodeToSFNT
+from woffTools.tools.optimize import optimizeWOFF
+from woffTools.test.test_estimate import makeTestFont
+from woffTools.test.test_tabledata import getDirectoryEntry, setOrigLength
+
+# -------
+# Support
+# -------
+
+def makeTestWOFF(directory):
+    """
+    Write a WOFF made from a small test font with the
+    tables compressed at level 1 and return the path.
+    """
+    sfntPath = os.path.join(directory, "font.ttf")
+    sourcePath = os.path.join(directory, "source.woff")
+    woffPath = os.path.join(directory, "font.woff")
+    makeTestFont(sfntPath, 200, 1)
+    encodeSFNT(sfntPath, sourcePath)
+    font = WOFFFont(sourcePath)
+    font.recalcTimestamp = False
+    font.save(woffPath, compressionLevel=1, recompressTables=True, reorderTables=False, recalculateHeadChecksum=False)
+    font.close()
+    return woffPath
+
+def readFile(path):
+    f = open(path, "rb")
+    data = f.read()
+    f.close()
+    return data
+
+def writeFile(path, data):
+    f = open(path, "wb")
+    f.write(bytes(data))
+    f.close()
+
+def decode(path):
+    output = BytesIO()
+    decodeToSFNT(path, output)
+    return output.getvalue()
+
+# -----
+# Tests
+# -----
+
+def optimizeTest1():
+    """
+    An optimized file is smaller and decodes to the same sfnt.
+    Optimizing it again does not change it.
+
+    >>> directory = tempfile.mkdtemp()
+    >>> woffPath = makeTestWOFF(directory)
+    >>> originalSize = os.path.getsize(woffPath)
+    >>> sfntData = decode(woffPath)
+    >>> result = optimizeWOFF(woffPath)
+    >>> result["written"], result["originalSize"] == originalSize
+    (True, True)
+    >>> result["optimizedSize"] == os.path.getsize(woffPath) < originalSize
+    True
+    >>> decode(woffPath) == sfntData
+    True
+    >>> optimizedData = readFile(woffPath)
+    >>> result = optimizeWOFF(woffPath)
+    >>> result["written"], result["optimizedSize"] >= result["originalSize"]
+    (False, True)
+    >>> readFile(woffPath) == optimizedData
+    True
+    >>> shutil.rmtree(directory)
+    """
+
+def optimizeTest2():
+    """
+    dryRun reports the savings without writing anything.
+
+    >>> directory = tempfile.mkdtemp()
+    >>> woffPath = makeTestWOFF(directory)
+    >>> originalData = readFile(woffPath)
+    >>> result = optimizeWOFF(woffPath, outputPath=os.path.join(directory, "output.woff"), dryRun=True)
+    >>> result["written"], result["optimizedSize"] < result["originalSize"]
+    (False, True)
+    >>> readFile(woffPath) == originalData, sorted(os.listdir(directory))
+    (True, ['font.ttf', 'font.woff', 'source.woff'])
+    >>> shutil.rmtree(directory)
+    """
+
+def optimizeTest3():
+    """
+    The original size is the size of the file, not the
+    length in the header.
+
+    >>> directory = tempfile.mkdtemp()
+    >>> woffPath = makeTestWOFF(directory)
+    >>> originalSize = os.path.getsize(woffPath)
+    >>> data = bytearray(readFile(woffPath))
+    >>> data[8:12] = struct.pack(">L", originalSize * 2)
+    >>> writeFile(woffPath, data)
+    >>> optimizeWOFF(woffPath, dryRun=True)["originalSize"] == originalSize
+    True
+
+    A table that decompresses to more than its origLength is
+    rejected without decompressing all of it.
+
+    >>> data = readFile(woffPath)
+    >>> origLength = getDirectoryEntry(data, "glyf")[1][2]
+    >>> writeFile(woffPath, setOrigLength(data, "glyf", origLength - 8))
+    >>> try:
+    ...     optimizeWOFF(woffPath)
+    ... except WOFFLibError as error:
+    ...     print(error)
+    origLength is not correct in the 'glyf' table entry.
+    >>> shutil.rmtree(directory)
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
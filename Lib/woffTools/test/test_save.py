@@ -0,0 +1,287 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from xml.etree import ElementTree
+from woffTools import WOFFFont, encodeSFNT, decodeToSFNT, verifyRoundTrip
+from woffTools.test.test_estimate import makeTestFont
+
+# -------
+# Support
+# -------
+
+def saveTargets():
+    """
+    Save a small test font to several targets with saveMany
+    and one at a time with save. This returns the results of
+    both, keyed by target name.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        sfntPath = os.path.join(directory, "font.ttf")
+        woffPath = os.path.join(directory, "font.woff")
+        filePath = os.path.join(directory, "file.woff")
+        makeTestFont(sfntPath, 50, 1)
+        encodeSFNT(sfntPath, woffPath)
+        font = WOFFFont(woffPath)
+        font.recalcTimestamp = False
+        font.privateData = b"private data"
+        targets = [
+            dict(file=None),
+            dict(file=None, compressionLevel=1),
+            dict(file=None, format="sfnt"),
+            dict(file=filePath)
+        ]
+        results = font.saveMany(targets)
+        many = dict(woff9=bytes(results[0]), woff1=bytes(results[1]), sfnt=bytes(results[2]), file=open(filePath, "rb").read())
+        single = dict(woff9=bytes(font.save(None, recompressTables=True)),
+            woff1=bytes(font.save(None, compressionLevel=1, recompressTables=True)))
+        font.close()
+    finally:
+        shutil.rmtree(directory)
+    return many, single
+
+def makeTestWOFF(directory):
+    """
+    Write a WOFF made from a small test font, with
+    private data, and return the path.
+    """
+    sfntPath = os.path.join(directory, "font.ttf")
+    sourcePath = os.path.join(directory, "source.woff")
+    woffPath = os.path.join(directory, "font.woff")
+    makeTestFont(sfntPath, 50, 1)
+    encodeSFNT(sfntPath, sourcePath)
+    font = WOFFFont(sourcePath)
+    font.recalcTimestamp = False
+    font.privateData = b"private data"
+    font.save(woffPath)
+    font.close()
+    return woffPath
+
+def openTestFont(path):
+    """
+    Open the font at path and change the name table, so
+    that one table is loaded and the others are not.
+    """
+    font = WOFFFont(path)
+    font.recalcTimestamp = False
+    font["name"].setName(u"Save Test", 1, 3, 1, 0x409)
+    return font
+
+def comparePassThrough(**kwargs):
+    """
+    Save the test font with passThrough to a file, to a
+    BytesIO and to None and return the names of the outputs
+    that are not the same as the output of a normal save.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        woffPath = makeTestWOFF(directory)
+        filePath = os.path.join(directory, "file.woff")
+        font = openTestFont(woffPath)
+        expected = bytes(font.save(None, **kwargs))
+        font.close()
+        results = {}
+        font = openTestFont(woffPath)
+        font.save(filePath, passThrough=True, **kwargs)
+        font.close()
+        results["file"] = open(filePath, "rb").read()
+        font = openTestFont(woffPath)
+        stream = BytesIO()
+        font.save(stream, passThrough=True, **kwargs)
+        font.close()
+        results["stream"] = stream.getvalue()
+        font = openTestFont(woffPath)
+        results["none"] = bytes(font.save(None, passThrough=True, **kwargs))
+        font.close()
+    finally:
+        shutil.rmtree(directory)
+    return sorted([name for name, data in results.items() if data != expected])
+
+class NonSeekableStream(object):
+
+    """
+    A stream that can only be written to, like a pipe.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+
+    def getvalue(self):
+        return b"".join(self.chunks)
+
+def compareStreaming(**kwargs):
+    """
+    Save the test font to a non-seekable stream with
+    streaming and to a file. This returns True if the
+    bytes are the same.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        woffPath = makeTestWOFF(directory)
+        filePath = os.path.join(directory, "file.woff")
+        font = openTestFont(woffPath)
+        font.save(filePath, **kwargs)
+        font.close()
+        font = openTestFont(woffPath)
+        stream = NonSeekableStream()
+        font.save(stream, streaming=True, **kwargs)
+        font.close()
+        result = stream.getvalue() == open(filePath, "rb").read()
+    finally:
+        shutil.rmtree(directory)
+    return result
+
+def compareToBytes(addMetadata=False, **kwargs):
+    """
+    Compile the test font with toBytes and save it to a
+    file. This returns True if the bytes are the same.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        woffPath = makeTestWOFF(directory)
+        filePath = os.path.join(directory, "file.woff")
+        results = []
+        for toFile in (False, True):
+            font = openTestFont(woffPath)
+            if addMetadata:
+                ElementTree.SubElement(font.metadata, "uniqueid", id="com.example.save")
+            if toFile:
+                font.save(filePath, **kwargs)
+                results.append(open(filePath, "rb").read())
+            else:
+                data = font.toBytes(**kwargs)
+                results.append(bytes(data))
+            font.close()
+    finally:
+        shutil.rmtree(directory)
+    return isinstance(data, bytearray) and results[0] == results[1]
+
+def compareSpill(spillThreshold, **kwargs):
+    """
+    Save the test font with spillThreshold to a file and to
+    None. This returns True if both are the same as the
+    output of a save without spillThreshold.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        woffPath = makeTestWOFF(directory)
+        filePath = os.path.join(directory, "file.woff")
+        font = openTestFont(woffPath)
+        expected = bytes(font.save(None, **kwargs))
+        font.close()
+        font = openTestFont(woffPath)
+        font.save(filePath, spillThreshold=spillThreshold, **kwargs)
+        font.close()
+        font = openTestFont(woffPath)
+        data = bytes(font.save(None, spillThreshold=spillThreshold, **kwargs))
+        font.close()
+        result = data == expected and open(filePath, "rb").read() == expected
+    finally:
+        shutil.rmtree(directory)
+    return result
+
+def decode(woffData):
+    output = BytesIO()
+    decodeToSFNT(BytesIO(woffData), output)
+    return output.getvalue()
+
+# -----
+# Tests
+# -----
+
+def saveManyTest1():
+    """
+    saveMany compresses every table at the level of each
+    target, so each WOFF target is the same as the output
+    of save with recompressTables.
+
+    >>> many, single = saveTargets()
+    >>> many["woff9"] == single["woff9"], many["woff1"] == single["woff1"]
+    (True, True)
+    >>> many["file"] == many["woff9"]
+    True
+    >>> len(many["woff1"]) > len(many["woff9"])
+    True
+
+    The targets decode to the sfnt target and round trip.
+
+    >>> decode(many["woff9"]) == many["sfnt"], decode(many["woff1"]) == many["sfnt"]
+    (True, True)
+    >>> verifyRoundTrip(BytesIO(many["woff9"])), verifyRoundTrip(BytesIO(many["woff1"]))
+    ([], [])
+    """
+
+def passThroughTest1():
+    """
+    passThrough gives the same bytes as a normal save for
+    every kind of output.
+
+    >>> comparePassThrough()
+    []
+    >>> comparePassThrough(reorderTables=False)
+    []
+    >>> comparePassThrough(recalculateHeadChecksum=False)
+    []
+    >>> comparePassThrough(reorderTables=False, recalculateHeadChecksum=False)
+    []
+    """
+
+def streamingTest1():
+    """
+    Saving to a non-seekable stream gives the same
+    bytes as saving to a file.
+
+    >>> compareStreaming()
+    True
+    >>> compareStreaming(reorderTables=False, recalculateHeadChecksum=False)
+    True
+    >>> compareStreaming(recompressTables=True, compressionLevel=1)
+    True
+
+    encodeSFNT can write to a non-seekable stream too.
+
+    >>> directory = tempfile.mkdtemp()
+    >>> sfntPath = os.path.join(directory, "font.ttf")
+    >>> makeTestFont(sfntPath, 50, 1)
+    >>> stream = NonSeekableStream()
+    >>> encodeSFNT(sfntPath, stream, streaming=True)
+    >>> stream.getvalue() == bytes(encodeSFNT(sfntPath, None))
+    True
+    >>> shutil.rmtree(directory)
+    """
+
+def toBytesTest1():
+    """
+    toBytes returns a bytearray with the same bytes
+    as the saved file.
+
+    >>> compareToBytes()
+    True
+    >>> compareToBytes(addMetadata=True)
+    True
+    >>> compareToBytes(reorderTables=False, recalculateHeadChecksum=False)
+    True
+    >>> compareToBytes(recompressTables=True, compressionLevel=1)
+    True
+    """
+
+def spillTest1():
+    """
+    Tables that are kept in a temporary file are
+    written the same as tables kept in memory.
+
+    >>> compareSpill(0), compareSpill(100)
+    (True, True)
+    >>> compareSpill(0, recompressTables=True), compareSpill(100, recompressTables=True)
+    (True, True)
+    >>> compareSpill(100, reorderTables=False, recalculateHeadChecksum=False)
+    True
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
@@ -0,0 +1,331 @@
+import os
+import zlib
+import time
+import shutil
+import struct
+import random
+import optparse
+import resource
+import tempfile
+import multiprocessing
+from fontTools.misc import sstruct
+from woffTools import WOFFReader, WOFFLibError, woffHeaderFormat, woffHeaderSize, \
+    verifyRoundTrip, checkSFNTConformance, getCompressionBackend, calc4BytePaddedLength, \
+    CompressionBackend
+from woffTools.tools.validate import validateFont
+
+# ------
+# Corpus
+# ------
+
+# Each function returns the data for one pathological file.
+# The files are small, but they describe far more data or
+# far more work than they contain.
+
+woffDirectoryEntryFormat = ">4sLLLL"
+woffDirectoryEntrySize = struct.calcsize(woffDirectoryEntryFormat)
+
+def makeTag(index):
+    return ("%04x" % index).encode("ascii")
+
+def makeTableData(length, seed=1):
+    """
+    Data that compresses to roughly a third of its length.
+    """
+    randomizer = random.Random(seed)
+    return b"".join([struct.pack(">H", randomizer.randint(0, 1023)) for i in range(length // 2)])
+
+def packWOFF(entries, tableData, metadata=b"", metaOrigLength=None, numTables=None):
+    """
+    Pack a WOFF. entries is a list of (tag, offset, compLength,
+    origLength, origChecksum) with the offsets relative to the
+    start of tableData.
+    """
+    if numTables is None:
+        numTables = len(entries)
+    tableStart = woffHeaderSize + (woffDirectoryEntrySize * len(entries))
+    directory = [struct.pack(woffDirectoryEntryFormat, tag, tableStart + offset, compLength, origLength, origChecksum)
+        for tag, offset, compLength, origLength, origChecksum in entries]
+    tableData += b"\0" * (calc4BytePaddedLength(len(tableData)) - len(tableData))
+    length = tableStart + len(tableData) + len(metadata)
+    header = dict(
+        signature=b"wOFF",
+        flavor=b"\000\001\000\000",
+        length=length,
+        numTables=numTables,
+        reserved=0,
+        totalSFNTSize=12 + (16 * len(entries)) + sum([calc4BytePaddedLength(entry[3]) for entry in entries]),
+        majorVersion=0,
+        minorVersion=0,
+        metaOffset=0,
+        metaLength=0,
+        metaOrigLength=0,
+        privOffset=0,
+        privLength=0
+    )
+    if metadata:
+        header["metaOffset"] = tableStart + len(tableData)
+        header["metaLength"] = len(metadata)
+        header["metaOrigLength"] = metaOrigLength
+    return sstruct.pack(woffHeaderFormat, header) + b"".join(directory) + tableData + metadata
+
+def manyTablesWOFF():
+    """
+    65535 zero-length tables.
+    """
+    entries = [(makeTag(index), 0, 0, 0, 0) for index in range(65535)]
+    return packWOFF(entries, b"")
+
+def overlappingTablesWOFF():
+    """
+    4095 tables, the most a sfnt can hold, that all
+    point to the same compressed data.
+    """
+    data = makeTableData(65536)
+    compData = getCompressionBackend().compress(data)
+    entries = [(makeTag(index), 0, len(compData), len(data), 0) for index in range(4095)]
+    return packWOFF(entries, compData)
+
+def metadataLengthWOFF():
+    """
+    Small metadata that claims to be 4GB when decompressed.
+    """
+    metadata = getCompressionBackend().compress(b"<?xml version=\"1.0\" encoding=\"UTF-8\"?><metadata version=\"1.0\"/>")
+    entries = [(b"test", 0, 4, 4, 0)]
+    return packWOFF(entries, b"\0" * 4, metadata=metadata, metaOrigLength=0xffffffff)
+
+def nestedMetadataWOFF():
+    """
+    Metadata with 100000 levels of nested div elements.
+    """
+    depth = 100000
+    text = b"<?xml version=\"1.0\" encoding=\"UTF-8\"?><metadata version=\"1.0\"><description><text>"
+    text += b"<div>" * depth + b"</div>" * depth
+    text += b"</text></description></metadata>"
+    metadata = getCompressionBackend().compress(text)
+    entries = [(b"test", 0, 4, 4, 0)]
+    return packWOFF(entries, b"\0" * 4, metadata=metadata, metaOrigLength=len(text))
+
+def inflatedTableWOFF():
+    """
+    A table that inflates to 256MB, far more than its origLength.
+    """
+    compressor = zlib.compressobj(9)
+    chunk = b"\0" * (1024 * 1024)
+    compData = b"".join([compressor.compress(chunk) for i in range(256)]) + compressor.flush()
+    entries = [(b"test", 0, len(compData), len(compData) + 4, 0)]
+    return packWOFF(entries, compData)
+
+def packSFNT(entries, tableData):
+    """
+    Pack a sfnt. entries is a list of (tag, offset, length) with
+    the offsets relative to the start of tableData. The checksums
+    are left as zero.
+    """
+    tableStart = 12 + (16 * len(entries))
+    header = struct.pack(">4sHHHH", b"\000\001\000\000", len(entries) & 0xffff, 0, 0, 0)
+    directory = [struct.pack(">4sLLL", tag, 0, tableStart + offset, length) for tag, offset, length in entries]
+    return header + b"".join(directory) + tableData
+
+def manyTablesSFNT():
+    """
+    65535 zero-length tables.
+    """
+    entries = [(makeTag(index), 0, 0) for index in range(65535)]
+    return packSFNT(entries, b"")
+
+def overlappingTablesSFNT():
+    """
+    30000 tables that all cover the same 64K of data.
+    """
+    entries = [(makeTag(index), 0, 65536) for index in range(30000)]
+    return packSFNT(entries, makeTableData(65536))
+
+woffCorpus = [
+    ("manyTables", manyTablesWOFF),
+    ("overlappingTables", overlappingTablesWOFF),
+    ("metadataLength", metadataLengthWOFF),
+    ("nestedMetadata", nestedMetadataWOFF),
+    ("inflatedTable", inflatedTableWOFF),
+]
+
+sfntCorpus = [
+    ("manyTables", manyTablesSFNT),
+    ("overlappingTables", overlappingTablesSFNT),
+]
+
+# ----------
+# Benchmarks
+# ----------
+
+# Each check must finish within the time limit and must
+# not grow the peak memory of the process by more than
+# the memory limit.
+
+timeLimit = 10
+memoryLimit = 256 * 1024 * 1024
+
+def readWOFF(path):
+    f = open(path, "rb")
+    try:
+        reader = WOFFReader(f, checkChecksums=0)
+        try:
+            reader[reader.keys()[0]]
+        except WOFFLibError:
+            pass
+        if reader.metaLength:
+            try:
+                reader.metadata
+            except (WOFFLibError, AssertionError):
+                pass
+        verifyRoundTrip(f)
+    finally:
+        f.close()
+
+def validateWOFF(path):
+    options = optparse.Values(dict(outputFormat="html", testGroups=None, checkSFNT=True))
+    validateFont(path, options, writeFile=False)
+
+def _peakMemory():
+    # ru_maxrss is in kilobytes on Linux and bytes on Mac OS X
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if os.uname()[0] == "Darwin":
+        return peak
+    return peak * 1024
+
+def _measure(function, path, queue):
+    start = _peakMemory()
+    startTime = time.time()
+    try:
+        function(path)
+        error = None
+    except Exception as e:
+        error = "%s: %s" % (e.__class__.__name__, e)
+    queue.put((time.time() - startTime, _peakMemory() - start, error))
+
+def measure(function, path):
+    """
+    Run function(path) in a child process and return the
+    time, the growth of the peak memory and any exception.
+    A child that is still running after twice the time
+    limit is stopped.
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure, args=(function, path, queue))
+    process.start()
+    process.join(timeLimit * 2)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+        return None, None, "stopped"
+    if process.exitcode:
+        return None, None, "exit code %d" % process.exitcode
+    return queue.get()
+
+def runBenchmark(function, corpus):
+    """
+    Write the corpus, run function on each file and return a
+    list of the files that broke the limits or raised an error.
+    """
+    directory = tempfile.mkdtemp()
+    problems = []
+    try:
+        for name, builder in corpus:
+            path = os.path.join(directory, name)
+            f = open(path, "wb")
+            f.write(builder())
+            f.close()
+            elapsed, memory, error = measure(function, path)
+            if error is not None:
+                problems.append("%s: %s" % (name, error))
+            elif elapsed > timeLimit:
+                problems.append("%s: %.1f seconds" % (name, elapsed))
+            elif memory > memoryLimit:
+                problems.append("%s: %d MB" % (name, memory // (1024 * 1024)))
+    finally:
+        shutil.rmtree(directory)
+    return problems
+
+# -----
+# Tests
+# -----
+
+def readerStressTest():
+    """
+    >>> runBenchmark(readWOFF, woffCorpus)
+    []
+    """
+
+def validateStressTest():
+    """
+    >>> runBenchmark(validateWOFF, woffCorpus)
+    []
+    """
+
+def sfntConformanceStressTest():
+    """
+    >>> runBenchmark(checkSFNTConformance, sfntCorpus)
+    []
+    """
+
+class CountingModule(object):
+
+    """
+    A zlib wrapper that counts the complete decompress calls.
+    """
+
+    def __init__(self):
+        self.error = zlib.error
+        self.decompressCalls = 0
+
+    def decompress(self, data):
+        self.decompressCalls += 1
+        return zlib.decompress(data)
+
+    def decompressobj(self):
+        return zlib.decompressobj()
+
+def countDecompressCalls(data, maxLength):
+    """
+    Decompress with a limit and return the number of times
+    the complete decompression had to be run and the result
+    or the error.
+    """
+    module = CountingModule()
+    backend = CompressionBackend("counting", module)
+    try:
+        result = len(backend.decompress(data, maxLength))
+    except zlib.error:
+        result = "error"
+    return module.decompressCalls, result
+
+def decompressCallTest():
+    """
+    A complete stream is only decompressed once, even
+    when it is shorter than the limit.
+
+    >>> data = makeTableData(1000)
+    >>> compData = zlib.compress(data)
+    >>> countDecompressCalls(compData, len(data) + 1)
+    (0, 1000)
+    >>> countDecompressCalls(compData + b"\\0\\0", len(data) + 1)
+    (0, 1000)
+    >>> countDecompressCalls(compData, 100)
+    (0, 100)
+
+    Truncated and corrupt streams raise the error without
+    being run again, even when the limit is reached before
+    the end of the stream.
+
+    >>> countDecompressCalls(compData[:-4], len(data) + 1)
+    (0, 'error')
+    >>> countDecompressCalls(compData[:len(compData) // 2], len(data) + 1)
+    (0, 'error')
+    >>> corrupt = compData[:-1] + chr(ord(compData[-1]) ^ 0xff)
+    >>> countDecompressCalls(corrupt, 100)
+    (0, 'error')
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
@@ -0,0 +1,141 @@
+import os
+import shutil
+import struct
+import tempfile
+from woffTools import WOFFReader, encodeSFNT, woffHeaderSize, woffDirectoryEntrySize
+from woffTools.test.test_estimate import makeTestFont
+from woffTools.test.test_incremental import validate
+
+# -------
+# Support
+# -------
+
+def makeTestData():
+    """
+    Return the data of a WOFF made from a small test font.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        sfntPath = os.path.join(directory, "font.ttf")
+        woffPath = os.path.join(directory, "font.woff")
+        makeTestFont(sfntPath, 50, 1)
+        encodeSFNT(sfntPath, woffPath)
+        f = open(woffPath, "rb")
+        data = f.read()
+        f.close()
+    finally:
+        shutil.rmtree(directory)
+    return bytearray(data)
+
+def getDirectoryEntry(data, tag):
+    """
+    Return the index of the directory entry for tag and
+    the offset, compLength, origLength and origChecksum.
+    """
+    numTables = struct.unpack(">H", bytes(data[12:14]))[0]
+    for index in range(numTables):
+        position = woffHeaderSize + (woffDirectoryEntrySize * index)
+        values = struct.unpack(">4sLLLL", bytes(data[position:position + woffDirectoryEntrySize]))
+        if values[0] == tag:
+            return index, values[1:]
+    raise KeyError(tag)
+
+def flipByte(data, tag, position):
+    """
+    Invert one byte of the compressed data for tag. A negative
+    position counts from the end of the data.
+    """
+    data = bytearray(data)
+    index, (offset, compLength, origLength, origChecksum) = getDirectoryEntry(data, tag)
+    if position < 0:
+        position += compLength
+    data[offset + position] ^= 0xff
+    return data
+
+def setOrigLength(data, tag, origLength):
+    data = bytearray(data)
+    index = getDirectoryEntry(data, tag)[0]
+    position = woffHeaderSize + (woffDirectoryEntrySize * index) + 12
+    data[position:position + 4] = struct.pack(">L", origLength)
+    return data
+
+def validateData(data, tag=None):
+    """
+    Validate data and return the errors. If tag is given,
+    only the errors that mention it are returned.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "font.woff")
+        f = open(path, "wb")
+        f.write(bytes(data))
+        f.close()
+        report = validate(path)
+    finally:
+        shutil.rmtree(directory)
+    errors = [line for line in report.splitlines() if line.startswith("ERROR")]
+    if tag is not None:
+        errors = [line for line in errors if "\"%s\"" % tag in line]
+    return errors
+
+def printErrors(errors):
+    for error in errors:
+        print(error)
+
+# -----
+# Tests
+# -----
+
+def tableDataTest1():
+    """
+    A changed byte in compressed table data is an error.
+    The bytes changed here leave a valid deflate stream with
+    different data, so the error is only found by the adler32
+    checksum at the end of the stream.
+
+    >>> data = makeTestData()
+    >>> validateData(data)
+    []
+    >>> for tag, position in (("maxp", 10), ("head", 41)):
+    ...     printErrors(validateData(flipByte(data, tag, position)))
+    ERROR - Table Data: The "maxp" table data can not be decompressed with zlib.
+    ERROR - SFNT Data: The sfnt data can not be built because the "maxp" table can not be decompressed.
+    ERROR - Table Directory: The "head" table is not properly structured.
+    ERROR - Table Data: The "head" table data can not be decompressed with zlib.
+    ERROR - SFNT Data: The sfnt data can not be built because the "head" table can not be decompressed.
+    """
+
+def tableDataTest2():
+    """
+    An origLength that is too small is reported with the
+    actual length of the data and the checksum is still
+    calculated from the complete data.
+
+    >>> data = makeTestData()
+    >>> origLength = getDirectoryEntry(data, "glyf")[1][2]
+    >>> errors = validateData(setOrigLength(data, "glyf", origLength - 8), "glyf")
+    >>> errors == ["ERROR - Table Directory: The \\"glyf\\" table directory entry has an original length (%d) that does not match the actual length of the decompressed data (%d)." % (origLength - 8, origLength)]
+    True
+    """
+
+def sfntDataTest1():
+    """
+    The sfnt data test reports where the tables of the
+    decoded sfnt do not match its directory and does not
+    repeat the checksum errors of the Table Directory group.
+
+    >>> data = makeTestData()
+    >>> origLength = getDirectoryEntry(data, "glyf")[1][2]
+    >>> errors = validateData(setOrigLength(data, "glyf", origLength - 8))
+    >>> printErrors([error for error in errors if "SFNT Data" in error])
+    ERROR - SFNT Data: sfnt: Bytes between glyf and name are not null.
+    >>> printErrors([error for error in errors if "checksum" in error.lower()])  # doctest: +ELLIPSIS
+    ERROR - Table Directory: The "head" table checkSumAdjustment (...) does not match the calculated checkSumAdjustment (...).
+    >>> errors = validateData(setOrigLength(data, "glyf", origLength + 8))
+    >>> printErrors([error for error in errors if "SFNT Data" in error])
+    ERROR - SFNT Data: sfnt: The length of the post table is not valid.
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
@@ -0,0 +1,177 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from xml.etree import ElementTree
+from fontTools.ttLib.tables.DefaultTable import DefaultTable
+from woffTools import WOFFFont, WOFFReader, encodeSFNT, decodeToSFNT, updateWOFF, patchWOFFTable, verifyRoundTrip, woffHeaderSize
+from woffTools.test.test_estimate import makeTestFont
+
+# -------
+# Support
+# -------
+
+def makeTestDirectory():
+    """
+    Make a directory with a WOFF made from a small
+    test font and return the directory and the path.
+    """
+    directory = tempfile.mkdtemp()
+    sfntPath = os.path.join(directory, "font.ttf")
+    woffPath = os.path.join(directory, "font.woff")
+    makeTestFont(sfntPath, 50, 1)
+    encodeSFNT(sfntPath, woffPath)
+    return directory, woffPath
+
+def readFile(path):
+    f = open(path, "rb")
+    data = f.read()
+    f.close()
+    return data
+
+def readBlocks(path):
+    """
+    Return the version, the compressed metadata, the metadata,
+    the private data and the table data in the WOFF at path.
+    """
+    f = open(path, "rb")
+    reader = WOFFReader(f)
+    tableData = [reader.getCompressedTableData(tag) for tag in sorted(reader.keys())]
+    blocks = dict(
+        version=(reader.majorVersion, reader.minorVersion),
+        compressedMetadata=reader.getCompressedMetadata(),
+        metadata=reader.metadata,
+        privateData=reader.privateData,
+        tableData=tableData
+    )
+    f.close()
+    return blocks
+
+def makeMetadata():
+    metadata = ElementTree.Element("metadata", version="1.0")
+    ElementTree.SubElement(metadata, "uniqueid", id="com.example.updates")
+    vendor = ElementTree.SubElement(metadata, "vendor", name="Example")
+    vendor.text = u"Caf\xe9"
+    return metadata
+
+def compareWithSave(**kwargs):
+    """
+    Update a WOFF in place and write the same data with
+    WOFFFont.save. This returns a list of the blocks that
+    are not the same.
+    """
+    directory, woffPath = makeTestDirectory()
+    try:
+        savedPath = os.path.join(directory, "saved.woff")
+        font = WOFFFont(woffPath)
+        for key, value in kwargs.items():
+            if key == "metadata":
+                font.metadata.extend(list(value))
+            else:
+                setattr(font, key, value)
+        font.save(savedPath, reorderTables=False, recalculateHeadChecksum=False)
+        font.close()
+        updateWOFF(woffPath, **kwargs)
+        updated = readBlocks(woffPath)
+        saved = readBlocks(savedPath)
+        differences = [key for key in sorted(saved.keys()) if saved[key] != updated[key]]
+        if readFile(woffPath)[woffHeaderSize:] != readFile(savedPath)[woffHeaderSize:]:
+            differences.append("data")
+    finally:
+        shutil.rmtree(directory)
+    return differences
+
+def decode(path):
+    output = BytesIO()
+    decodeToSFNT(path, output)
+    return output.getvalue()
+
+def patchWithSave(edit):
+    """
+    Patch the name table with the data returned by edit
+    and write the same data with WOFFFont.save. This returns
+    the result of patchWOFFTable, True if both decode to the
+    same sfnt and the errors from verifyRoundTrip.
+    """
+    directory, woffPath = makeTestDirectory()
+    try:
+        savedPath = os.path.join(directory, "saved.woff")
+        font = WOFFFont(woffPath)
+        font.recalcTimestamp = False
+        data = edit(font.reader["name"])
+        table = DefaultTable("name")
+        table.data = data
+        font["name"] = table
+        font.save(savedPath, reorderTables=False)
+        font.close()
+        inPlace = patchWOFFTable(woffPath, "name", data)
+        result = (inPlace, decode(woffPath) == decode(savedPath), verifyRoundTrip(woffPath))
+    finally:
+        shutil.rmtree(directory)
+    return result
+
+# -----
+# Tests
+# -----
+
+def updateTest1():
+    """
+    updateWOFF and WOFFFont.save produce the same blocks.
+
+    >>> compareWithSave(metadata=makeMetadata())
+    []
+    >>> compareWithSave(metadata=makeMetadata(), privateData=b"private data", majorVersion=2, minorVersion=5)
+    []
+    """
+
+def updateTest2():
+    """
+    Changing one block keeps the others and the table data.
+
+    >>> directory, woffPath = makeTestDirectory()
+    >>> original = readBlocks(woffPath)
+    >>> updateWOFF(woffPath, metadata=makeMetadata(), privateData=b"first")
+    >>> updateWOFF(woffPath, privateData=b"second")
+    >>> blocks = readBlocks(woffPath)
+    >>> blocks["privateData"], blocks["tableData"] == original["tableData"]
+    ('second', True)
+    >>> ElementTree.fromstring(blocks["metadata"]).find("vendor").text
+    u'Caf\\xe9'
+    >>> updateWOFF(woffPath, metadata="")
+    >>> blocks = readBlocks(woffPath)
+    >>> blocks["metadata"], blocks["privateData"]
+    ('', 'second')
+    >>> os.path.getsize(woffPath) == WOFFReader(open(woffPath, "rb")).length
+    True
+    >>> shutil.rmtree(directory)
+    """
+
+def patchTest1():
+    """
+    Patching a table with its own data changes nothing.
+
+    >>> directory, woffPath = makeTestDirectory()
+    >>> original = readFile(woffPath)
+    >>> data = WOFFReader(open(woffPath, "rb"))["name"]
+    >>> patchWOFFTable(woffPath, "name", data)
+    True
+    >>> readFile(woffPath) == original
+    True
+    >>> shutil.rmtree(directory)
+    """
+
+def patchTest2():
+    """
+    A small change is patched in place and a large change
+    rewrites the file. Both decode to the same sfnt as a
+    full save and keep a correct head checkSumAdjustment.
+
+    >>> patchWithSave(lambda data: data.replace(b"Test 1", b"Test 2"))
+    (True, True, [])
+    >>> patchWithSave(lambda data: data + bytes(bytearray(range(256))))
+    (False, True, [])
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
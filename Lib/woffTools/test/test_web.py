@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from woffTools import WOFFFont, WOFFReader, encodeSFNT, calc4BytePaddedLength, woffDirectoryEntrySize
+from woffTools.test.test_estimate import makeTestFont
+
+# -------
+# Support
+# -------
+
+def tableSize(data):
+    """
+    The size of the tables, padded and with their directory
+    entries, in WOFF data. The head table is left out because
+    its checkSumAdjustment, and so its compressed length,
+    changes with every other table.
+    """
+    reader = WOFFReader(BytesIO(bytes(data)))
+    return sum([calc4BytePaddedLength(entry.compLength) + woffDirectoryEntrySize
+        for tag, entry in reader.tables.items() if tag != "head"])
+
+def compareReportWithActualSize(compressionLevel, **kwargs):
+    """
+    Optimize a test font for the web and compare the bytes
+    saved according to the report with the difference between
+    the tables of the optimized and the unoptimized file, both
+    saved at compressionLevel. This returns the reported and
+    the actual savings.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        sfntPath = os.path.join(directory, "font.ttf")
+        woffPath = os.path.join(directory, "font.woff")
+        makeTestFont(sfntPath, 500, 1)
+        encodeSFNT(sfntPath, woffPath)
+        font = WOFFFont(woffPath)
+        font.recalcTimestamp = False
+        report = font.optimizeForWeb(compressionLevel=compressionLevel, **kwargs)
+        optimized = font.save(None, compressionLevel=compressionLevel, recompressTables=True)
+        font.close()
+        font = WOFFFont(woffPath)
+        font.recalcTimestamp = False
+        original = font.save(None, compressionLevel=compressionLevel, recompressTables=True)
+        font.close()
+    finally:
+        shutil.rmtree(directory)
+    return sum(report.values()), tableSize(original) - tableSize(optimized)
+
+# -----
+# Tests
+# -----
+
+def webReportTest1():
+    """
+    The savings are measured at the compression level that
+    the font is saved with.
+
+    >>> reported, actual = compareReportWithActualSize(9, postFormat3=False, pruneCmap=False)
+    >>> reported == actual
+    True
+    >>> reported, actual = compareReportWithActualSize(1, postFormat3=False, pruneCmap=False)
+    >>> reported == actual
+    True
+    """
+
+def webReportTest2():
+    """
+    >>> reported, actual = compareReportWithActualSize(1)
+    >>> reported == actual
+    True
+    >>> reported > 0
+    True
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod(verbose=False)
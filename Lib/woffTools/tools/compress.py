@@ -0,0 +1,268 @@
+"""
+A module for converting directory trees of TTF and OTF
+files to WOFF. *compressDirectory* is the only public function.
+
+This can also be used as a command line tool.
+"""
+
+# import test
+
+importErrors = []
+try:
+    import fontTools
+except ImportError:
+    importErrors.append("fontTools")
+try:
+    import woffTools
+except ImportError:
+    importErrors.append("woffTools")
+
+if importErrors:
+    import sys
+    print("Could not import needed module(s): %s" % ", ".join(importErrors))
+    sys.exit()
+
+# import
+
+import os
+import sys
+import time
+import optparse
+from woffTools import encodeSFNT, getCompressionBackend, setCompressionBackend, WOFFLibError
+from woffTools.tools.support import findFiles, runPool
+
+sfntExtensions = (".ttf", ".otf")
+journalFileName = ".woff-compress-journal"
+
+# -------
+# Journal
+# -------
+
+class CompressionJournal(object):
+
+    """
+    A record of the files that have been converted. Each
+    completed conversion is appended and flushed as soon as
+    it is done, so an interrupted run loses nothing. A file
+    is considered done if the journal has an entry for it
+    with the same source size and modification time and the
+    output file still exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            f = open(path, "r")
+            for line in f:
+                line = line.rstrip("\n")
+                if not line:
+                    continue
+                # ignore a line that was cut short by an interruption
+                try:
+                    status, size, modified, relativePath = line.split("\t", 3)
+                    self.entries[relativePath] = (status, int(size), float(modified))
+                except ValueError:
+                    continue
+            f.close()
+        self._file = open(path, "a")
+
+    def isDone(self, relativePath, sourcePath, outputPath):
+        entry = self.entries.get(relativePath)
+        if entry is None:
+            return False
+        status, size, modified = entry
+        if status != "ok":
+            return False
+        if not os.path.exists(outputPath):
+            return False
+        stat = os.stat(sourcePath)
+        return stat.st_size == size and stat.st_mtime == modified
+
+    def record(self, relativePath, sourcePath, status):
+        stat = os.stat(sourcePath)
+        self.entries[relativePath] = (status, stat.st_size, stat.st_mtime)
+        self._file.write("%s\t%d\t%r\t%s\n" % (status, stat.st_size, stat.st_mtime, relativePath))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+# -----------
+# Conversion
+# -----------
+
+def isUpToDate(sourcePath, outputPath):
+    if not os.path.exists(outputPath):
+        return False
+    return os.path.getmtime(outputPath) >= os.path.getmtime(sourcePath)
+
+def _compressFile(job):
+    """
+    Convert one file. This runs in a worker process.
+    The output is written to a temporary file and moved
+    into place so that an interrupted conversion never
+    leaves a partial WOFF behind.
+    """
+    relativePath, sourcePath, outputPath, compressionLevel, checkConformance, compressionBackend = job
+    if getCompressionBackend().name != compressionBackend:
+        setCompressionBackend(compressionBackend)
+    tempPath = outputPath + ".tmp%d" % os.getpid()
+    try:
+        directory = os.path.dirname(outputPath)
+        if directory and not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # another worker made it
+                pass
+        encodeSFNT(sourcePath, tempPath, compressionLevel=compressionLevel, checkConformance=checkConformance)
+        if os.path.exists(outputPath):
+            os.remove(outputPath)
+        os.rename(tempPath, outputPath)
+        return relativePath, None, os.path.getsize(sourcePath), os.path.getsize(outputPath)
+    except Exception:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        error = sys.exc_info()[1]
+        return relativePath, "%s: %s" % (error.__class__.__name__, error), 0, 0
+
+def compressDirectory(sourceDirectory, outputDirectory, compressionLevel=9, processes=None,
+        checkConformance=True, compressionBackend=None, report=None):
+    """
+    Convert all TTF and OTF files in sourceDirectory to WOFF.
+    The directory structure is mirrored into outputDirectory.
+    The conversion is done on a pool of processes. processes
+    sets the number of processes. The default is the number
+    of CPUs.
+
+    A journal is kept in outputDirectory. If a run is
+    interrupted, the next run skips the files that have
+    already been converted. Files with an output that is
+    newer than the source are skipped as well.
+
+    If checkConformance is False, fonts that do not meet
+    the WOFF sfnt conformance requirements will be converted
+    with recalculated checksums instead of failing.
+
+    compressionBackend sets the zlib backend. The default
+    is zlib-ng if it is installed and zlib if it is not.
+    isal only has compression levels 1 to 3.
+
+    report, if given, is called with a message for
+    each file that is converted or fails.
+
+    This returns a dict with the counts of converted, skipped
+    and failed files, the failures, the total source and
+    output sizes, the compression backend and the elapsed time.
+    """
+    start = time.time()
+    backend = setCompressionBackend(compressionBackend)
+    if not os.path.exists(outputDirectory):
+        os.makedirs(outputDirectory)
+    journal = CompressionJournal(os.path.join(outputDirectory, journalFileName))
+    summary = dict(converted=0, skipped=0, failed=0, failures=[], sourceSize=0, outputSize=0, backend=backend.name)
+    # gather the jobs
+    jobs = []
+    for sourcePath in findFiles([sourceDirectory], sfntExtensions):
+        relativePath = os.path.relpath(sourcePath, sourceDirectory)
+        outputPath = os.path.join(outputDirectory, os.path.splitext(relativePath)[0] + ".woff")
+        if journal.isDone(relativePath, sourcePath, outputPath) or isUpToDate(sourcePath, outputPath):
+            summary["skipped"] += 1
+            continue
+        jobs.append((relativePath, sourcePath, outputPath, compressionLevel, checkConformance, backend.name))
+    # convert
+    def handleResult(result):
+        relativePath, error, sourceSize, outputSize = result
+        sourcePath = os.path.join(sourceDirectory, relativePath)
+        if error is None:
+            summary["converted"] += 1
+            summary["sourceSize"] += sourceSize
+            summary["outputSize"] += outputSize
+            journal.record(relativePath, sourcePath, "ok")
+            if report is not None:
+                report("Converted: %s" % relativePath)
+        else:
+            summary["failed"] += 1
+            summary["failures"].append((relativePath, error))
+            journal.record(relativePath, sourcePath, "failed")
+            if report is not None:
+                report("Failed: %s (%s)" % (relativePath, error))
+    try:
+        if jobs:
+            runPool(_compressFile, jobs, handleResult, processes)
+    finally:
+        journal.close()
+    summary["time"] = time.time() - start
+    return summary
+
+def formatSummary(summary):
+    elapsed = max(summary["time"], 0.001)
+    lines = [
+        "Converted: %d" % summary["converted"],
+        "Skipped (up to date): %d" % summary["skipped"],
+        "Failed: %d" % summary["failed"],
+        "Source size: %d bytes" % summary["sourceSize"],
+        "WOFF size: %d bytes" % summary["outputSize"],
+        "Compression backend: %s" % summary["backend"],
+        "Time: %.2f seconds" % summary["time"],
+        "Throughput: %.1f files/second, %.2f MB/second" % (summary["converted"] / elapsed, summary["sourceSize"] / elapsed / (1024 * 1024))
+    ]
+    if summary["sourceSize"]:
+        lines.insert(5, "Compression: %.1f%%" % (100.0 * summary["outputSize"] / summary["sourceSize"]))
+    return "\n".join(lines)
+
+# --------------------
+# Command Line Behvior
+# --------------------
+
+usage = "%prog [options] directory1 directory2"
+
+description = """This tool converts all TTF and OTF files
+in one or more directories, and their subdirectories, to WOFF.
+The directory structure is mirrored in the output directory.
+A journal is kept in the output directory so that an
+interrupted run can be resumed. Files that are up to date
+are skipped.
+"""
+
+def main():
+    parser = optparse.OptionParser(usage=usage, description=description, version="%prog 0.1beta")
+    parser.add_option("-d", dest="outputDirectory", help="Output directory. The default is to output the WOFF files into the same directory as the font files.")
+    parser.add_option("-l", dest="compressionLevel", type="int", default=9, help="The zlib compression level. The default is 9.")
+    parser.add_option("-j", dest="processes", type="int", default=None, help="The number of processes. The default is the number of CPUs.")
+    parser.add_option("-b", dest="compressionBackend", help="The zlib backend to use: zlib-ng, zlib or isal. isal only has compression levels 1 to 3, so higher levels give larger files with it. The default is zlib-ng if it is installed and zlib if it is not.")
+    parser.add_option("-f", action="store_false", dest="checkConformance", default=True, help="Convert fonts that do not meet the WOFF sfnt conformance requirements.")
+    parser.add_option("-q", action="store_true", dest="quiet", default=False, help="Only print the summary.")
+    (options, args) = parser.parse_args()
+    outputDirectory = options.outputDirectory
+    if outputDirectory is not None and not os.path.exists(outputDirectory):
+        print("Directory does not exist: %s" % outputDirectory)
+        sys.exit()
+    try:
+        setCompressionBackend(options.compressionBackend)
+    except WOFFLibError:
+        print(sys.exc_info()[1])
+        sys.exit()
+    report = None
+    if not options.quiet:
+        def report(message):
+            print(message)
+    for sourceDirectory in args:
+        if not os.path.isdir(sourceDirectory):
+            print("Directory does not exist: %s" % sourceDirectory)
+            sys.exit()
+        if outputDirectory is None:
+            directory = sourceDirectory
+        elif len(args) > 1:
+            directory = os.path.join(outputDirectory, os.path.basename(os.path.normpath(sourceDirectory)))
+        else:
+            directory = outputDirectory
+        print("Converting: %s..." % sourceDirectory)
+        summary = compressDirectory(sourceDirectory, directory, compressionLevel=options.compressionLevel,
+            processes=options.processes, checkConformance=options.checkConformance,
+            compressionBackend=options.compressionBackend, report=report)
+        print(formatSummary(summary))
+
+if __name__ == "__main__":
+    main()
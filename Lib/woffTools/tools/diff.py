@@ -0,0 +1,200 @@
+"""
+A module for comparing two WOFF files table by table.
+*diffWOFF* is the only public function.
+
+This can also be used as a command line tool.
+"""
+
+# import test
+
+importErrors = []
+try:
+    import fontTools
+except ImportError:
+    importErrors.append("fontTools")
+try:
+    import woffTools
+except ImportError:
+    importErrors.append("woffTools")
+
+if importErrors:
+    import sys
+    print("Could not import needed module(s): %s" % ", ".join(importErrors))
+    sys.exit()
+
+# import
+
+import os
+import sys
+import difflib
+import optparse
+from io import BytesIO
+from fontTools.misc.xmlWriter import XMLWriter
+from woffTools import WOFFFont, WOFFLibError, getCompressionBackend
+
+# ----------
+# Categories
+# ----------
+
+# Each table is put in one of these categories.
+# They are listed in the order they are reported.
+
+tableCategories = [
+    ("changed", "Changed"),
+    ("added", "Added"),
+    ("removed", "Removed"),
+    ("recompressed", "Recompressed"),
+    ("identical", "Identical"),
+]
+
+def compareDirectories(reader1, reader2):
+    """
+    Compare the table directories of two WOFFReaders and return
+    a dict of tags mapped to categories. Tables with the same
+    origLength and origChecksum are identical if the compressed
+    data is the same. If it is not, both tables are decompressed
+    and they are recompressed if the decompressed data is the
+    same and changed if it is not, or if either can not be
+    decompressed. No other tables are decompressed.
+    """
+    categories = {}
+    for tag in set(reader1.tables.keys()) | set(reader2.tables.keys()):
+        if tag not in reader2.tables:
+            categories[tag] = "removed"
+            continue
+        if tag not in reader1.tables:
+            categories[tag] = "added"
+            continue
+        entry1 = reader1.tables[tag]
+        entry2 = reader2.tables[tag]
+        if (entry1.origLength, entry1.origChecksum) != (entry2.origLength, entry2.origChecksum):
+            categories[tag] = "changed"
+        elif entry1.compLength == entry2.compLength and reader1.getCompressedTableData(tag)[0] == reader2.getCompressedTableData(tag)[0]:
+            categories[tag] = "identical"
+        else:
+            # the checksum does not cover the head
+            # checkSumAdjustment, so compare the data.
+            data1 = _readTable(reader1, tag)
+            if data1 is not None and data1 == _readTable(reader2, tag):
+                categories[tag] = "recompressed"
+            else:
+                categories[tag] = "changed"
+    return categories
+
+def _readTable(reader, tag):
+    """
+    Return the decompressed table data or None if
+    the table can not be decompressed.
+    """
+    try:
+        return reader[tag]
+    except (WOFFLibError, getCompressionBackend().error, AssertionError):
+        return None
+
+# -----
+# Diffs
+# -----
+
+def dumpTable(font, tag):
+    """
+    Return the TTX XML for the table as a list of lines.
+    """
+    writer = XMLWriter(BytesIO(), newlinestr="\n")
+    font[tag].toXML(writer, font)
+    return writer.file.getvalue().decode("utf-8").splitlines()
+
+def diffTable(font1, font2, tag, name1, name2, context=3):
+    """
+    Return a unified diff of the TTX XML for the table
+    in the two fonts as a list of lines. Only this table,
+    and the tables it depends on, are decompressed.
+    """
+    lines = []
+    for font in (font1, font2):
+        try:
+            lines.append(dumpTable(font, tag))
+        except Exception:
+            error = sys.exc_info()[1]
+            lines.append(["The table can not be decompiled: %s: %s" % (error.__class__.__name__, error)])
+    return list(difflib.unified_diff(lines[0], lines[1], "%s %s" % (name1, tag), "%s %s" % (name2, tag), n=context, lineterm=""))
+
+def diffWOFF(path1, path2, diffTables=True, context=3):
+    """
+    Compare the WOFF files at path1 and path2. Each table is
+    categorized as identical, recompressed (the same sfnt data
+    with different compressed data), changed, added or removed
+    as described in compareDirectories. If diffTables is True,
+    the changed tables are decompiled with FontTools and compared.
+    Only the tables with the same directory values and different
+    compressed data are decompressed to categorize them. The
+    tables that the changed tables depend on are decompiled too.
+
+    This returns a dict with a dict of tags mapped to categories
+    and a dict of the changed tags mapped to the lines of a
+    unified diff of the TTX XML.
+    """
+    name1 = os.path.basename(path1)
+    name2 = os.path.basename(path2)
+    if name1 == name2:
+        name1 = path1
+        name2 = path2
+    font1 = WOFFFont(path1)
+    font2 = None
+    try:
+        font2 = WOFFFont(path2)
+        tables = compareDirectories(font1.reader, font2.reader)
+        differences = {}
+        if diffTables:
+            for tag, category in sorted(tables.items()):
+                if category == "changed":
+                    differences[tag] = diffTable(font1, font2, tag, name1, name2, context=context)
+    finally:
+        font1.close()
+        if font2 is not None:
+            font2.close()
+    return dict(tables=tables, differences=differences)
+
+def formatDiff(result):
+    lines = []
+    for category, title in tableCategories:
+        tags = sorted([tag for tag, tagCategory in result["tables"].items() if tagCategory == category])
+        if tags:
+            lines.append("%s: %s" % (title, ", ".join([tag.strip() for tag in tags])))
+    for tag, diffLines in sorted(result["differences"].items()):
+        lines.append("")
+        lines.extend(diffLines)
+    return "\n".join(lines)
+
+# --------------------
+# Command Line Behvior
+# --------------------
+
+usage = "%prog [options] font1.woff font2.woff"
+
+description = """This tool compares two WOFF files table by
+table. The tables are put in categories: identical,
+recompressed, changed, added and removed. Recompressed
+tables have the same data with different compression.
+A diff of the TTX XML for each changed table is printed.
+"""
+
+def main():
+    parser = optparse.OptionParser(usage=usage, description=description, version="%prog 0.1beta")
+    parser.add_option("-s", action="store_false", dest="diffTables", default=True, help="Only print the table categories.")
+    parser.add_option("-c", dest="context", type="int", default=3, help="The number of lines of context in the diffs. The default is 3.")
+    (options, args) = parser.parse_args()
+    if len(args) != 2:
+        parser.error("Two WOFF files are required.")
+    for path in args:
+        if not os.path.exists(path):
+            print("File does not exist: %s" % path)
+            sys.exit()
+    result = diffWOFF(args[0], args[1], diffTables=options.diffTables, context=options.context)
+    text = formatDiff(result)
+    # Python 2 can't print unicode to a pipe
+    if not isinstance(text, str):
+        text = text.encode("utf-8")
+    print(text)
+
+if __name__ == "__main__":
+    main()
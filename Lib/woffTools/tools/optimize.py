@@ -0,0 +1,241 @@
+"""
+A module for reducing the size of existing WOFF files by
+compressing the tables more thoroughly. *optimizeWOFF* and
+*optimizeFiles* are the public functions.
+
+This can also be used as a command line tool.
+"""
+
+# import test
+
+importErrors = []
+try:
+    import fontTools
+except ImportError:
+    importErrors.append("fontTools")
+try:
+    import woffTools
+except ImportError:
+    importErrors.append("woffTools")
+
+if importErrors:
+    import sys
+    print("Could not import needed module(s): %s" % ", ".join(importErrors))
+    sys.exit()
+
+# import
+
+import os
+import sys
+import zlib
+import optparse
+from woffTools import WOFFReader, WOFFWriter, WOFFLibError, calc4BytePaddedLength, getCompressionBackend
+from woffTools.tools.support import findFiles, runPool
+
+# ----------
+# Candidates
+# ----------
+
+# The zlib settings that will be tried for each table.
+# Each is (level, memLevel, strategy). All of these produce
+# standard zlib streams with a 32K window, so the output
+# is valid for every WOFF decoder.
+
+compressionCandidates = [
+    (9, 8, zlib.Z_DEFAULT_STRATEGY),
+    (9, 9, zlib.Z_DEFAULT_STRATEGY),
+    (9, 8, zlib.Z_FILTERED),
+    (9, 9, zlib.Z_FILTERED),
+]
+
+def compressBest(data, candidates=compressionCandidates):
+    """
+    Compress data with all candidate settings and
+    return the smallest result.
+    """
+    best = None
+    for level, memLevel, strategy in candidates:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 15, memLevel, strategy)
+        compData = compressor.compress(data) + compressor.flush()
+        if best is None or len(compData) < len(best):
+            best = compData
+    return best
+
+# ------------
+# Optimization
+# ------------
+
+def optimizeWOFF(path, outputPath=None, dryRun=False):
+    """
+    Try to reduce the size of the WOFF at path. Every table
+    is decompressed and compressed again with the candidate
+    settings. If none of them improve on the stored data, the
+    stored data is kept. The file is only written if the total
+    size is reduced. If outputPath is given, the result is
+    written there instead of replacing the original file.
+    If dryRun is True, nothing is written.
+
+    The table order, the sfnt data, the metadata and the
+    private data are not changed, so fonts with a DSIG table
+    remain valid. For the same reason the head table
+    checkSumAdjustment is not recalculated.
+
+    This returns a dict with the original and optimized
+    sizes, the bytes saved for each table and whether
+    the file was written.
+    """
+    f = open(path, "rb")
+    try:
+        reader = WOFFReader(f, checkChecksums=0)
+        order = reader.keys()
+        writer = WOFFWriter(None, len(order), flavor=reader.flavor,
+            majorVersion=reader.majorVersion, minorVersion=reader.minorVersion,
+            recalculateHeadChecksum=False)
+        tableSavings = {}
+        for tag in order:
+            compData, origLength, origChecksum, compLength = reader.getCompressedTableData(tag)
+            if compLength < origLength:
+                origData = getCompressionBackend().decompress(compData, origLength + 1)
+                if len(origData) != origLength:
+                    raise WOFFLibError("origLength is not correct in the '%s' table entry." % tag)
+            else:
+                origData = compData[:origLength]
+            newData = compressBest(origData)
+            if len(newData) >= origLength:
+                newData = origData
+            # keep the original if nothing is gained
+            saved = calc4BytePaddedLength(compLength) - calc4BytePaddedLength(len(newData))
+            if saved > 0:
+                writer.setTable(tag, newData, origLength=origLength, origChecksum=origChecksum, compLength=len(newData))
+            else:
+                saved = 0
+                writer.setTable(tag, compData, origLength=origLength, origChecksum=origChecksum, compLength=compLength)
+            tableSavings[tag] = saved
+        if reader.metaLength:
+            metadata, metaOrigLength, metaLength = reader.getCompressedMetadata()
+            writer.setMetadata(metadata, metaOrigLength=metaOrigLength, metaLength=metaLength)
+        if reader.privLength:
+            writer.setPrivateData(reader.privateData)
+        data = writer.close()
+    finally:
+        f.close()
+    # the length in the header may not be correct
+    originalSize = os.path.getsize(path)
+    result = dict(
+        path=path,
+        originalSize=originalSize,
+        optimizedSize=len(data),
+        tables=tableSavings,
+        written=False
+    )
+    if len(data) < originalSize and not dryRun:
+        if outputPath is None:
+            outputPath = path
+        # write to a temporary file and move it into place
+        # so that the original is never left half written.
+        tempPath = outputPath + ".tmp%d" % os.getpid()
+        f = open(tempPath, "wb")
+        f.write(data)
+        f.close()
+        if os.path.exists(outputPath):
+            os.remove(outputPath)
+        os.rename(tempPath, outputPath)
+        result["written"] = True
+    return result
+
+def _optimizeFile(job):
+    path, dryRun = job
+    try:
+        return optimizeWOFF(path, dryRun=dryRun), None
+    except Exception:
+        error = sys.exc_info()[1]
+        return dict(path=path), "%s: %s" % (error.__class__.__name__, error)
+
+def optimizeFiles(paths, processes=None, dryRun=False, report=None):
+    """
+    Optimize all WOFF files in paths. paths may contain
+    files and directories. Directories are searched
+    recursively. The work is done on a pool of processes.
+
+    report, if given, is called with a message for each file.
+
+    This returns a dict with the results for each file, the
+    failures, the total bytes saved and the bytes saved for
+    each table tag.
+    """
+    paths = findFiles(paths, (".woff",))
+    summary = dict(files=[], failures=[], saved=0, tables={})
+    if not paths:
+        return summary
+    jobs = [(path, dryRun) for path in paths]
+    def handleResult(resultAndError):
+        result, error = resultAndError
+        if error is not None:
+            summary["failures"].append((result["path"], error))
+            if report is not None:
+                report("Failed: %s (%s)" % (result["path"], error))
+            return
+        summary["files"].append(result)
+        if result["optimizedSize"] < result["originalSize"]:
+            saved = result["originalSize"] - result["optimizedSize"]
+            summary["saved"] += saved
+            for tag, tableSaved in result["tables"].items():
+                summary["tables"][tag] = summary["tables"].get(tag, 0) + tableSaved
+        if report is not None:
+            report(formatFileResult(result))
+    runPool(_optimizeFile, jobs, handleResult, processes)
+    return summary
+
+def formatFileResult(result):
+    saved = result["originalSize"] - result["optimizedSize"]
+    if saved <= 0:
+        return "%s: no improvement" % result["path"]
+    tables = ", ".join(["%s %d" % (tag, tableSaved) for tag, tableSaved in sorted(result["tables"].items()) if tableSaved])
+    return "%s: %d -> %d bytes, saved %d (%s)" % (result["path"], result["originalSize"], result["optimizedSize"], saved, tables)
+
+def formatSummary(summary):
+    lines = [
+        "Files: %d" % len(summary["files"]),
+        "Improved: %d" % len([result for result in summary["files"] if result["optimizedSize"] < result["originalSize"]]),
+        "Failed: %d" % len(summary["failures"]),
+        "Saved: %d bytes" % summary["saved"]
+    ]
+    if summary["tables"]:
+        lines.append("Saved per table:")
+        for tag, saved in sorted(summary["tables"].items(), key=lambda item: (-item[1], item[0])):
+            if saved:
+                lines.append("    %s: %d bytes" % (tag, saved))
+    return "\n".join(lines)
+
+# --------------------
+# Command Line Behvior
+# --------------------
+
+usage = "%prog [options] path1 path2"
+
+description = """This tool recompresses the tables in
+one or more WOFF files, or directories of WOFF files, with
+more thorough zlib settings. A file is only rewritten if
+it becomes smaller. The sfnt data, metadata and private
+data are not changed.
+"""
+
+def main():
+    parser = optparse.OptionParser(usage=usage, description=description, version="%prog 0.1beta")
+    parser.add_option("-j", dest="processes", type="int", default=None, help="The number of processes. The default is the number of CPUs.")
+    parser.add_option("-n", action="store_true", dest="dryRun", default=False, help="Report the savings without writing any files.")
+    parser.add_option("-q", action="store_true", dest="quiet", default=False, help="Only print the summary.")
+    (options, args) = parser.parse_args()
+    for path in args:
+        if not os.path.exists(path):
+            print("File does not exist: %s" % path)
+            sys.exit()
+    report = None
+    if not options.quiet:
+        def report(message):
+            print(message)
+    summary = optimizeFiles(args, processes=options.processes, dryRun=options.dryRun, report=report)
+    print(formatSummary(summary))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+A module for checking many TTF and OTF files against the
+sfnt conformance requirements in the WOFF specification.
+*checkFiles* is the only public function.
+
+This can also be used as a command line tool.
+"""
+
+# import test
+
+importErrors = []
+try:
+    import fontTools
+except ImportError:
+    importErrors.append("fontTools")
+try:
+    import woffTools
+except ImportError:
+    importErrors.append("woffTools")
+
+if importErrors:
+    import sys
+    print("Could not import needed module(s): %s" % ", ".join(importErrors))
+    sys.exit()
+
+# import
+
+import os
+import re
+import sys
+import optparse
+from woffTools import checkSFNTConformance
+from woffTools.tools.support import findFiles, runPool
+
+sfntExtensions = (".ttf", ".otf")
+
+# -----------
+# Error Types
+# -----------
+
+# The errors reported by checkSFNTConformance contain table
+# tags, so they are grouped by type with these patterns.
+
+errorTypes = [
+    ("offset", re.compile(r"^The offset to the .+ table is not valid\.$")),
+    ("length", re.compile(r"^The length of the .+ table is not valid\.$")),
+    ("searchRange", re.compile(r"^The searchRange value is incorrect\.$")),
+    ("entrySelector", re.compile(r"^The entrySelector value is incorrect\.$")),
+    ("rangeShift", re.compile(r"^The rangeShift value is incorrect\.$")),
+    ("directoryOrder", re.compile(r"^The table directory is not in ascending order\.$")),
+    ("overlap", re.compile(r"^The tables .+ and .+ overlap\.$")),
+    ("overlap", re.compile(r"^There are too many overlapping tables to report them all\.$")),
+    ("alignment", re.compile(r"^The .+ table does not begin on a 4-byte boundary\.$")),
+    ("finalPadding", re.compile(r"^The final table \(.+\) is not properly padded\.$")),
+    ("gap", re.compile(r"^Improper padding between the .+ and .+ tables\.$")),
+    ("finalGap", re.compile(r"^Improper padding at the end of the file\.$")),
+    ("paddingValue", re.compile(r"^Bytes (between .+ and .+|after final table \(.+\)) are not null\.$")),
+    ("checksum", re.compile(r"^Invalid checksum for the .+ table\.$")),
+    ("headChecksum", re.compile(r"^The head checkSumAdjustment value is incorrect\.$")),
+]
+
+def getErrorType(error):
+    """
+    >>> getErrorType("Invalid checksum for the name table.")
+    'checksum'
+    >>> getErrorType("The tables glyf and loca overlap.")
+    'overlap'
+    >>> getErrorType("Something else.")
+    'other'
+    """
+    for errorType, pattern in errorTypes:
+        if pattern.match(error):
+            return errorType
+    return "other"
+
+# --------
+# Checking
+# --------
+
+def _checkFile(path):
+    """
+    Check one file. This runs in a worker process. Files
+    that can not be read at all are reported as a failure
+    instead of stopping the run.
+    """
+    try:
+        return path, checkSFNTConformance(path), None
+    except Exception:
+        error = sys.exc_info()[1]
+        return path, [], "%s: %s" % (error.__class__.__name__, error)
+
+def checkFiles(paths, processes=None, report=None):
+    """
+    Check all TTF and OTF files in paths. paths may contain
+    files and directories. Directories are searched
+    recursively. The work is done on a pool of processes.
+    processes sets the number of processes. The default is
+    the number of CPUs.
+
+    report, if given, is called with the path, the list of
+    errors and the failure message (or None) for each file.
+
+    This returns a dict with the number of files checked,
+    passed and failed, the failures (files that could not
+    be read), the number of files with each error type and
+    the total number of each error type.
+    """
+    paths = findFiles(paths, sfntExtensions)
+    summary = dict(files=0, passed=0, failed=0, failures=[], fileCounts={}, errorCounts={})
+    if not paths:
+        return summary
+    def handleResult(result):
+        path, errors, failure = result
+        summary["files"] += 1
+        if failure is not None:
+            summary["failures"].append((path, failure))
+        elif errors:
+            summary["failed"] += 1
+            types = set()
+            for error in errors:
+                errorType = getErrorType(error)
+                types.add(errorType)
+                summary["errorCounts"][errorType] = summary["errorCounts"].get(errorType, 0) + 1
+            for errorType in types:
+                summary["fileCounts"][errorType] = summary["fileCounts"].get(errorType, 0) + 1
+        else:
+            summary["passed"] += 1
+        if report is not None:
+            report(path, errors, failure)
+    runPool(_checkFile, paths, handleResult, processes)
+    return summary
+
+def formatFileResult(path, errors, failure):
+    """
+    >>> formatFileResult("a.ttf", [], None)
+    'a.ttf: ok'
+    >>> formatFileResult("a.ttf", ["Invalid checksum for the name table.", "Invalid checksum for the OS/2 table.", "The head checkSumAdjustment value is incorrect."], None)
+    'a.ttf: 3 errors (checksum 2, headChecksum 1)'
+    """
+    if failure is not None:
+        return "%s: unreadable (%s)" % (path, failure)
+    if not errors:
+        return "%s: ok" % path
+    counts = {}
+    for error in errors:
+        errorType = getErrorType(error)
+        counts[errorType] = counts.get(errorType, 0) + 1
+    counts = ", ".join(["%s %d" % (errorType, count) for errorType, count in sorted(counts.items())])
+    if len(errors) == 1:
+        return "%s: 1 error (%s)" % (path, counts)
+    return "%s: %d errors (%s)" % (path, len(errors), counts)
+
+def formatSummary(summary):
+    lines = [
+        "Files: %d" % summary["files"],
+        "Passed: %d" % summary["passed"],
+        "Failed: %d" % summary["failed"],
+        "Unreadable: %d" % len(summary["failures"])
+    ]
+    if summary["fileCounts"]:
+        lines.append("Errors (files, occurrences):")
+        for errorType, count in sorted(summary["fileCounts"].items(), key=lambda item: (-item[1], item[0])):
+            lines.append("    %s: %d, %d" % (errorType, count, summary["errorCounts"][errorType]))
+    return "\n".join(lines)
+
+# --------------------
+# Command Line Behvior
+# --------------------
+
+usage = "%prog [options] path1 path2"
+
+description = """This tool checks one or more TTF and OTF
+files, or directories of them, against the sfnt conformance
+requirements in the WOFF specification. A line is printed
+for each file, followed by the number of files that have
+each type of error.
+"""
+
+def main():
+    parser = optparse.OptionParser(usage=usage, description=description, version="%prog 0.1beta")
+    parser.add_option("-j", dest="processes", type="int", default=None, help="The number of processes. The default is the number of CPUs.")
+    parser.add_option("-v", action="store_true", dest="verbose", default=False, help="Print every error for each file.")
+    parser.add_option("-q", action="store_true", dest="quiet", default=False, help="Only print the summary.")
+    (options, args) = parser.parse_args()
+    for path in args:
+        if not os.path.exists(path):
+            print("File does not exist: %s" % path)
+            sys.exit()
+    report = None
+    if not options.quiet:
+        def report(path, errors, failure):
+            print(formatFileResult(path, errors, failure))
+            if options.verbose:
+                for error in errors:
+                    print("    %s" % error)
+    summary = checkFiles(args, processes=options.processes, report=report)
+    print(formatSummary(summary))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from fontTools.misc.py23 import *
 import os
 import time
+import multiprocessing
 from xml.etree import ElementTree
 
 # ----------------------
@@ -415,3 +416,66 @@ def findUniqueFileName(path):
     # not likely, but avoid it all the same.
     assert not os.path.exists(newPath)
     return newPath
+
+# -----
+# Files
+# -----
+
+def findFiles(paths, extensions):
+    """
+    Find the files in paths. paths may contain files and
+    directories. Directories are searched recursively for
+    files with one of the extensions, in sorted order.
+    Files are returned as they are given.
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, directories, fileNames in os.walk(path):
+                directories.sort()
+                for fileName in sorted(fileNames):
+                    if os.path.splitext(fileName)[1].lower() in extensions:
+                        found.append(os.path.join(root, fileName))
+        else:
+            found.append(path)
+    return found
+
+# -------------
+# Process Pools
+# -------------
+
+def calcChunkSize(jobCount, processes):
+    """
+    The number of jobs handed to a process at a time. Small
+    chunks keep the processes busy at the end of a run and
+    large chunks cut the overhead of passing the jobs.
+
+    >>> calcChunkSize(10, 4)
+    1
+    >>> calcChunkSize(1000, 4)
+    62
+    >>> calcChunkSize(100000, 4)
+    64
+    """
+    return max(1, min(64, jobCount // (processes * 4)))
+
+def runPool(function, jobs, callback, processes=None):
+    """
+    Call function with each item in jobs on a pool of
+    processes and call callback with each result, in the
+    order the results are ready. processes sets the number
+    of processes. The default is the number of CPUs. If
+    callback raises an exception, the pool is stopped.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap_unordered(function, jobs, calcChunkSize(len(jobs), processes)):
+            callback(result)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
@@ -13,13 +13,20 @@ import os
 import re
 import time
 import sys
+import heapq
+import json
 import struct
-import zlib
+import hashlib
+import tempfile
+import threading
 import optparse
 import codecs
 from cStringIO import StringIO
 from xml.etree import ElementTree
 from xml.parsers.expat import ExpatError
+from woffTools import getCompressionBackend, setCompressionBackend, WOFFLibError, \
+    sumULongs, calcTableChecksum, packSFNTDirectory, checkSFNTDataConformance, \
+    maxSFNTTables, ChecksumAccumulator
 
 # ----------------------
 # Support: Metadata Spec
@@ -684,6 +691,8 @@ def _testHeaderNumTables(data, reporter):
     """
     Tests:
     - The number of tables must be at least 1.
+    - The number of tables must fit in a sfnt table directory. If it
+      does not, the font can not be decoded and testing stops here.
     - The directory entries for the specified number of tables must be properly formatted.
     """
     header = unpackHeader(data)
@@ -691,13 +700,13 @@ def _testHeaderNumTables(data, reporter):
     if numTables < 1:
         reporter.logError(message="Invalid number of tables defined in header structure (%d)." % numTables)
         return
-    data = data[headerSize:]
-    for index in range(numTables):
-        try:
-            d, data = structUnpack(directoryFormat, data)
-        except:
-            reporter.logError(message="The defined number of tables in the header (%d) does not match the actual number of tables (%d)." % (numTables, index))
-            return
+    if numTables > maxSFNTTables:
+        reporter.logError(message="Invalid number of tables defined in header structure (%d). A sfnt can not contain more than %d tables." % (numTables, maxSFNTTables))
+        return True
+    available = max(0, len(data) - headerSize) // directorySize
+    if available < numTables:
+        reporter.logError(message="The defined number of tables in the header (%d) does not match the actual number of tables (%d)." % (numTables, available))
+        return
     reporter.logPass(message="The number of tables defined in the header is valid.")
 
 # -------------
@@ -858,14 +867,10 @@ def _testTableDirectoryStructure(data, reporter):
     """
     header = unpackHeader(data)
     numTables = header["numTables"]
-    data = data[headerSize:]
-    try:
-        for index in range(numTables):
-            table, data = structUnpack(directoryFormat, data)
-        reporter.logPass(message="The table directory structure is correct.")
-    except:
+    if len(data) < headerSize + (directorySize * numTables):
         reporter.logError(message="The table directory is not properly structured.")
         return True
+    reporter.logPass(message="The table directory structure is correct.")
 
 def _testTableDirectory4ByteOffsets(data, reporter):
     """
@@ -935,14 +940,14 @@ def _testTableDirectoryPositions(data, reporter):
         length = table["compLength"]
         length = length + calcPaddingLength(length)
         locations.append((offset, offset + length, table["tag"]))
-    for start, end, tag in locations:
-        for otherStart, otherEnd, otherTag in locations:
-            if tag == otherTag:
-                continue
-            if start >= otherStart and start < otherEnd:
-                reporter.logError(message="The \"%s\" table overlaps the \"%s\" table." % (tag, otherTag))
-                tablesWithProblems.add(tag)
-                tablesWithProblems.add(otherTag)
+    overlaps, notChecked = _findOverlaps(locations)
+    for tag, otherTag in overlaps:
+        reporter.logError(message="The \"%s\" table overlaps the \"%s\" table." % (tag, otherTag))
+        tablesWithProblems.add(tag)
+        tablesWithProblems.add(otherTag)
+    if notChecked:
+        reporter.logError(message="There are too many overlapping tables to report them all.")
+        tablesWithProblems.update(notChecked)
     # test for invalid offset, length and combo
     header = unpackHeader(data)
     if header["metaOffset"] != 0:
@@ -996,6 +1001,77 @@ def _testTableDirectoryPositions(data, reporter):
         if tag in tablesWithProblems:
             continue
         reporter.logPass(message="The \"%s\" table directory entry has a valid offset and length." % tag)
+    # tables that do not overlap can not contain more data
+    # than the file. if they do, decompressing them all could
+    # take far longer than the file size suggests, so stop.
+    compLength = sum([table["compLength"] for table in directory])
+    if compLength > len(data):
+        reporter.logError(message="The table directory entries describe more table data (%d) than the file contains (%d). The table data can not be tested." % (compLength, len(data)))
+        return True
+
+# Limits for files with a great number of overlapping tables.
+maxOverlapErrors = 100
+maxOverlapChecks = 1000000
+
+def _findOverlaps(locations):
+    """
+    Find the tables that start inside of another table.
+    locations is a list of (start, end, tag) in directory
+    order. This returns a list of (tag, otherTag) pairs in
+    the order that comparing every table with every other
+    table would find them and the set of tags of the tables
+    that overlap others but could not all be compared.
+
+    The tables are swept in order of their start with a heap
+    of the ends of the tables that have started but not ended,
+    so the time grows with the number of tables plus the number
+    of overlaps. No more than maxOverlapErrors pairs are found
+    and no more than maxOverlapChecks pairs are compared.
+
+    >>> locations = [(0, 100, "aaaa"), (40, 60, "bbbb"), (50, 150, "cccc"), (150, 160, "dddd")]
+    >>> _findOverlaps(locations)
+    ([('bbbb', 'aaaa'), ('cccc', 'aaaa'), ('cccc', 'bbbb')], set([]))
+    """
+    order = sorted(range(len(locations)), key=lambda index: locations[index][0])
+    found = {}
+    foundCount = 0
+    checks = 0
+    notChecked = set()
+    active = []
+    activeTags = {}
+    position = 0
+    while position < len(order):
+        # add all tables that start at the same place
+        start = locations[order[position]][0]
+        group = []
+        while position < len(order) and locations[order[position]][0] == start:
+            index = order[position]
+            group.append(index)
+            heapq.heappush(active, (locations[index][1], index))
+            tag = locations[index][2]
+            activeTags[tag] = activeTags.get(tag, 0) + 1
+            position += 1
+        # remove the tables that end before this place
+        while active and active[0][0] <= start:
+            end, index = heapq.heappop(active)
+            activeTags[locations[index][2]] -= 1
+        # every remaining table contains the start
+        for index in group:
+            tag = locations[index][2]
+            if len(active) == activeTags.get(tag, 0):
+                continue
+            if foundCount >= maxOverlapErrors or checks >= maxOverlapChecks:
+                notChecked.add(tag)
+                continue
+            checks += len(active)
+            others = sorted([otherIndex for end, otherIndex in active if locations[otherIndex][2] != tag])
+            found[index] = others
+            foundCount += len(others)
+    overlaps = []
+    for index in sorted(found.keys()):
+        for otherIndex in found[index]:
+            overlaps.append((locations[index][2], locations[otherIndex][2]))
+    return overlaps[:maxOverlapErrors], notChecked
 
 def _testTableDirectoryCompressedLength(data, reporter):
     """
@@ -1018,7 +1094,7 @@ def _testTableDirectoryDecompressedLength(data, reporter):
     - The decompressed length of the data must match the defined original length.
     """
     directory = unpackDirectory(data)
-    tableData = unpackTableData(data)
+    results = unpackTableResults(data)
     for table in directory:
         tag = table["tag"]
         offset = table["offset"]
@@ -1026,11 +1102,10 @@ def _testTableDirectoryDecompressedLength(data, reporter):
         origLength = table["origLength"]
         if compLength >= origLength:
             continue
-        decompressedData = tableData[tag]
         # couldn't be decompressed. handled elsewhere.
-        if decompressedData is None:
+        if not results[tag]["decompressed"]:
             continue
-        decompressedLength = len(decompressedData)
+        decompressedLength = results[tag]["length"]
         if origLength != decompressedLength:
             reporter.logError(message="The \"%s\" table directory entry has an original length (%d) that does not match the actual length of the decompressed data (%d)." % (tag, origLength, decompressedLength))
         else:
@@ -1044,33 +1119,30 @@ def _testTableDirectoryChecksums(data, reporter):
     """
     # check the table directory checksums
     directory = unpackDirectory(data)
-    tables = unpackTableData(data)
+    results = unpackTableResults(data)
     for entry in directory:
         tag = entry["tag"]
         origChecksum = entry["origChecksum"]
-        decompressedData = tables[tag]
         # couldn't be decompressed.
-        if decompressedData is None:
+        if not results[tag]["decompressed"]:
             continue
-        newChecksum = calcChecksum(tag, decompressedData)
+        newChecksum = results[tag]["checksum"]
         if newChecksum != origChecksum:
             reporter.logError(message="The \"%s\" table directory entry original checksum (%s) does not match the checksum (%s) calculated from the data." % (tag, hex(origChecksum), hex(newChecksum)))
         else:
             reporter.logPass(message="The \"%s\" table directory entry original checksum is correct." % tag)
     # check the head checksum adjustment
-    if "head" not in tables:
+    if "head" not in results:
         reporter.logWarning(message="The font does not contain a \"head\" table.")
     else:
         newChecksum = calcHeadChecksum(data)
-        data = tables["head"]
-        try:
-            checksum = struct.unpack(">L", data[8:12])[0]
-            if checksum != newChecksum:
-                reporter.logError(message="The \"head\" table checkSumAdjustment (%s) does not match the calculated checkSumAdjustment (%s)." % (hex(checksum), hex(newChecksum)))
-            else:
-                reporter.logPass(message="The \"head\" table checkSumAdjustment is valid.")
-        except:
+        checksum = results["head"]["checkSumAdjustment"]
+        if checksum is None:
             reporter.logError(message="The \"head\" table is not properly structured.")
+        elif checksum != newChecksum:
+            reporter.logError(message="The \"head\" table checkSumAdjustment (%s) does not match the calculated checkSumAdjustment (%s)." % (hex(checksum), hex(newChecksum)))
+        else:
+            reporter.logPass(message="The \"head\" table checkSumAdjustment is valid.")
 
 
 def _testTableDirectoryTableOrder(data, reporter):
@@ -1107,20 +1179,72 @@ def _testTableDataDecompression(data, reporter):
     - The table data, when the defined compressed length is less
       than the original length, must be properly compressed.
     """
+    results = unpackTableResults(data)
     for table in unpackDirectory(data):
         tag = table["tag"]
-        offset = table["offset"]
         compLength = table["compLength"]
         origLength = table["origLength"]
         if origLength <= compLength:
             continue
-        entryData = data[offset:offset+compLength]
-        try:
-            decompressed = zlib.decompress(entryData)
+        if results[tag]["decompressed"]:
             reporter.logPass(message="The \"%s\" table data can be decompressed with zlib." % tag)
-        except zlib.error:
+        else:
             reporter.logError(message="The \"%s\" table data can not be decompressed with zlib." % tag)
 
+# ---------------
+# Tests: SFNT Data
+# ---------------
+
+def testSFNTData(data, reporter):
+    """
+    Test the sfnt data that the WOFF decodes to against the
+    sfnt conformance requirements in the WOFF specification.
+    The sfnt is laid out the way a decoder writes it: the
+    table directory is made from the origLength and origChecksum
+    values and the decompressed tables are written one after
+    the other, each padded to a 4-byte boundary, in the order
+    they are stored in the WOFF. If an origLength is not
+    correct, the tables are not where the directory says they
+    are. The checksums are tested in the Table Directory group,
+    so they are not tested again here.
+    """
+    header = unpackHeader(data)
+    directory = unpackDirectory(data)
+    results = unpackTableResults(data)
+    for entry in directory:
+        if not results[entry["tag"]]["decompressed"]:
+            reporter.logError(message="The sfnt data can not be built because the \"%s\" table can not be decompressed." % entry["tag"])
+            return False
+    if len(results) != len(directory):
+        reporter.logError(message="The sfnt data can not be built because the table directory contains duplicate tags.")
+        return False
+    if len(directory) > maxSFNTTables:
+        reporter.logError(message="The sfnt data can not be built because a sfnt can not contain more than %d tables." % maxSFNTTables)
+        return False
+    # build the sfnt. data that is longer than origLength
+    # is cut off one byte past origLength. that is enough
+    # to move the tables that follow it.
+    tableData = unpackTableData(data)
+    tables = {}
+    chunks = []
+    offset = sfntHeaderSize + (sfntDirectoryEntrySize * len(directory))
+    for o, entry in sorted([(entry["offset"], entry) for entry in directory]):
+        tag = entry["tag"]
+        origLength = entry["origLength"]
+        tables[tag] = dict(offset=offset, length=origLength, checkSum=entry["origChecksum"])
+        offset += origLength + calcPaddingLength(origLength)
+        table = tableData[tag]
+        chunks.append(table)
+        chunks.append("\0" * calcPaddingLength(len(table)))
+    sfntData = packSFNTDirectory(header["flavor"], tables) + "".join(chunks)
+    # test
+    errors = checkSFNTDataConformance(sfntData, checkChecksums=False)
+    for error in errors:
+        reporter.logError(message="sfnt: %s" % error)
+    if not errors:
+        reporter.logPass(message="The sfnt data meets the conformance requirements for table offsets, lengths, directory order and padding.")
+    return False
+
 # ----------------
 # Tests: Metadata
 # ----------------
@@ -1199,10 +1323,12 @@ def _testMetadataDecompression(data, reporter):
     """
     if _shouldSkipMetadataTest(data, reporter):
         return
+    header = unpackHeader(data)
     compData = unpackMetadata(data, decompress=False, parse=False)
+    backend = getCompressionBackend()
     try:
-        zlib.decompress(compData)
-    except zlib.error:
+        backend.decompress(compData, header["metaOrigLength"] + 1)
+    except backend.error:
         reporter.logError(message="The metadata can not be decompressed with zlib.")
         return True
     reporter.logPass(message="The metadata can be decompressed with zlib.")
@@ -1215,11 +1341,17 @@ def _testMetadataDecompressedLength(data, reporter):
     if _shouldSkipMetadataTest(data, reporter):
         return
     header = unpackHeader(data)
-    metadata = unpackMetadata(data, parse=False)
+    compData = unpackMetadata(data, decompress=False, parse=False)
     metaOrigLength = header["metaOrigLength"]
-    decompressedLength = len(metadata)
+    lengths = []
+    getCompressionBackend().decompress(compData, metaOrigLength + 1, sink=lambda chunk: lengths.append(len(chunk)))
+    decompressedLength = sum(lengths)
     if metaOrigLength != decompressedLength:
         reporter.logError(message="The decompressed metadata length (%d) does not match the original metadata length (%d) in the header." % (decompressedLength, metaOrigLength))
+        # only the first metaOrigLength + 1 bytes are
+        # unpacked, so longer metadata can not be parsed.
+        if decompressedLength > metaOrigLength:
+            return True
     else:
         reporter.logPass(message="The decompressed metadata length matches the original metadata length in the header.")
 
@@ -1512,6 +1644,10 @@ def _validateAttributeValue(element, attrib, valueOptions, reporter, parentTree)
     # return the error state
     return haveError
 
+# The div and span elements can be nested without limit.
+# Deeper nesting than this is reported instead of validated.
+maxMetadataDepth = 100
+
 def _validateChildElements(element, childElementTag, childElementData, reporter, parentTree, requirementLevel):
     haveError = False
     # get the valid counts
@@ -1567,6 +1703,16 @@ def _validateChildElements(element, childElementTag, childElementData, reporter,
                 parentTree
             )
             haveError = True
+    # don't dive past the maximum depth
+    if found and not haveError and len(parentTree) >= maxMetadataDepth:
+        _logMetadataResult(
+            reporter,
+            "error",
+            "Child-elements nested more than %d levels deep" % maxMetadataDepth,
+            element.tag,
+            parentTree
+        )
+        haveError = True
     # validate the found elements
     if not haveError:
         for childElement in found:
@@ -1652,16 +1798,10 @@ def padData(data):
     return data
 
 def sumDataULongs(data):
-    longs = struct.unpack(">%dL" % (len(data) / 4), data)
-    value = sum(longs) % (2 ** 32)
-    return value
+    return sumULongs(data)
 
 def calcChecksum(tag, data):
-    if tag == "head":
-        data = data[:8] + "\0\0\0\0" + data[12:]
-    data = padData(data)
-    value = sumDataULongs(data)
-    return value
+    return calcTableChecksum(tag, data)
 
 def calcHeadChecksum(data):
     header = unpackHeader(data)
@@ -2317,44 +2457,129 @@ def finishHTML(writer):
 def unpackHeader(data):
     return structUnpack(headerFormat, data)[0]
 
+# The directory and tables unpacked from the most recent
+# data. Nearly every test needs the directory and several
+# need the decompressed tables, so they are only unpacked
+# once for each font. Each thread has its own cache and
+# validateFont clears it when it is done.
+
+class _UnpackCache(threading.local):
+
+    def __init__(self):
+        self.items = {}
+        # the TableResultCache for the current validateFont call
+        self.tableResultCache = None
+
+_unpackCache = _UnpackCache()
+
+def _getCached(data, key, function):
+    cache = _unpackCache.items
+    if cache.get("data") is not data:
+        cache.clear()
+        cache["data"] = data
+    if key not in cache:
+        cache[key] = function(data)
+    return cache[key]
+
 def unpackDirectory(data):
+    return [dict(table) for table in _getCached(data, "directory", _unpackDirectory)]
+
+def _unpackDirectory(data):
     header = unpackHeader(data)
     numTables = header["numTables"]
-    data = data[headerSize:]
     directory = []
     for index in range(numTables):
-        table, data = structUnpack(directoryFormat, data)
+        offset = headerSize + (directorySize * index)
+        table, remainder = structUnpack(directoryFormat, data[offset:offset + directorySize])
         directory.append(table)
     return directory
 
 def unpackTableData(data):
-    directory = unpackDirectory(data)
+    return dict(_getCached(data, "tables", _unpackTableData))
+
+def _unpackTableData(data):
     tables = {}
-    for entry in directory:
-        tag = entry["tag"]
-        offset = entry["offset"]
-        origLength = entry["origLength"]
-        compLength = entry["compLength"]
-        if offset > len(data) or offset < 0 or (offset + compLength) < 0:
-            tableData = ""
-        elif offset + compLength > len(data):
-            tableData = data[offset:]
-        else:
-            tableData = data[offset:offset+compLength]
-        if compLength < origLength:
-            try:
-                td = zlib.decompress(tableData)
-                tableData = td
-            except zlib.error:
-                tableData = None
-        tables[tag] = tableData
+    for entry in unpackDirectory(data):
+        tables[entry["tag"]] = _decompressTable(entry, _getCompressedTableData(data, entry))
     return tables
 
+def _getCompressedTableData(data, entry):
+    offset = entry["offset"]
+    compLength = entry["compLength"]
+    if offset > len(data) or offset < 0 or (offset + compLength) < 0:
+        return ""
+    elif offset + compLength > len(data):
+        return data[offset:]
+    return data[offset:offset+compLength]
+
+def _decompressTable(entry, tableData, sink=None):
+    """
+    Decompress the data for the table in entry. Only the first
+    origLength + 1 bytes are returned. That is enough to show
+    that origLength is not correct. The rest of the data is
+    still decompressed and passed to sink, so the complete
+    stream is checked and its length can be found. This returns
+    None if the data can not be decompressed.
+    """
+    if entry["compLength"] < entry["origLength"]:
+        backend = getCompressionBackend()
+        try:
+            tableData = backend.decompress(tableData, entry["origLength"] + 1, sink=sink)
+        except backend.error:
+            tableData = None
+    elif sink is not None:
+        sink(tableData)
+    return tableData
+
+def unpackTableResults(data):
+    return dict(_getCached(data, "tableResults", _unpackTableResults))
+
+def _unpackTableResults(data):
+    """
+    The facts about each table that the table tests need:
+    whether the data can be decompressed, the length and
+    checksum of the decompressed data and, for the head
+    table, the checkSumAdjustment. When validateFont is given
+    a table result cache, only the tables that are not in
+    it are decompressed.
+    """
+    cache = _unpackCache.tableResultCache
+    results = {}
+    for entry in unpackDirectory(data):
+        tag = entry["tag"]
+        compressedData = _getCompressedTableData(data, entry)
+        if cache is None:
+            results[tag] = _makeTableResult(entry, compressedData)
+            continue
+        key = cache.makeKey(entry, compressedData)
+        result = cache.get(key)
+        if result is None:
+            result = _makeTableResult(entry, compressedData)
+            cache.set(key, result)
+        results[tag] = result
+    return results
+
+def _makeTableResult(entry, compressedData):
+    """
+    The length and the checksum are calculated from the
+    complete decompressed data, not from the part of it
+    that is kept.
+    """
+    tag = entry["tag"]
+    accumulator = ChecksumAccumulator(tag)
+    tableData = _decompressTable(entry, compressedData, sink=accumulator.update)
+    if tableData is None:
+        return dict(decompressed=False, length=None, checksum=None, checkSumAdjustment=None)
+    checkSumAdjustment = None
+    if tag == "head" and len(tableData) >= 12:
+        checkSumAdjustment = struct.unpack(">L", tableData[8:12])[0]
+    return dict(decompressed=True, length=accumulator.length, checksum=accumulator.getChecksum(), checkSumAdjustment=checkSumAdjustment)
+
 def unpackMetadata(data, decompress=True, parse=True):
     header = unpackHeader(data)
     data = data[header["metaOffset"]:header["metaOffset"]+header["metaLength"]]
     if decompress and data:
-        data = zlib.decompress(data)
+        data = getCompressionBackend().decompress(data, header["metaOrigLength"] + 1)
     if parse and data:
         data = ElementTree.fromstring(data)
     return data
@@ -2364,6 +2589,100 @@ def unpackPrivateData(data):
     data = data[header["privOffset"]:header["privOffset"]+header["privLength"]]
     return data
 
+# ---------------------------
+# Support: Table Result Cache
+# ---------------------------
+
+class TableResultCache(object):
+
+    """
+    A file that stores the results of decompressing tables
+    between runs, so that an unchanged table does not need
+    to be decompressed again. The results are keyed by the
+    tag, compLength, origLength and origChecksum of the table
+    and a SHA-256 hash of the compressed data.
+
+    path is the path of the file. It is created when the
+    cache is saved. A file that can not be read, or that was
+    written by a different version of this module, is ignored.
+    maxEntries is the maximum number of results that are
+    kept. When it is exceeded, the least recently used
+    results are removed.
+    """
+
+    formatVersion = 2
+
+    def __init__(self, path, maxEntries=100000):
+        self.path = path
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.misses = 0
+        self._results = {}
+        try:
+            f = open(path, "rb")
+            try:
+                stored = json.loads(f.read().decode("utf-8"))
+            finally:
+                f.close()
+            if stored.get("formatVersion") == self.formatVersion:
+                self._results = stored["results"]
+        except (IOError, ValueError, KeyError, AttributeError):
+            pass
+
+    def __len__(self):
+        return len(self._results)
+
+    def makeKey(self, entry, compressedData):
+        contentHash = hashlib.sha256(compressedData).hexdigest()
+        key = "%r %d %d %08x %s" % (entry["tag"], entry["compLength"], entry["origLength"], entry["origChecksum"], contentHash)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Get the result stored for key. If nothing
+        is stored, this returns None.
+        """
+        stored = self._results.get(key)
+        if stored is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        stored["used"] = time.time()
+        return dict(stored["result"])
+
+    def set(self, key, result):
+        self._results[key] = dict(result=dict(result), used=time.time())
+
+    def save(self):
+        """
+        Write the cache to the file.
+        """
+        if len(self._results) > self.maxEntries:
+            keys = sorted(self._results.keys(), key=lambda key: self._results[key]["used"])
+            for key in keys[:len(self._results) - self.maxEntries]:
+                del self._results[key]
+        text = json.dumps(dict(formatVersion=self.formatVersion, results=self._results))
+        # write to a temporary file and move it into
+        # place so that readers never see partial data.
+        directory = os.path.dirname(os.path.abspath(self.path))
+        descriptor, tempPath = tempfile.mkstemp(dir=directory)
+        try:
+            f = os.fdopen(descriptor, "wb")
+            try:
+                f.write(text.encode("utf-8"))
+            finally:
+                f.close()
+            try:
+                os.rename(tempPath, self.path)
+            except OSError:
+                # Windows can not rename over an existing file
+                os.remove(self.path)
+                os.rename(tempPath, self.path)
+        finally:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+
+
 # -----------------------
 # Support: Report Helpers
 # -----------------------
@@ -2397,7 +2716,22 @@ tests = [
     ("Metadata",        testMetadata)
 ]
 
+# This is only run when the checkSFNT option is set.
+sfntTests = [
+    ("SFNT Data",       testSFNTData)
+]
+
 def validateFont(path, options, writeFile=True):
+    """
+    Validate the WOFF file at path and return the path of the
+    report file, if one was written, and the report.
+
+    If options.tableResultCache is the path of a file, the
+    results of decompressing each table are stored in it.
+    In later runs only the tables that have changed are
+    decompressed. The report is the same as it would be
+    without the cache.
+    """
     # start the reporter
     if options.outputFormat == "html":
         reporter = HTMLReporter()
@@ -2414,15 +2748,29 @@ def validateFont(path, options, writeFile=True):
     f = open(path, "rb")
     data = f.read()
     f.close()
+    cache = None
+    cachePath = getattr(options, "tableResultCache", None)
+    if cachePath is not None:
+        cache = TableResultCache(cachePath)
+    _unpackCache.tableResultCache = cache
     shouldStop = False
-    for title, func in tests:
-        # skip groups that are not specified in the options
-        if options.testGroups and title not in options.testGroups:
-            continue
-        reporter.logTestTitle(title)
-        shouldStop = func(data, reporter)
-        if shouldStop:
-            break
+    fontTests = tests
+    if getattr(options, "checkSFNT", False):
+        fontTests = tests + sfntTests
+    try:
+        for title, func in fontTests:
+            # skip groups that are not specified in the options
+            if options.testGroups and title not in options.testGroups:
+                continue
+            reporter.logTestTitle(title)
+            shouldStop = func(data, reporter)
+            if shouldStop:
+                break
+    finally:
+        _unpackCache.items.clear()
+        _unpackCache.tableResultCache = None
+    if cache is not None:
+        cache.save()
     reporter.haveReadError = shouldStop
     # get the report
     report = reporter.getReport()
@@ -2461,15 +2809,26 @@ usage = "%prog [options] fontpath1 fontpath2"
 description = """This tool examines the structure of one
 or more WOFF files and issues a detailed report about
 the validity of the file structure. It does not validate
-the wrapped font data.
+the wrapped font data, but with the -s option the sfnt
+structure of the wrapped font data is checked against the
+conformance requirements in the WOFF specification.
 """
 
 def main():
     parser = optparse.OptionParser(usage=usage, description=description, version="%prog 0.1beta")
     parser.add_option("-d", dest="outputDirectory", help="Output directory. The default is to output the report into the same directory as the font file.")
     parser.add_option("-o", dest="outputFileName", help="Output file name. The default is \"fontfilename_validate.html\".")
+    parser.add_option("-s", action="store_true", dest="checkSFNT", default=False, help="Also check the sfnt structure of the decompressed font data.")
+    parser.add_option("-c", dest="tableResultCache", help="A file for caching table results between runs. Only the tables that have changed since an earlier run are decompressed.")
+    parser.add_option("-b", dest="compressionBackend", help="The zlib backend to use: zlib-ng, zlib or isal. isal only has compression levels 1 to 3, so higher levels give larger files with it. The default is zlib-ng if it is installed and zlib if it is not.")
     parser.set_defaults(excludeTests=[])
     (options, args) = parser.parse_args()
+    try:
+        backend = setCompressionBackend(options.compressionBackend)
+    except WOFFLibError:
+        print(sys.exc_info()[1])
+        sys.exit()
+    print("Compression backend: %s" % backend.name)
     outputDirectory = options.outputDirectory
     options.outputFormat = "html"
     options.testGroups = None # don't expose this to the commandline. it's for testing only.
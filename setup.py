@@ -31,5 +31,9 @@ setup(
         "woff-info",
         "woff-proof",
         "woff-css",
+        "woff-compress",
+        "woff-optimize",
+        "woff-sfnt-check",
+        "woff-diff",
     ]
 )